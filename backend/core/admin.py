@@ -1,8 +1,11 @@
 from django.contrib import admin
-from .models import User, Genero, Libro, Compra, ItemCompra
+from .models import User, Genero, Libro, Compra, ItemCompra, VentaDiariaLibro, VentaDiariaGenero, Tarea
 
 admin.site.register(User)
 admin.site.register(Genero)
 admin.site.register(Libro)
 admin.site.register(Compra)
 admin.site.register(ItemCompra)
+admin.site.register(VentaDiariaLibro)
+admin.site.register(VentaDiariaGenero)
+admin.site.register(Tarea)
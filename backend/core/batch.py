@@ -0,0 +1,205 @@
+"""
+Varias requests de la API en una sola ida y vuelta (/api/batch/).
+
+Cada sub-request se resuelve con el URL resolver y llama a la vista
+directamente, sin volver a pasar por los middlewares: comparte la sesión y
+el usuario ya resueltos de la request del batch, sus cookies y cabeceras
+(incluido X-CSRFToken, así las vistas de DRF siguen validando el CSRF de
+los métodos que escriben). Los GET consecutivos corren en paralelo en un
+pool de hilos; cualquier otro método espera a los anteriores y corre solo,
+así un POST seguido de un GET ve su propio cambio.
+
+Las cookies que pongan las sub-respuestas (p. ej. csrftoken) pasan a la
+respuesta del batch.
+"""
+import contextvars
+import copy
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.http import Http404, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.renderers import JSONRenderer
+
+METODOS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+# Cabeceras de la sub-respuesta que se devuelven al cliente.
+CABECERAS = ('Content-Type', 'ETag', 'Last-Modified', 'Location', 'Cache-Control')
+# Cabeceras del batch que no aplican a las sub-requests.
+META_EXCLUIDOS = ('HTTP_ACCEPT_ENCODING', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+                  'CONTENT_TYPE', 'CONTENT_LENGTH')
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class BatchInvalido(ValueError):
+    pass
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=getattr(settings, 'BATCH_CONCURRENCIA', 4),
+                                       thread_name_prefix='batch')
+        return _pool
+
+
+def validar(datos):
+    """Lista de sub-requests normalizada: [{'id', 'method', 'path', 'body'}]."""
+    maximo = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+    requests = datos.get('requests') if isinstance(datos, dict) else None
+    if not isinstance(requests, list) or not requests:
+        raise BatchInvalido('Se requiere una lista de requests')
+    if len(requests) > maximo:
+        raise BatchInvalido(f'Como máximo {maximo} requests por batch')
+    normalizadas = []
+    for indice, sub in enumerate(requests):
+        if not isinstance(sub, dict) or not isinstance(sub.get('path'), str):
+            raise BatchInvalido(f'Request {indice}: se requiere path')
+        metodo = str(sub.get('method', 'GET')).upper()
+        if metodo not in METODOS:
+            raise BatchInvalido(f'Request {indice}: método inválido')
+        if not sub['path'].startswith('/'):
+            raise BatchInvalido(f'Request {indice}: path debe ser absoluto')
+        normalizadas.append({'id': sub.get('id', indice), 'method': metodo,
+                             'path': sub['path'], 'body': sub.get('body')})
+    return normalizadas
+
+
+def _sub_request(request, sub):
+    partes = urlsplit(sub['path'])
+    cuerpo = b'' if sub['body'] is None else json.dumps(sub['body']).encode('utf-8')
+
+    # Copia superficial: conserva la clase (WSGI/ASGI), la sesión y el usuario.
+    hija = copy.copy(request)
+    hija.META = {k: v for k, v in request.META.items() if k not in META_EXCLUIDOS}
+    hija.META.update({'REQUEST_METHOD': sub['method'], 'PATH_INFO': partes.path,
+                      'QUERY_STRING': partes.query})
+    if cuerpo:
+        hija.META.update({'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(cuerpo))})
+    hija.method = sub['method']
+    hija.path = hija.path_info = partes.path
+    hija.GET = QueryDict(partes.query)
+    hija._body = cuerpo
+    hija._stream = io.BytesIO(cuerpo)
+    hija._read_started = False
+    for atributo in ('_post', '_files', 'resolver_match'):
+        hija.__dict__.pop(atributo, None)
+    return hija
+
+
+def _ejecutar(request, sub):
+    hija = _sub_request(request, sub)
+    try:
+        return hija, _llamar(hija)
+    except Http404:
+        return hija, _error(404, 'No encontrado')
+    except Exception:
+        # Una sub-request que falla no se lleva puestas a las demás: responde 500 solo ella.
+        logger.exception('Falló la sub-request %s %s del batch', sub['method'], sub['path'])
+        return hija, _error(500, 'Error interno del servidor')
+
+
+def _llamar(hija):
+    try:
+        match = resolve(hija.path_info)
+    except Resolver404:
+        return _error(404, 'No encontrado')
+    if getattr(match.func, 'batch', False):
+        return _error(400, 'No se puede anidar un batch')
+    hija.resolver_match = match
+    vista = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    response = vista(hija, *match.args, **match.kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    return response
+
+
+def _en_hilo(request, sub):
+    # Los hilos del pool conservan su conexión entre batches; se cierra o se
+    # reutiliza según CONN_MAX_AGE, igual que al empezar y terminar una request.
+    close_old_connections()
+    try:
+        return _ejecutar(request, sub)
+    finally:
+        close_old_connections()
+
+
+def _error(status, detalle):
+    return HttpResponse(JSONRenderer().render({'detail': detalle}), status=status,
+                        content_type='application/json')
+
+
+def _etapas(subs):
+    """Agrupa los GET consecutivos; cada otro método es una etapa aparte."""
+    etapas = []
+    for sub in subs:
+        if sub['method'] == 'GET' and etapas and etapas[-1][0]['method'] == 'GET':
+            etapas[-1].append(sub)
+        else:
+            etapas.append([sub])
+    return etapas
+
+
+def ejecutar(request, subs):
+    """Corre las sub-requests y devuelve [(sub, sub_request, response)] en el orden pedido."""
+    concurrencia = getattr(settings, 'BATCH_CONCURRENCIA', 4)
+    # Dentro de una transacción (ATOMIC_REQUESTS, tests) otros hilos no verían sus cambios.
+    en_serie = concurrencia <= 1 or connection.in_atomic_block
+    # Usuario y sesión se cargan antes de repartir el trabajo: los hilos solo los leen.
+    request.user.is_authenticated
+
+    resultados = []
+    for etapa in _etapas(subs):
+        if len(etapa) == 1 or en_serie:
+            resultados += [(sub, *_ejecutar(request, sub)) for sub in etapa]
+            continue
+        # copy_context: las consultas de los hilos también cuentan en las métricas del batch.
+        futuros = [get_pool().submit(contextvars.copy_context().run, _en_hilo, request, sub) for sub in etapa]
+        resultados += [(sub, *futuro.result()) for sub, futuro in zip(etapa, futuros)]
+    return resultados
+
+
+def responder(request, resultados):
+    """
+    Respuesta del batch. Los cuerpos JSON se insertan tal cual, sin volver a
+    parsearlos; el resto va como string.
+    """
+    renderer = JSONRenderer()
+    partes = []
+    response = HttpResponse(content_type='application/json')
+    for sub, hija, sub_response in resultados:
+        if sub_response.streaming:
+            contenido = b''.join(sub_response.streaming_content)
+        else:
+            contenido = sub_response.content
+        tipo = sub_response.get('Content-Type', '')
+        if not contenido:
+            cuerpo = b'null'
+        elif tipo.startswith('application/json'):
+            cuerpo = contenido
+        else:
+            cuerpo = renderer.render(contenido.decode(sub_response.charset, errors='replace'))
+        cabeceras = {nombre: sub_response[nombre] for nombre in CABECERAS if sub_response.has_header(nombre)}
+        partes.append(
+            renderer.render({'id': sub['id'], 'status': sub_response.status_code, 'headers': cabeceras})[:-1]
+            + b',"body":' + cuerpo + b'}'
+        )
+        for cookie in sub_response.cookies.values():
+            response.cookies[cookie.key] = cookie
+        # get_token() en una sub-request (p. ej. /auth/csrf/): la cookie la pone el middleware del batch.
+        if hija.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            request.META['CSRF_COOKIE'] = hija.META['CSRF_COOKIE']
+            request.META['CSRF_COOKIE_NEEDS_UPDATE'] = True
+    response.content = b'{"responses":[' + b','.join(partes) + b']}'
+    return response
@@ -0,0 +1,349 @@
+"""
+Benchmark de los endpoints de la API.
+
+Recorre las rutas reales de core/urls.py, en proceso con el cliente de test
+de Django (mide también las consultas SQL) o contra un servidor local por
+HTTP, y devuelve por endpoint throughput, percentiles de latencia y
+consultas. El resultado es JSON para poder comparar entre versiones.
+"""
+import json
+import math
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from django.db import OperationalError, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+# (nombre, ruta, quién la llama). Las rutas se completan con ids de la base.
+ESCENARIOS = [
+    ('generos-list', '/api/generos/', None),
+    ('generos-libros', '/api/generos/{genero}/libros/', None),
+    ('generos-top', '/api/generos/{genero}/top/', None),
+    ('libros-list', '/api/libros/', None),
+    ('libros-list-cursor', '/api/libros/?limit=50', None),
+    ('libros-list-top', '/api/libros/?orden=top&limit=50', None),
+    ('libros-retrieve', '/api/libros/{libro}/', None),
+    ('libros-top', '/api/libros/top/', None),
+    ('libros-buscar', '/api/libros/buscar/?q={termino}', None),
+    ('auth-user', '/api/auth/user/', 'usuario'),
+    ('compras-mi-carrito', '/api/compras/mi-carrito/', 'usuario'),
+    ('compras-list', '/api/compras/', 'usuario'),
+    ('estadisticas', '/api/estadisticas/?por=libro', 'admin'),
+]
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    # Percentil por rango más cercano.
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def parametros_por_defecto():
+    """Ids reales para completar las rutas: el libro más vendido, el género con más libros."""
+    from django.db.models import Count
+    from .models import Genero, Libro
+
+    libro = Libro.objects.order_by('-ventas_totales', '-id').values('id', 'titulo').first()
+    genero = (Genero.objects.annotate(n=Count('libros')).order_by('-n', 'id')
+              .values_list('id', flat=True).first())
+    return {
+        'libro': libro['id'] if libro else 0,
+        'termino': libro['titulo'].split()[0] if libro else 'a',
+        'genero': genero or 0,
+    }
+
+
+class _ClienteLocal:
+    """Cliente de test de Django: las requests pasan por todo el stack y se cuentan las consultas."""
+
+    def __init__(self, usuario=None):
+        self.client = Client(HTTP_HOST='localhost')
+        if usuario is not None:
+            self.client.force_login(usuario)
+
+    def get(self, ruta):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(ruta)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response.status_code, len(consultas)
+
+
+class _ClienteHTTP:
+    """Cliente HTTP contra un servidor ya levantado; no puede contar consultas."""
+
+    def __init__(self, base, cookie=None):
+        self.base = base.rstrip('/')
+        self.headers = {'Cookie': cookie} if cookie else {}
+
+    def get(self, ruta):
+        request = urllib.request.Request(self.base + ruta, headers=self.headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as exc:
+            return exc.code, None
+
+
+def medir(cliente_factory, ruta, requests, concurrencia=1, calentamiento=3):
+    """Ejecuta `requests` GET sobre `ruta` y devuelve el resumen del endpoint."""
+    latencias, consultas, estados = [], [], {}
+    lock = threading.Lock()
+    locales = threading.local()
+
+    def cliente():
+        if not hasattr(locales, 'cliente'):
+            locales.cliente = cliente_factory()
+        return locales.cliente
+
+    def una():
+        inicio = time.perf_counter()
+        estado, n = cliente().get(ruta)
+        duracion = time.perf_counter() - inicio
+        with lock:
+            latencias.append(duracion)
+            estados[estado] = estados.get(estado, 0) + 1
+            if n is not None:
+                consultas.append(n)
+
+    def lote(cantidad):
+        try:
+            for _ in range(cantidad):
+                una()
+        finally:
+            if concurrencia > 1:
+                connection.close()
+
+    for _ in range(calentamiento):
+        cliente().get(ruta)
+
+    inicio = time.perf_counter()
+    if concurrencia > 1:
+        por_hilo = [requests // concurrencia + (i < requests % concurrencia) for i in range(concurrencia)]
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            list(pool.map(lote, por_hilo))
+    else:
+        lote(requests)
+    total = time.perf_counter() - inicio
+
+    return {
+        'ruta': ruta,
+        'requests': len(latencias),
+        'concurrencia': concurrencia,
+        'estados': {str(k): v for k, v in sorted(estados.items())},
+        'throughput_rps': round(len(latencias) / total, 2) if total else None,
+        'latencia_ms': {
+            'media': round(statistics.fmean(latencias) * 1000, 3),
+            'p50': round(_percentil(latencias, 50) * 1000, 3),
+            'p95': round(_percentil(latencias, 95) * 1000, 3),
+            'p99': round(_percentil(latencias, 99) * 1000, 3),
+            'max': round(max(latencias) * 1000, 3),
+        },
+        'consultas': {
+            'media': round(statistics.fmean(consultas), 2),
+            'max': max(consultas),
+        } if consultas else None,
+    }
+
+
+def ejecutar(escenarios=None, requests=200, concurrencia=1, base_url=None,
+             usuario=None, admin=None, cookies=None, parametros=None):
+    """
+    Corre los escenarios (todos por defecto) y devuelve el reporte completo.
+    En modo HTTP (`base_url`) las rutas autenticadas usan `cookies[rol]`.
+    """
+    import django
+
+    parametros = {**parametros_por_defecto(), **(parametros or {})}
+    usuarios = {'usuario': usuario, 'admin': admin}
+    cookies = cookies or {}
+    resultados = {}
+    for nombre, plantilla, rol in ESCENARIOS:
+        if escenarios and nombre not in escenarios:
+            continue
+        if rol and (cookies.get(rol) if base_url else usuarios.get(rol)) is None:
+            resultados[nombre] = {'omitido': f'sin credenciales de {rol}'}
+            continue
+        ruta = plantilla.format(**parametros)
+        if base_url:
+            factory = lambda rol=rol: _ClienteHTTP(base_url, cookies.get(rol))
+        else:
+            factory = lambda rol=rol: _ClienteLocal(usuarios.get(rol))
+        resultados[nombre] = medir(factory, ruta, requests, concurrencia)
+
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'modo': 'http' if base_url else 'local',
+        'base_url': base_url,
+        'django': django.get_version(),
+        'base_de_datos': connection.vendor,
+        'parametros': parametros,
+        'endpoints': resultados,
+    }
+
+
+# Endpoints que tienen vista async (core/urls_async.py).
+ESCENARIOS_ASYNC = ('generos-list', 'libros-list-cursor', 'libros-list-top', 'libros-retrieve',
+                    'libros-top', 'auth-user', 'compras-mi-carrito')
+
+
+def servidores(bases, niveles=(1, 16, 64), requests=400, escenarios=None, cookies=None, parametros=None):
+    """
+    Mismos endpoints contra varios servidores ya levantados (p. ej. {'asgi': url,
+    'wsgi': url}) con concurrencias crecientes: throughput y percentiles por nivel.
+    """
+    import django
+
+    parametros = {**parametros_por_defecto(), **(parametros or {})}
+    cookies = cookies or {}
+    resultados = {}
+    for nombre, plantilla, rol in ESCENARIOS:
+        if nombre not in (escenarios or ESCENARIOS_ASYNC):
+            continue
+        if rol and cookies.get(rol) is None:
+            resultados[nombre] = {'omitido': f'sin credenciales de {rol}'}
+            continue
+        ruta = plantilla.format(**parametros)
+        resultados[nombre] = {
+            servidor: {
+                str(nivel): medir(lambda base=base, rol=rol: _ClienteHTTP(base, cookies.get(rol)),
+                                  ruta, max(requests, nivel), nivel)
+                for nivel in niveles
+            }
+            for servidor, base in bases.items()
+        }
+
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'servidores': bases,
+        'niveles': list(niveles),
+        'django': django.get_version(),
+        'parametros': parametros,
+        'endpoints': resultados,
+    }
+
+
+def comparar(anterior, actual):
+    """Diferencias por endpoint entre dos reportes (valores > 1 en las razones = peor)."""
+    diferencias = {}
+    for nombre, nuevo in actual['endpoints'].items():
+        viejo = anterior.get('endpoints', {}).get(nombre)
+        if not viejo or 'omitido' in viejo or 'omitido' in nuevo:
+            continue
+        fila = {
+            'p50': _razon(nuevo['latencia_ms']['p50'], viejo['latencia_ms']['p50']),
+            'p95': _razon(nuevo['latencia_ms']['p95'], viejo['latencia_ms']['p95']),
+            'p99': _razon(nuevo['latencia_ms']['p99'], viejo['latencia_ms']['p99']),
+            'throughput': _razon(viejo['throughput_rps'], nuevo['throughput_rps']),
+        }
+        if nuevo.get('consultas') and viejo.get('consultas'):
+            fila['consultas_max'] = nuevo['consultas']['max'] - viejo['consultas']['max']
+        diferencias[nombre] = fila
+    return diferencias
+
+
+def _razon(a, b):
+    return round(a / b, 3) if a and b else None
+
+
+def cargar(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+# ---------- Escrituras concurrentes ----------
+
+def _trabajador_escrituras(indice, operaciones, libro_ids, semilla):
+    """
+    Corre en un proceso hijo: agrega `operaciones` libros al carrito de su
+    propio usuario por el endpoint real y devuelve tiempos y errores.
+    """
+    import random
+
+    import django
+    django.setup()
+    from .models import User
+
+    usuario, _ = User.objects.get_or_create(username=f'bench_escritor_{indice}')
+    cliente = Client(HTTP_HOST='localhost')
+    cliente.force_login(usuario)
+    carrito = cliente.get('/api/compras/mi-carrito/?fields=id').json()['id']
+    rng = random.Random(semilla + indice)
+
+    latencias, estados, bloqueos = [], {}, 0
+    inicio = time.time()
+    for _ in range(operaciones):
+        items = [{'libro_id': rng.choice(libro_ids), 'cantidad': 1}]
+        t0 = time.perf_counter()
+        try:
+            response = cliente.post(f'/api/compras/{carrito}/agregar-items/?fields=id',
+                                    {'items': items}, content_type='application/json')
+            estados[response.status_code] = estados.get(response.status_code, 0) + 1
+        except OperationalError:
+            # "database is locked": el escritor se quedó sin esperar el lock.
+            bloqueos += 1
+        latencias.append(time.perf_counter() - t0)
+    fin = time.time()
+    connection.close()
+    return {'inicio': inicio, 'fin': fin, 'latencias': latencias, 'estados': estados, 'bloqueos': bloqueos}
+
+
+def escrituras(trabajadores=4, operaciones=200, semilla=42):
+    """Throughput de escritura con `trabajadores` procesos escribiendo a la vez."""
+    from django.conf import settings
+    from .models import Libro
+
+    libro_ids = list(Libro.objects.values_list('id', flat=True)[:1000])
+    if not libro_ids:
+        raise ValueError('No hay libros: correr antes manage.py seed_bench')
+    base = settings.DATABASES['default']
+    with connection.cursor() as cursor:
+        modo = None
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA journal_mode')
+            modo = cursor.fetchone()[0]
+    connection.close()
+
+    with ProcessPoolExecutor(max_workers=trabajadores, mp_context=get_context('spawn')) as pool:
+        resultados = list(pool.map(
+            _trabajador_escrituras,
+            range(trabajadores), [operaciones] * trabajadores,
+            [libro_ids] * trabajadores, [semilla] * trabajadores,
+        ))
+
+    latencias = [l for r in resultados for l in r['latencias']]
+    estados = {}
+    for r in resultados:
+        for estado, n in r['estados'].items():
+            estados[str(estado)] = estados.get(str(estado), 0) + n
+    duracion = max(r['fin'] for r in resultados) - min(r['inicio'] for r in resultados)
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'base_de_datos': {
+            'motor': base['ENGINE'],
+            'perfil': getattr(settings, 'DB_PERFIL', None),
+            'journal_mode': modo,
+            'conn_max_age': base.get('CONN_MAX_AGE'),
+            'pool': base.get('OPTIONS', {}).get('pool'),
+        },
+        'trabajadores': trabajadores,
+        'operaciones': len(latencias),
+        'estados': estados,
+        'bloqueos': sum(r['bloqueos'] for r in resultados),
+        'throughput_ops': round(len(latencias) / duracion, 2) if duracion else None,
+        'latencia_ms': {
+            'p50': round(_percentil(latencias, 50) * 1000, 3),
+            'p95': round(_percentil(latencias, 95) * 1000, 3),
+            'p99': round(_percentil(latencias, 99) * 1000, 3),
+            'max': round(max(latencias) * 1000, 3),
+        },
+    }
@@ -0,0 +1,96 @@
+"""
+Versión del catálogo público y GET condicional (ETag / Last-Modified).
+
+Cualquier cambio en Libro, Genero, sus géneros o las ventas incrementa la
+versión (ver core.signals y core.ventas). Las vistas decoradas con
+`condicional` responden 304 a If-None-Match / If-Modified-Since comparando
+solo contra la caché, sin tocar el ORM.
+"""
+import functools
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import versiones
+
+VERSION_KEY = 'catalogo:version'
+MODIFICADO_KEY = 'catalogo:modificado'
+
+# Acciones de solo lectura del catálogo que no dependen del usuario.
+ACCIONES_PUBLICAS = {'list', 'retrieve', 'top_libros', 'libros', 'top', 'buscar', 'facetas', 'relacionados'}
+
+
+def version_actual():
+    return versiones.leer(VERSION_KEY)
+
+
+def ultima_modificacion():
+    modificado = cache.get(MODIFICADO_KEY)
+    if modificado is None:
+        cache.add(MODIFICADO_KEY, int(time.time()), timeout=None)
+        modificado = cache.get(MODIFICADO_KEY)
+    return modificado
+
+
+def invalidar():
+    from . import snapshot
+
+    cache.set(MODIFICADO_KEY, int(time.time()), timeout=None)
+    version = versiones.incrementar(VERSION_KEY)
+    snapshot.programar()
+    return version
+
+
+def etag_actual():
+    return f'"catalogo-{version_actual()}"'
+
+
+def _validadores():
+    return etag_actual(), ultima_modificacion()
+
+
+def _marcar(response, etag, modificado):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modificado)
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def condicional(vista):
+    """Añade ETag/Last-Modified a la respuesta y contesta 304 si el cliente ya la tiene."""
+    @functools.wraps(vista)
+    def wrapper(self, request, *args, **kwargs):
+        etag, modificado = _validadores()
+        no_modificado = get_conditional_response(request, etag=etag, last_modified=modificado)
+        if no_modificado is not None:
+            return no_modificado
+        return _marcar(vista(self, request, *args, **kwargs), etag, modificado)
+    return wrapper
+
+
+def condicional_async(vista):
+    """`condicional` para vistas async de función (core.views.async_views)."""
+    @functools.wraps(vista)
+    async def wrapper(request, *args, **kwargs):
+        etag, modificado = await sync_to_async(_validadores)()
+        no_modificado = get_conditional_response(request, etag=etag, last_modified=modificado)
+        if no_modificado is not None:
+            return no_modificado
+        return _marcar(await vista(request, *args, **kwargs), etag, modificado)
+    return wrapper
+
+
+class CatalogoPublicoMixin:
+    """
+    Las lecturas públicas del catálogo no autentican por adelantado, así un
+    304 no paga la carga de la sesión ni del usuario.
+    """
+
+    def perform_authentication(self, request):
+        if self.action in ACCIONES_PUBLICAS:
+            return
+        super().perform_authentication(request)
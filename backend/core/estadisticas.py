@@ -0,0 +1,81 @@
+"""
+Tablas de acumulados diarios de ventas (por libro y por género).
+
+`aplicar` suma o resta las compras indicadas a los acumulados de su día
+(fecha de la compra) con un número fijo de consultas; se llama desde
+core.ventas dentro de la misma transacción que el cambio de estado. Los
+reportes leen solo estas tablas, nunca Compra/ItemCompra.
+"""
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+from .models import ItemCompra, VentaDiariaGenero, VentaDiariaLibro
+
+TAMANO_LOTE = 1000
+_INGRESOS = Sum(F('precio_unitario') * F('cantidad'),
+                output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _agregados(items, clave):
+    """Filas {fecha, <clave>, unidades, ingresos} agrupadas por día y `clave`."""
+    return (
+        items.annotate(dia=TruncDate('compra__fecha'))
+        .values('dia', clave)
+        .annotate(unidades=Sum('cantidad'), ingresos=_INGRESOS)
+        .order_by()
+    )
+
+
+def _acumular(modelo, campo, clave_fila, filas, signo):
+    """
+    Upsert sobre la restricción única (fecha, <campo>): inserta los días
+    nuevos y suma a los que ya estaban en la misma sentencia, así dos
+    confirmaciones simultáneas del mismo día no chocan al insertar.
+    """
+    filas = [f for f in filas if f[clave_fila] is not None]
+    if not filas:
+        return
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {tabla} (fecha, {campo}_id, unidades, ingresos) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (fecha, {campo}_id) DO UPDATE SET '
+            f'unidades = {tabla}.unidades + excluded.unidades, ingresos = {tabla}.ingresos + excluded.ingresos',
+            [
+                (connection.ops.adapt_datefield_value(fila['dia']), fila[clave_fila], signo * fila['unidades'],
+                 connection.ops.adapt_decimalfield_value(signo * fila['ingresos'], 12, 2))
+                for fila in filas
+            ],
+        )
+
+
+def aplicar(compra_ids, signo=1):
+    """Suma (signo=1) o resta (signo=-1) las compras a los acumulados diarios."""
+    items = ItemCompra.objects.filter(compra_id__in=compra_ids)
+    _acumular(VentaDiariaLibro, 'libro', 'libro', _agregados(items, 'libro'), signo)
+    _acumular(VentaDiariaGenero, 'genero', 'libro__generos',
+              _agregados(items.filter(libro__generos__isnull=False), 'libro__generos'), signo)
+
+
+@transaction.atomic
+def reconstruir():
+    """Recalcula todos los acumulados desde las compras CONFIRMADA."""
+    VentaDiariaLibro.objects.all().delete()
+    VentaDiariaGenero.objects.all().delete()
+    items = ItemCompra.objects.filter(compra__estado='CONFIRMADA')
+    totales = {}
+    for modelo, campo, clave in ((VentaDiariaLibro, 'libro', 'libro'),
+                                 (VentaDiariaGenero, 'genero', 'libro__generos')):
+        filas = _agregados(items.filter(**{f'{clave}__isnull': False}), clave)
+        lote, total = [], 0
+        for fila in filas.iterator(chunk_size=TAMANO_LOTE):
+            lote.append(modelo(fecha=fila['dia'], unidades=fila['unidades'],
+                               ingresos=fila['ingresos'], **{f'{campo}_id': fila[clave]}))
+            if len(lote) >= TAMANO_LOTE:
+                modelo.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        modelo.objects.bulk_create(lote)
+        totales[campo] = total + len(lote)
+    return totales
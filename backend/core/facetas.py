@@ -0,0 +1,143 @@
+"""
+Facetas del catálogo: cuántos libros hay por género, por tramo de precio y
+por autor para un filtro (géneros, rango de precio y texto).
+
+Cada faceta sale de una sola consulta agrupada, sin traer los libros. Las
+de géneros y precios ignoran su propio filtro (facetas disyuntivas): con
+?generos=3 se siguen viendo los conteos del resto de géneros, para poder
+sumarlos al filtro. La de autores y el total aplican todos.
+
+El resultado se guarda en la caché por versión del catálogo y filtro
+normalizado; cualquier cambio del catálogo (catalogo.invalidar) lo deja
+obsoleto.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import catalogo, search
+from .models import Libro
+
+# Límites inferiores de los tramos de precio; el último no tiene tope.
+TRAMOS_PRECIO = (Decimal('0'), Decimal('10'), Decimal('25'), Decimal('50'), Decimal('100'), Decimal('250'))
+AUTORES_MAX = 20
+ID_MAXIMO = 2 ** 63 - 1
+TIMEOUT = 3600
+
+
+class FiltroInvalido(ValueError):
+    pass
+
+
+def _precio(params, nombre):
+    valor = params.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        precio = Decimal(valor)
+    except InvalidOperation:
+        raise FiltroInvalido(f'{nombre} inválido')
+    if not precio.is_finite() or precio < 0:
+        raise FiltroInvalido(f'{nombre} inválido')
+    return precio
+
+
+def leer_filtro(params):
+    """Filtro normalizado de los query params: generos=1,2 precio_min precio_max q."""
+    generos = set()
+    for valor in params.getlist('generos'):
+        for parte in valor.split(','):
+            if parte.strip():
+                try:
+                    genero = int(parte)
+                except ValueError:
+                    raise FiltroInvalido('generos inválido')
+                # Fuera del rango de INTEGER la consulta fallaría con OverflowError.
+                if not 1 <= genero <= ID_MAXIMO:
+                    raise FiltroInvalido('generos inválido')
+                generos.add(genero)
+    return {
+        'generos': sorted(generos),
+        'precio_min': _precio(params, 'precio_min'),
+        'precio_max': _precio(params, 'precio_max'),
+        'texto': params.get('q', '').strip(),
+    }
+
+
+def _condiciones(filtro):
+    """Q por criterio, para poder dejar afuera el de la faceta que se calcula."""
+    condiciones = {'generos': Q(), 'precio': Q(), 'texto': Q()}
+    if filtro['generos']:
+        con_generos = Libro.generos.through.objects.filter(genero_id__in=filtro['generos']).values('libro_id')
+        condiciones['generos'] = Q(id__in=con_generos)
+    if filtro['precio_min'] is not None:
+        condiciones['precio'] &= Q(precio__gte=filtro['precio_min'])
+    if filtro['precio_max'] is not None:
+        condiciones['precio'] &= Q(precio__lte=filtro['precio_max'])
+    # Un texto sin palabras (solo signos) no filtra.
+    if search.construir_consulta(filtro['texto']):
+        condiciones['texto'] = search.filtro(filtro['texto'])
+    return condiciones
+
+
+def _libros(condiciones, excepto=None):
+    q = Q()
+    for nombre, condicion in condiciones.items():
+        if nombre != excepto:
+            q &= condicion
+    return Libro.objects.filter(q)
+
+
+def _generos(condiciones):
+    libros = _libros(condiciones, excepto='generos').values('id')
+    filas = (Libro.generos.through.objects.filter(libro_id__in=libros)
+             .values('genero_id', 'genero__nombre').annotate(cantidad=Count('libro_id'))
+             .order_by('-cantidad', 'genero__nombre'))
+    return [{'id': f['genero_id'], 'nombre': f['genero__nombre'], 'cantidad': f['cantidad']} for f in filas]
+
+
+def _precios(condiciones):
+    """Histograma y total en una sola fila: un COUNT filtrado por tramo."""
+    limites = list(TRAMOS_PRECIO) + [None]
+    conteos = {
+        f't{i}': Count('id', filter=Q(precio__gte=desde) & (Q(precio__lt=hasta) if hasta is not None else Q()))
+        for i, (desde, hasta) in enumerate(zip(limites, limites[1:]))
+    }
+    conteos['total'] = Count('id', filter=condiciones['precio']) if condiciones['precio'] else Count('id')
+    fila = _libros(condiciones, excepto='precio').aggregate(**conteos)
+    tramos = [
+        {'desde': f'{desde:.2f}', 'hasta': f'{hasta:.2f}' if hasta is not None else None, 'cantidad': fila[f't{i}']}
+        for i, (desde, hasta) in enumerate(zip(limites, limites[1:]))
+    ]
+    return fila['total'], tramos
+
+
+def _autores(condiciones):
+    filas = (_libros(condiciones).values('autor').annotate(cantidad=Count('id'))
+             .order_by('-cantidad', 'autor')[:AUTORES_MAX])
+    return [{'autor': f['autor'], 'cantidad': f['cantidad']} for f in filas]
+
+
+def calcular(filtro):
+    condiciones = _condiciones(filtro)
+    total, precios = _precios(condiciones)
+    return {'total': total, 'generos': _generos(condiciones), 'precios': precios, 'autores': _autores(condiciones)}
+
+
+def _clave(filtro, version):
+    normalizado = repr((filtro['generos'], filtro['precio_min'], filtro['precio_max'],
+                        search.construir_consulta(filtro['texto'])))
+    return f'facetas:{version}:{hashlib.sha1(normalizado.encode("utf-8")).hexdigest()}'
+
+
+def facetas(filtro):
+    """`calcular(filtro)` desde la caché de la versión actual del catálogo."""
+    # La versión se lee antes de calcular: si cambia en medio, el resultado queda bajo la vieja.
+    clave = _clave(filtro, catalogo.version_actual())
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular(filtro)
+        cache.set(clave, datos, TIMEOUT)
+    return datos
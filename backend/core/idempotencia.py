@@ -0,0 +1,62 @@
+"""
+Soporte para la cabecera `Idempotency-Key` en acciones POST.
+
+La primera respuesta (no 5xx) se guarda en la caché de Django por usuario,
+ruta y clave; los reintentos con la misma clave reciben esa misma respuesta
+sin volver a ejecutar la vista. Mientras la primera petición está en curso
+los reintentos reciben 409.
+
+Con varios procesos la caché tiene que ser compartida y con `add` atómico
+(Redis o la tabla de caché, ver CACHE_* en settings): si no, un reintento
+que llega a otro proceso vuelve a ejecutar la vista.
+"""
+import functools
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+TTL = 60 * 60 * 24
+TTL_EN_CURSO = 60
+EN_CURSO = 'en-curso'
+
+
+def _cache_key(request, clave):
+    return f'idempotencia:{request.user.pk}:{request.path}:{clave}'
+
+
+def idempotente(vista):
+    @functools.wraps(vista)
+    def wrapper(self, request, *args, **kwargs):
+        clave = request.headers.get(HEADER)
+        if not clave:
+            return vista(self, request, *args, **kwargs)
+        if len(clave) > 255:
+            return Response({'detail': f'{HEADER} demasiado larga'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = _cache_key(request, clave)
+        guardada = cache.get(cache_key)
+        if guardada is None and cache.add(cache_key, EN_CURSO, timeout=TTL_EN_CURSO):
+            try:
+                response = vista(self, request, *args, **kwargs)
+            except Exception:
+                cache.delete(cache_key)
+                raise
+            if response.status_code >= 500:
+                cache.delete(cache_key)
+            else:
+                cache.set(cache_key, (response.status_code, response.data), timeout=TTL)
+            return response
+
+        guardada = guardada or cache.get(cache_key)
+        if guardada is None or guardada == EN_CURSO:
+            return Response(
+                {'detail': 'Ya hay una solicitud en curso con esta clave de idempotencia'},
+                status=status.HTTP_409_CONFLICT
+            )
+        status_code, data = guardada
+        response = Response(data, status=status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+    return wrapper
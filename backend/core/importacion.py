@@ -0,0 +1,180 @@
+"""
+Importación masiva de libros desde CSV o JSONL.
+
+Las filas se leen en streaming y se procesan por lotes: validación con las
+mismas reglas que LibroSerializer, upsert por `isbn` con
+`bulk_create(update_conflicts=True)`, géneros resueltos/creados en una sola
+consulta por lote y la tabla intermedia escrita en bloque. Una fila inválida
+se reporta y se salta; no aborta la importación.
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import catalogo, ranking
+from .models import Genero, Libro
+from .serializers import validar_isbn, validar_precio
+
+TAMANO_LOTE = 1000
+MAX_ERRORES_REPORTADOS = 1000
+CAMPOS_ACTUALIZABLES = ['titulo', 'autor', 'precio', 'descripcion', 'fecha_actualizacion']
+
+
+class FilaLibroSerializer(serializers.Serializer):
+    titulo = serializers.CharField(max_length=200)
+    autor = serializers.CharField(max_length=200)
+    precio = serializers.DecimalField(max_digits=8, decimal_places=2)
+    isbn = serializers.CharField(max_length=20)
+    descripcion = serializers.CharField(allow_blank=True, required=False, default='')
+    portada = serializers.CharField(allow_blank=True, required=False, default='')
+    generos = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+
+    def to_internal_value(self, data):
+        # En CSV los géneros vienen como "Novela|Drama"; vacío = no tocar los actuales.
+        generos = data.get('generos')
+        if isinstance(generos, str) or generos is None:
+            data = {k: v for k, v in data.items() if k != 'generos'}
+            if generos and generos.strip():
+                data['generos'] = [g.strip() for g in generos.split('|') if g.strip()]
+        return super().to_internal_value(data)
+
+    def validate_precio(self, value):
+        return validar_precio(value)
+
+    def validate_isbn(self, value):
+        return validar_isbn(value)
+
+
+def detectar_formato(nombre):
+    return 'jsonl' if nombre.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def _lineas(archivo, invalidas):
+    """
+    Líneas de `archivo` decodificadas de a una como UTF-8. Una línea con
+    bytes inválidos se decodifica con reemplazos y se cuenta en
+    `invalidas['lineas']`, así la fila se reporta como error sin cortar la
+    importación.
+    """
+    for numero, linea in enumerate(archivo):
+        if numero == 0 and linea.startswith(codecs.BOM_UTF8):
+            linea = linea[len(codecs.BOM_UTF8):]
+        try:
+            yield linea.decode('utf-8')
+        except UnicodeDecodeError:
+            invalidas['lineas'] += 1
+            yield linea.decode('utf-8', errors='replace')
+
+
+def leer_filas(archivo, formato):
+    """Genera (número de fila, dict o None si no se pudo parsear) sin cargar el archivo entero."""
+    # `archivo` es un binario (archivo abierto en 'rb' o UploadedFile) que se recorre por líneas.
+    invalidas = {'lineas': 0}
+    texto = _lineas(archivo, invalidas)
+
+    if formato == 'csv':
+        lector = csv.DictReader(texto)
+        if lector.fieldnames is None:
+            return
+        numero = 1
+        while True:
+            vistas = invalidas['lineas']
+            try:
+                fila = next(lector)
+            except StopIteration:
+                return
+            except csv.Error:
+                fila = None
+            numero += 1
+            yield numero, fila if invalidas['lineas'] == vistas else None
+
+    vistas = 0
+    for numero, linea in enumerate(texto, start=1):
+        valida, vistas = invalidas['lineas'] == vistas, invalidas['lineas']
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea) if valida else None
+        except ValueError:
+            fila = None
+        yield numero, fila if isinstance(fila, dict) else None
+
+
+def importar(filas, tamano_lote=TAMANO_LOTE):
+    """Importa un iterable de (número, fila) y devuelve el resumen."""
+    resumen = {'procesadas': 0, 'importadas': 0, 'errores': 0, 'detalle_errores': []}
+    filas = iter(filas)
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            break
+        validas = []
+        for numero, fila in lote:
+            resumen['procesadas'] += 1
+            if fila is None:
+                _registrar_error(resumen, numero, {'fila': ['No se pudo leer la fila']})
+                continue
+            serializer = FilaLibroSerializer(data=fila)
+            if serializer.is_valid():
+                validas.append(serializer.validated_data)
+            else:
+                _registrar_error(resumen, numero, serializer.errors)
+        if validas:
+            resumen['importadas'] += _guardar_lote(validas)
+
+    if resumen['importadas']:
+        catalogo.invalidar()
+        ranking.invalidar()
+    return resumen
+
+
+def _registrar_error(resumen, numero, errores):
+    resumen['errores'] += 1
+    if len(resumen['detalle_errores']) < MAX_ERRORES_REPORTADOS:
+        resumen['detalle_errores'].append({'fila': numero, 'errores': errores})
+
+
+@transaction.atomic
+def _guardar_lote(filas):
+    # Si un isbn se repite dentro del lote gana la última fila.
+    por_isbn = {fila['isbn']: fila for fila in filas}
+
+    nombres = {nombre for fila in por_isbn.values() for nombre in fila.get('generos') or ()}
+    generos = {}
+    if nombres:
+        Genero.objects.bulk_create([Genero(nombre=n) for n in nombres], ignore_conflicts=True)
+        generos = dict(Genero.objects.filter(nombre__in=nombres).values_list('nombre', 'id'))
+
+    con_portada, sin_portada = [], []
+    for isbn, fila in por_isbn.items():
+        libro = Libro(
+            isbn=isbn,
+            titulo=fila['titulo'],
+            autor=fila['autor'],
+            precio=fila['precio'],
+            descripcion=fila.get('descripcion', ''),
+            portada=fila.get('portada', ''),
+        )
+        (con_portada if libro.portada else sin_portada).append(libro)
+    for libros, campos in ((con_portada, CAMPOS_ACTUALIZABLES + ['portada']),
+                           (sin_portada, CAMPOS_ACTUALIZABLES)):
+        if libros:
+            Libro.objects.bulk_create(
+                libros, update_conflicts=True, unique_fields=['isbn'], update_fields=campos
+            )
+
+    con_generos = [isbn for isbn, fila in por_isbn.items() if 'generos' in fila]
+    if con_generos:
+        ids = dict(Libro.objects.filter(isbn__in=con_generos).values_list('isbn', 'id'))
+        through = Libro.generos.through
+        through.objects.filter(libro_id__in=ids.values()).delete()
+        through.objects.bulk_create([
+            through(libro_id=ids[isbn], genero_id=generos[nombre])
+            for isbn in con_generos
+            for nombre in set(por_isbn[isbn]['generos'])
+        ], ignore_conflicts=True)
+    return len(por_isbn)
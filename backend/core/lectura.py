@@ -0,0 +1,119 @@
+"""
+Camino rápido de lectura para los listados públicos de libros.
+
+Arma la misma salida que LibroSerializer(many=True) sin instanciar modelos
+ni recorrer los campos de DRF por fila: los libros salen de `.values()`, los
+géneros de una sola consulta agrupada (la misma que haría el prefetch) y el
+prefijo absoluto de MEDIA_URL se resuelve una vez por request en lugar de
+llamar a build_absolute_uri por cada URL. core/tests.py verifica que el JSON
+resultante sea idéntico byte a byte al del serializer.
+
+Las variantes `a...` hacen lo mismo con el ORM async, para las vistas de
+core.views.async_views.
+"""
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils.encoding import filepath_to_uri
+
+from . import portadas
+from .models import Genero, Libro
+
+CAMPOS = ('id', 'titulo', 'autor', 'precio', 'isbn', 'descripcion', 'portada',
+          'portada_variantes', 'ventas_totales')
+CENTAVOS = Decimal('0.01')
+
+
+def filas(queryset):
+    """Queryset de libros como dicts con las columnas que usa `serializar`."""
+    return queryset.prefetch_related(None).values(*CAMPOS)
+
+
+def _consulta_generos(libro_ids):
+    return (
+        Genero.objects.filter(libros__in=libro_ids)
+        .annotate(libro=F('libros__id'))
+        .values_list('libro', 'id', 'nombre')
+    )
+
+
+def _agrupar_generos(resultado, libro_id, genero_id, nombre):
+    resultado.setdefault(libro_id, []).append({'id': genero_id, 'nombre': nombre})
+
+
+def generos_por_libro(libro_ids):
+    """{libro_id: [{'id', 'nombre'}, ...]} en el mismo orden que el prefetch de `generos`."""
+    resultado = {}
+    if libro_ids:
+        for fila in _consulta_generos(libro_ids):
+            _agrupar_generos(resultado, *fila)
+    return resultado
+
+
+async def agenerados_por_libro(libro_ids):
+    resultado = {}
+    if libro_ids:
+        async for fila in _consulta_generos(libro_ids):
+            _agrupar_generos(resultado, *fila)
+    return resultado
+
+
+def url_absoluta(request=None):
+    """Función nombre de archivo -> URL igual a la de ImageField.to_representation."""
+    base = default_storage.base_url
+    if request is not None:
+        base = request.build_absolute_uri(base)
+
+    def absoluta(nombre):
+        return base + filepath_to_uri(nombre).lstrip('/')
+    return absoluta
+
+
+def _armar(filas_libros, generos, request):
+    absoluta = url_absoluta(request)
+    return [
+        {
+            'id': fila['id'],
+            'titulo': fila['titulo'],
+            'autor': fila['autor'],
+            'precio': '{:f}'.format(fila['precio'].quantize(CENTAVOS)),
+            'isbn': fila['isbn'],
+            'descripcion': fila['descripcion'],
+            'portada': absoluta(fila['portada']) if fila['portada'] else None,
+            'portadas': portadas.urls_de_variantes(fila['portada_variantes'], absoluta),
+            'generos': generos.get(fila['id'], []),
+            'ventas_totales': fila['ventas_totales'],
+        }
+        for fila in filas_libros
+    ]
+
+
+def serializar(filas_libros, request=None):
+    """Lista de dicts lista para Response a partir de filas de `filas()`."""
+    filas_libros = list(filas_libros)
+    generos = generos_por_libro([fila['id'] for fila in filas_libros])
+    return _armar(filas_libros, generos, request)
+
+
+async def aserializar(filas_libros, request=None):
+    """`serializar` para un queryset de `filas()` (se itera async) o una lista ya leída."""
+    if hasattr(filas_libros, '__aiter__'):
+        filas_libros = [fila async for fila in filas_libros]
+    generos = await agenerados_por_libro([fila['id'] for fila in filas_libros])
+    return _armar(filas_libros, generos, request)
+
+
+def _por_ids(ids, por_id):
+    return [por_id[i] for i in ids if i in por_id]
+
+
+def serializar_ids(ids, request=None):
+    """Como `serializar`, para una lista de ids en el orden dado (p. ej. un ranking)."""
+    por_id = {fila['id']: fila for fila in filas(Libro.objects.filter(id__in=ids))}
+    return serializar(_por_ids(ids, por_id), request)
+
+
+async def aserializar_ids(ids, request=None):
+    por_id = {fila['id']: fila async for fila in filas(Libro.objects.filter(id__in=ids))}
+    return await aserializar(_por_ids(ids, por_id), request)
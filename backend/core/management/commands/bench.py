@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide throughput, latencia (p50/p95/p99) y consultas SQL de los endpoints de la API '
+        'y escribe el reporte en JSON. Usar después de seed_bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests por endpoint.')
+        parser.add_argument('--concurrencia', type=int, default=1)
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            choices=[nombre for nombre, _, _ in benchmark.ESCENARIOS],
+                            help='Repetible; por defecto todos.')
+        parser.add_argument('--url', default=None,
+                            help='Servidor ya levantado (p. ej. http://localhost:8000). '
+                                 'Sin --url se usa el cliente de test en proceso.')
+        parser.add_argument('--cookie-usuario', default=None, help='Cookie de sesión para --url.')
+        parser.add_argument('--cookie-admin', default=None, help='Cookie de sesión para --url.')
+        parser.add_argument('--salida', default=None, help='Archivo JSON; por defecto stdout.')
+        parser.add_argument('--comparar', default=None, help='Reporte anterior contra el cual comparar.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrencia'] < 1:
+            raise CommandError('--requests y --concurrencia deben ser positivos.')
+
+        usuario = admin = None
+        if not options['url']:
+            usuario = (User.objects.filter(username__startswith='bench_', compras__estado='CARRITO')
+                       .order_by('id').first()
+                       or User.objects.filter(is_staff=False).order_by('id').first())
+            admin = User.objects.filter(is_staff=True).order_by('id').first()
+
+        reporte = benchmark.ejecutar(
+            escenarios=options['endpoints'],
+            requests=options['requests'],
+            concurrencia=options['concurrencia'],
+            base_url=options['url'],
+            usuario=usuario,
+            admin=admin,
+            cookies={'usuario': options['cookie_usuario'], 'admin': options['cookie_admin']},
+        )
+        if options['comparar']:
+            try:
+                reporte['comparacion'] = benchmark.comparar(benchmark.cargar(options['comparar']), reporte)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {exc}')
+
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Reporte escrito en {options["salida"]}'))
+        else:
+            self.stdout.write(texto)
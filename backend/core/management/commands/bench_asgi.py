@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara un servidor ASGI y uno WSGI (ya levantados sobre la misma base) en los '
+        'endpoints con vista async, con concurrencias crecientes. Por ejemplo, con un solo '
+        'proceso cada uno: "uvicorn core_project.asgi:application --port 8001" y '
+        '"gunicorn core_project.wsgi --threads 8 --bind :8002".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asgi', required=True, help='URL del servidor ASGI.')
+        parser.add_argument('--wsgi', required=True, help='URL del servidor WSGI.')
+        parser.add_argument('--niveles', default='1,16,64',
+                            help='Concurrencias a probar, separadas por coma.')
+        parser.add_argument('--requests', type=int, default=400, help='Requests por endpoint y nivel.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            choices=benchmark.ESCENARIOS_ASYNC, help='Repetible; por defecto todos.')
+        parser.add_argument('--cookie-usuario', default=None,
+                            help='Cookie de sesión para auth-user y mi-carrito.')
+        parser.add_argument('--salida', default=None, help='Archivo JSON; por defecto stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            niveles = [int(n) for n in options['niveles'].split(',')]
+        except ValueError:
+            raise CommandError('--niveles debe ser una lista de enteros separados por coma.')
+        if options['requests'] < 1 or min(niveles) < 1:
+            raise CommandError('--requests y --niveles deben ser positivos.')
+
+        reporte = benchmark.servidores(
+            {'asgi': options['asgi'], 'wsgi': options['wsgi']},
+            niveles=niveles,
+            requests=options['requests'],
+            escenarios=options['endpoints'],
+            cookies={'usuario': options['cookie_usuario']},
+        )
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Reporte escrito en {options["salida"]}'))
+        else:
+            self.stdout.write(texto)
+
+        for nombre, por_servidor in reporte['endpoints'].items():
+            if 'omitido' in por_servidor:
+                continue
+            for nivel in niveles:
+                fila = '  '.join(
+                    f'{servidor} {r[str(nivel)]["throughput_rps"]:>8} rps p99 {r[str(nivel)]["latencia_ms"]["p99"]:>8} ms'
+                    for servidor, r in por_servidor.items()
+                )
+                self.stderr.write(f'{nombre:<20} c={nivel:<4} {fila}')
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el throughput de escritura (agregar ítems al carrito) con N procesos '
+        'concurrentes contra la base configurada. Comparar perfiles con DB_PERFIL/DB_MOTOR.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trabajadores', type=int, default=4)
+        parser.add_argument('--operaciones', type=int, default=200, help='Escrituras por trabajador.')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', default=None, help='Archivo JSON; por defecto stdout.')
+
+    def handle(self, *args, **options):
+        if options['trabajadores'] < 1 or options['operaciones'] < 1:
+            raise CommandError('--trabajadores y --operaciones deben ser positivos.')
+        try:
+            reporte = benchmark.escrituras(options['trabajadores'], options['operaciones'], options['semilla'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Reporte escrito en {options["salida"]}'))
+        else:
+            self.stdout.write(texto)
@@ -0,0 +1,45 @@
+from concurrent.futures import as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core import portadas
+from core.models import Libro
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes de portada (thumb/card/full, WebP y JPEG) de los libros existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=None,
+                            help='Procesos en paralelo (por defecto PORTADAS_PROCESOS).')
+        parser.add_argument('--todas', action='store_true',
+                            help='Regenera también las que ya tienen variantes.')
+
+    def handle(self, *args, **options):
+        if options['procesos'] is not None and options['procesos'] < 1:
+            raise CommandError('--procesos tiene que ser mayor que 0')
+        libros = Libro.objects.exclude(portada='')
+        if not options['todas']:
+            libros = libros.filter(portada_variantes__isnull=True)
+
+        pool = portadas.get_pool(options['procesos'])
+        futuros = {}
+        for libro_id, nombre in libros.values_list('id', 'portada').iterator():
+            if not default_storage.exists(nombre):
+                self.stdout.write(self.style.WARNING(f'Libro {libro_id}: no existe {nombre}'))
+                continue
+            futuros[pool.submit(portadas.generar_archivos, default_storage.path(nombre))] = (libro_id, nombre)
+
+        generadas = errores = 0
+        for futuro in as_completed(futuros):
+            libro_id, nombre = futuros[futuro]
+            try:
+                portadas.guardar_variantes(libro_id, nombre, futuro.result())
+                generadas += 1
+            except Exception as exc:
+                errores += 1
+                self.stdout.write(self.style.ERROR(f'Libro {libro_id}: {exc}'))
+
+        pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f'Portadas generadas: {generadas}. Errores: {errores}.'))
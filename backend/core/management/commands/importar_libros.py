@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importacion
+
+
+class Command(BaseCommand):
+    help = 'Importa libros desde un archivo CSV o JSONL (upsert por ISBN).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], default=None,
+                            help='Por defecto se deduce de la extensión.')
+        parser.add_argument('--lote', type=int, default=importacion.TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or importacion.detectar_formato(options['archivo'])
+        try:
+            archivo = open(options['archivo'], 'rb')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with archivo:
+            resumen = importacion.importar(importacion.leer_filas(archivo, formato), options['lote'])
+
+        for error in resumen['detalle_errores']:
+            self.stdout.write(self.style.WARNING(
+                f"Fila {error['fila']}: {json.dumps(error['errores'], ensure_ascii=False)}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Procesadas: {resumen['procesadas']}. Importadas: {resumen['importadas']}. "
+            f"Con errores: {resumen['errores']}."
+        ))
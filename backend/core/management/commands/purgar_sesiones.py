@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import sesiones
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra las sesiones vencidas en lotes chicos, cada uno en su propia transacción, '
+        'para no bloquear la base mientras hay tráfico. Reemplaza a clearsessions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Sesiones borradas por transacción.')
+        parser.add_argument('--pausa', type=float, default=0.05, help='Segundos de espera entre lotes.')
+        parser.add_argument('--margen', type=int, default=3600,
+                            help='Solo borra las vencidas hace más de estos segundos: cubre las '
+                                 'renovaciones que todavía no se escribieron en la base.')
+
+    def handle(self, *args, **options):
+        total = sesiones.purgar_expiradas(lote=options['lote'], margen=options['margen'], pausa=options['pausa'])
+        self.stdout.write(self.style.SUCCESS(f'{total} sesiones vencidas borradas'))
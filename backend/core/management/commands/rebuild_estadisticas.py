@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los acumulados diarios de ventas desde las compras confirmadas.'
+
+    def handle(self, *args, **options):
+        totales = estadisticas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Acumulados reconstruidos: {totales['libro']} por libro, {totales['genero']} por género."
+        ))
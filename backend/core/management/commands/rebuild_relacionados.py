@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import relacionados
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye la tabla de libros comprados juntos (core/relacionados.py) desde las '
+        'compras confirmadas, contando los pares con NumPy de a lotes de compras.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=relacionados.TAMANO_LOTE,
+                            help='Compras por lote al contar los pares.')
+
+    def handle(self, *args, **options):
+        if relacionados.np is None:
+            raise CommandError('Este comando requiere numpy (pip install numpy).')
+        totales = relacionados.reconstruir(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Relacionados reconstruidos: {totales['filas']} vecinos de {totales['libros']} libros."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+from core.models import Libro
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice FTS5 de libros (usar después de importaciones masivas).'
+
+    def handle(self, *args, **options):
+        if not search.reconstruir_indice():
+            self.stdout.write(self.style.WARNING('El motor de base de datos no es SQLite; no hay índice FTS que reconstruir.'))
+            return
+        total = Libro.objects.count()
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido ({total} libros).'))
@@ -0,0 +1,41 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import tareas
+
+
+class Command(BaseCommand):
+    help = (
+        'Consume la cola de tareas (core/tareas.py) con un pool de procesos. '
+        'SIGTERM o Ctrl+C terminan después de las tareas en curso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=getattr(settings, 'TAREAS_PROCESOS', 2),
+                            help='Procesos del pool; 0 ejecuta las tareas en este mismo proceso.')
+        parser.add_argument('--intervalo', type=float, default=getattr(settings, 'TAREAS_INTERVALO', 1.0),
+                            help='Segundos de espera cuando no hay tareas disponibles.')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Termina cuando no quedan tareas disponibles en vez de seguir esperando.')
+
+    def handle(self, *args, **options):
+        procesos = options['procesos']
+        if procesos < 0:
+            raise CommandError('--procesos no puede ser negativo (0 ejecuta en este proceso)')
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo tiene que ser mayor que 0')
+        if procesos == 0:
+            tareas.recuperar_vencidas()
+            total = tareas.ejecutar_pendientes()
+            self.stdout.write(self.style.SUCCESS(f'{total} tareas ejecutadas'))
+            return
+
+        detener = threading.Event()
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(senal, lambda *_: detener.set())
+        self.stdout.write(f'Consumiendo tareas con {procesos} procesos')
+        tareas.consumir(procesos, detener, intervalo=options['intervalo'], una_vez=options['una_vez'])
+        self.stdout.write(self.style.SUCCESS('Workers detenidos'))
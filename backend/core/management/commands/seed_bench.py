@@ -0,0 +1,186 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core import catalogo, estadisticas, ranking, search
+from core.models import Compra, Genero, ItemCompra, Libro, User
+
+PREFIJO = 'bench'
+PASSWORD = 'bench1234'
+TAMANO_LOTE = 1000
+
+PALABRAS = (
+    'sombra viento mar noche ciudad río tiempo memoria fuego silencio casa jardín '
+    'camino luz invierno guerra amor isla frontera espejo tierra cielo lluvia historia'
+).split()
+NOMBRES = 'Ana Luis María Jorge Elena Pablo Lucía Diego Sofía Martín Carmen Tomás'.split()
+APELLIDOS = 'García Pérez López Rojas Vargas Flores Mendoza Castro Ortiz Romero Suárez'.split()
+# Estados de las compras enviadas; los carritos se generan aparte (uno por usuario activo).
+ESTADOS = (('CONFIRMADA', 0.75), ('PENDIENTE', 0.15), ('RECHAZADA', 0.10))
+
+
+def _zipf(rng, n, s=1.1):
+    """Pesos tipo Zipf: pocos elementos concentran la mayor parte de las elecciones."""
+    pesos = [1 / (i ** s) for i in range(1, n + 1)]
+    rng.shuffle(pesos)
+    return pesos
+
+
+def _en_lotes(modelo, objetos):
+    for i in range(0, len(objetos), TAMANO_LOTE):
+        modelo.objects.bulk_create(objetos[i:i + TAMANO_LOTE])
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos para benchmarks (usuarios, géneros, libros y compras) '
+        'con inserciones en bloque. Reproducible con --semilla.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=500)
+        parser.add_argument('--generos', type=int, default=30)
+        parser.add_argument('--libros', type=int, default=10000)
+        parser.add_argument('--compras', type=int, default=5000)
+        parser.add_argument('--dias', type=int, default=180,
+                            help='Las compras se reparten en los últimos N días.')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--limpiar', action='store_true',
+                            help=f'Borra antes los datos generados por este comando (prefijo "{PREFIJO}").')
+
+    def handle(self, *args, **options):
+        if min(options['usuarios'], options['generos'], options['libros']) < 1:
+            raise CommandError('Se necesita al menos un usuario, un género y un libro.')
+        rng = random.Random(options['semilla'])
+
+        with transaction.atomic():
+            if options['limpiar']:
+                self._limpiar()
+            usuarios = self._usuarios(options['usuarios'])
+            generos = self._generos(rng, options['generos'])
+            libros = self._libros(rng, options['libros'], generos)
+            compras = self._compras(rng, options['compras'], options['dias'], usuarios, libros)
+            self._ventas_totales()
+            estadisticas.reconstruir()
+        search.reconstruir_indice()
+        catalogo.invalidar()
+        ranking.invalidar()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generados: {len(usuarios)} usuarios (password "{PASSWORD}"), {len(generos)} géneros, '
+            f'{len(libros)} libros, {compras} compras.'
+        ))
+
+    def _limpiar(self):
+        compras = Compra.objects.filter(usuario__username__startswith=f'{PREFIJO}_')
+        ItemCompra.objects.filter(compra__in=compras).delete()
+        compras.delete()
+        ItemCompra.objects.filter(libro__isbn__startswith='978' + PREFIJO).delete()
+        Libro.objects.filter(isbn__startswith='978' + PREFIJO).delete()
+        Genero.objects.filter(nombre__startswith=f'{PREFIJO} ').delete()
+        User.objects.filter(username__startswith=f'{PREFIJO}_').delete()
+
+    def _usuarios(self, n):
+        # Un solo hash para todos: make_password es deliberadamente lento.
+        password = make_password(PASSWORD)
+        existentes = User.objects.filter(username__startswith=f'{PREFIJO}_').count()
+        _en_lotes(User, [
+            User(username=f'{PREFIJO}_{i}', email=f'{PREFIJO}_{i}@example.com', password=password)
+            for i in range(existentes, existentes + n)
+        ])
+        return list(User.objects.filter(username__startswith=f'{PREFIJO}_')
+                    .order_by('-id').values_list('id', flat=True)[:n])
+
+    def _generos(self, rng, n):
+        existentes = Genero.objects.filter(nombre__startswith=f'{PREFIJO} ').count()
+        Genero.objects.bulk_create([
+            Genero(nombre=f'{PREFIJO} {rng.choice(PALABRAS).capitalize()} {i}')
+            for i in range(existentes, existentes + n)
+        ])
+        return list(Genero.objects.filter(nombre__startswith=f'{PREFIJO} ')
+                    .order_by('-id').values_list('id', flat=True)[:n])
+
+    def _libros(self, rng, n, generos):
+        inicio = Libro.objects.filter(isbn__startswith='978' + PREFIJO).count()
+        autores = [f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}' for _ in range(max(1, n // 8))]
+        pesos_autor = _zipf(rng, len(autores))
+        libros = []
+        for i in range(inicio, inicio + n):
+            titulo = ' '.join(rng.choice(PALABRAS) for _ in range(rng.randint(2, 5))).capitalize()
+            precio = min(Decimal('999999.99'), Decimal(str(round(rng.lognormvariate(3.2, 0.5), 2))))
+            libros.append(Libro(
+                titulo=titulo,
+                autor=rng.choices(autores, pesos_autor)[0],
+                precio=max(Decimal('1.00'), precio),
+                isbn=f'978{PREFIJO}{i:09d}',
+                descripcion=' '.join(rng.choice(PALABRAS) for _ in range(rng.randint(20, 120))),
+                portada='',
+            ))
+        _en_lotes(Libro, libros)
+        ids = list(Libro.objects.filter(isbn__startswith='978' + PREFIJO)
+                   .order_by('-id').values_list('id', flat=True)[:n])
+
+        # Cada libro tiene 1-3 géneros; algunos géneros son mucho más comunes.
+        pesos_genero = _zipf(rng, len(generos))
+        through = Libro.generos.through
+        _en_lotes(through, [
+            through(libro_id=libro_id, genero_id=genero_id)
+            for libro_id in ids
+            for genero_id in set(rng.choices(generos, pesos_genero, k=rng.choice((1, 1, 2, 2, 3))))
+        ])
+        return ids
+
+    def _compras(self, rng, n, dias, usuarios, libros):
+        if not n:
+            return 0
+        precios = dict(Libro.objects.filter(id__in=libros).values_list('id', 'precio'))
+        pesos_libro = _zipf(rng, len(libros))
+        pesos_usuario = _zipf(rng, len(usuarios), s=0.8)
+        ahora = timezone.now()
+        estados, pesos_estado = zip(*ESTADOS)
+
+        # Un carrito abierto para ~20% de los usuarios, el resto son compras enviadas.
+        carritos = rng.sample(usuarios, k=min(len(usuarios), n // 5))
+        compras = [Compra(usuario_id=u, total=0, estado='CARRITO') for u in carritos]
+        compras += [
+            Compra(usuario_id=rng.choices(usuarios, pesos_usuario)[0], total=0,
+                   estado=rng.choices(estados, pesos_estado)[0])
+            for _ in range(n - len(carritos))
+        ]
+        _en_lotes(Compra, compras)
+        # auto_now_add pisa la fecha en bulk_create; se reparte después con bulk_update.
+        for compra in compras:
+            compra.fecha = ahora - timedelta(seconds=rng.randint(0, dias * 86400))
+            compra.fecha_actualizacion = compra.fecha
+        Compra.objects.bulk_update(compras, ['fecha', 'fecha_actualizacion'], batch_size=TAMANO_LOTE)
+
+        items = []
+        for compra in compras:
+            cantidad_libros = min(len(libros), 1 + int(rng.expovariate(1 / 1.5)))
+            elegidos = set(rng.choices(libros, pesos_libro, k=cantidad_libros))
+            total = Decimal('0')
+            for libro_id in elegidos:
+                cantidad = rng.choices((1, 2, 3), (0.8, 0.15, 0.05))[0]
+                items.append(ItemCompra(compra_id=compra.id, libro_id=libro_id,
+                                        precio_unitario=precios[libro_id], cantidad=cantidad))
+                total += precios[libro_id] * cantidad
+            compra.total = total
+        _en_lotes(ItemCompra, items)
+        Compra.objects.bulk_update(compras, ['total'], batch_size=TAMANO_LOTE)
+        return len(compras)
+
+    def _ventas_totales(self):
+        """Recalcula ventas_totales de todos los libros desde las compras confirmadas."""
+        vendidos = (
+            ItemCompra.objects.filter(compra__estado='CONFIRMADA')
+            .values('libro_id').annotate(total=Sum('cantidad')).order_by()
+        )
+        libros = [Libro(id=fila['libro_id'], ventas_totales=fila['total']) for fila in vendidos]
+        Libro.objects.update(ventas_totales=0)
+        Libro.objects.bulk_update(libros, ['ventas_totales'], batch_size=TAMANO_LOTE)
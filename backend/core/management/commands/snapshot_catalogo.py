@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Escribe el snapshot precomprimido del catálogo (core/snapshot.py) para la versión '
+        'actual. Útil al desplegar; después se mantiene solo tras cada cambio.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true',
+                            help='Lo reescribe aunque ya exista el de la versión actual.')
+
+    def handle(self, *args, **options):
+        actual = snapshot.construir(forzar=options['forzar'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot versión {actual["version"]} ({", ".join(actual["codificaciones"])}) '
+            f'en {snapshot.directorio()}'
+        ))
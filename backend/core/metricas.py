@@ -0,0 +1,128 @@
+"""
+Métricas por vista (viewset + acción) guardadas en memoria del proceso.
+
+El middleware `core.middleware.MetricasMiddleware` mide cada request
+(latencia, cantidad y tiempo de SQL, bytes de respuesta) y llama a
+`registrar`, y a `sumar_bytes` cuando termina una respuesta en streaming;
+`/api/metrics` las expone en formato de texto de Prometheus.
+Cada proceso lleva sus propios contadores, como es habitual con Prometheus.
+"""
+import threading
+from collections import defaultdict
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_lock = threading.Lock()
+
+
+class _Histograma:
+    __slots__ = ('buckets', 'conteos', 'suma', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * len(buckets)
+        self.suma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[i] += 1
+                break
+        self.suma += valor
+        self.total += 1
+
+
+class _MetricasVista:
+    __slots__ = ('latencia', 'consultas', 'sql_segundos', 'bytes', 'respuestas')
+
+    def __init__(self):
+        self.latencia = _Histograma(BUCKETS_SEGUNDOS)
+        self.consultas = _Histograma(BUCKETS_CONSULTAS)
+        self.sql_segundos = 0.0
+        self.bytes = 0
+        self.respuestas = defaultdict(int)
+
+
+_vistas = defaultdict(_MetricasVista)
+
+
+def registrar(vista, accion, status_code, segundos, consultas, sql_segundos, bytes_respuesta):
+    with _lock:
+        m = _vistas[(vista, accion)]
+        m.latencia.observar(segundos)
+        m.consultas.observar(consultas)
+        m.sql_segundos += sql_segundos
+        m.bytes += bytes_respuesta
+        m.respuestas[status_code] += 1
+
+
+def sumar_bytes(vista, accion, bytes_respuesta):
+    """Bytes de una respuesta en streaming, que se conocen al terminar de enviarla."""
+    with _lock:
+        _vistas[(vista, accion)].bytes += bytes_respuesta
+
+
+def reiniciar():
+    with _lock:
+        _vistas.clear()
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(vista, accion, **extra):
+    pares = [('view', vista), ('action', accion)] + list(extra.items())
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+
+def _histograma(lineas, nombre, vista, accion, histograma):
+    acumulado = 0
+    for limite, conteo in zip(histograma.buckets, histograma.conteos):
+        acumulado += conteo
+        lineas.append(f'{nombre}_bucket{_etiquetas(vista, accion, le=limite)} {acumulado}')
+    lineas.append(f'{nombre}_bucket{_etiquetas(vista, accion, le="+Inf")} {histograma.total}')
+    lineas.append(f'{nombre}_sum{_etiquetas(vista, accion)} {histograma.suma}')
+    lineas.append(f'{nombre}_count{_etiquetas(vista, accion)} {histograma.total}')
+
+
+def exportar():
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+    with _lock:
+        vistas = sorted(_vistas.items())
+        lineas = [
+            '# HELP http_request_duration_seconds Latencia de la request por vista y acción.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (vista, accion), m in vistas:
+            _histograma(lineas, 'http_request_duration_seconds', vista, accion, m.latencia)
+
+        lineas += [
+            '# HELP http_request_sql_queries Consultas SQL por request.',
+            '# TYPE http_request_sql_queries histogram',
+        ]
+        for (vista, accion), m in vistas:
+            _histograma(lineas, 'http_request_sql_queries', vista, accion, m.consultas)
+
+        lineas += [
+            '# HELP http_request_sql_seconds_total Tiempo total en SQL.',
+            '# TYPE http_request_sql_seconds_total counter',
+        ]
+        lineas += [f'http_request_sql_seconds_total{_etiquetas(v, a)} {m.sql_segundos}' for (v, a), m in vistas]
+
+        lineas += [
+            '# HELP http_response_bytes_total Bytes de cuerpo de respuesta (streaming incluido, al terminar de enviarse).',
+            '# TYPE http_response_bytes_total counter',
+        ]
+        lineas += [f'http_response_bytes_total{_etiquetas(v, a)} {m.bytes}' for (v, a), m in vistas]
+
+        lineas += [
+            '# HELP http_responses_total Respuestas por código de estado.',
+            '# TYPE http_responses_total counter',
+        ]
+        for (vista, accion), m in vistas:
+            for codigo, total in sorted(m.respuestas.items()):
+                lineas.append(f'http_responses_total{_etiquetas(vista, accion, status=codigo)} {total}')
+    return '\n'.join(lineas) + '\n'
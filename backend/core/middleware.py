@@ -0,0 +1,171 @@
+import functools
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metricas
+
+logger = logging.getLogger('core.metricas')
+
+MAX_SQL_CAPTURADO = 200
+MAX_LARGO_SQL = 1000
+# El método lo elige el cliente: fuera de estos se agrupa en 'otro' para no crear una serie por cada uno.
+METODOS = {'get', 'head', 'post', 'put', 'patch', 'delete', 'options', 'trace', 'connect'}
+
+
+class _CapturaSQL:
+    """Consultas de la request: cantidad, tiempo y las primeras sentencias."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.sentencias = []
+
+    def registrar(self, sql, duracion):
+        self.consultas += 1
+        self.segundos += duracion
+        if len(self.sentencias) < MAX_SQL_CAPTURADO:
+            self.sentencias.append((duracion, sql[:MAX_LARGO_SQL]))
+
+
+# La captura viaja en el contexto de la request: bajo ASGI el ORM async corre
+# en otro hilo (con otra conexión), pero sync_to_async copia el contexto.
+_captura_actual = ContextVar('captura_sql', default=None)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper instalado en todas las conexiones; mide solo dentro de una request."""
+    captura = _captura_actual.get()
+    if captura is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        captura.registrar(sql, time.perf_counter() - inicio)
+
+
+def _instalar(connection, **kwargs):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+connection_created.connect(_instalar)
+
+
+def nombre_metodo(method):
+    metodo = method.lower()
+    return metodo if metodo in METODOS else 'otro'
+
+
+def nombre_vista(view_func, method):
+    """(vista, acción): para viewsets de DRF la acción es la del router (list, top_libros...)."""
+    clase = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    vista = clase.__name__ if clase is not None else getattr(view_func, '__name__', 'desconocida')
+    acciones = getattr(view_func, 'actions', None) or {}
+    return vista, acciones.get(method.lower(), nombre_metodo(method))
+
+
+class MetricasMiddleware:
+    """
+    Mide latencia, consultas SQL, tiempo en SQL y bytes por vista y acción.
+    Las requests más lentas que METRICAS_UMBRAL_LENTO se loguean con su SQL.
+    Funciona igual bajo WSGI y ASGI (sin pasar las vistas async a un hilo).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.umbral_lento = getattr(settings, 'METRICAS_UMBRAL_LENTO', 0.5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Las conexiones abiertas antes de cargar el middleware no pasaron por connection_created.
+        for alias in connections:
+            _instalar(connections[alias])
+        captura, token, inicio = self._iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            _captura_actual.reset(token)
+        return self._terminar(request, response, captura, inicio)
+
+    async def __acall__(self, request):
+        captura, token, inicio = self._iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _captura_actual.reset(token)
+        return self._terminar(request, response, captura, inicio)
+
+    def _iniciar(self):
+        captura = _CapturaSQL()
+        return captura, _captura_actual.set(captura), time.perf_counter()
+
+    def _terminar(self, request, response, captura, inicio):
+        duracion = time.perf_counter() - inicio
+
+        # Sin vista resuelta (404 de URL) se agrupa todo junto para no crear una serie por URL.
+        # Se lee de resolver_match y no con process_view, que bajo ASGI costaría un salto de hilo.
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            vista, accion = nombre_vista(match.func, request.method)
+        else:
+            vista, accion = 'sin_vista', nombre_metodo(request.method)
+        bytes_respuesta = self._bytes(response, vista, accion)
+        metricas.registrar(vista, accion, response.status_code, duracion,
+                           captura.consultas, captura.segundos, bytes_respuesta)
+
+        if duracion >= self.umbral_lento:
+            sql = '\n'.join(f'  [{d * 1000:.1f} ms] {s}' for d, s in captura.sentencias)
+            logger.warning(
+                'Request lenta %s %s (%s.%s): %.0f ms, %d consultas, %.0f ms en SQL\n%s',
+                request.method, request.get_full_path(), vista, accion, duracion * 1000,
+                captura.consultas, captura.segundos * 1000, sql,
+            )
+        return response
+
+    def _bytes(self, response, vista, accion):
+        """
+        Bytes del cuerpo. En streaming (exports, snapshot) se suman cuando
+        termina de enviarse, salvo que ya traiga Content-Length (FileResponse).
+        """
+        if not response.streaming:
+            return len(response.content)
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        contar = functools.partial(metricas.sumar_bytes, vista, accion)
+        if response.is_async:
+            response.streaming_content = _contar_async(response.streaming_content, contar)
+        else:
+            response.streaming_content = _contar(response.streaming_content, contar)
+        return 0
+
+
+def _contar(contenido, registrar):
+    total = 0
+    try:
+        for parte in contenido:
+            total += len(parte)
+            yield parte
+    finally:
+        registrar(total)
+
+
+async def _contar_async(contenido, registrar):
+    total = 0
+    try:
+        async for parte in contenido:
+            total += len(parte)
+            yield parte
+    finally:
+        registrar(total)
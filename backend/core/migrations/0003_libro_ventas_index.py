@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_compra_options_compra_fecha_actualizacion_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['-ventas_totales', '-id'], name='libro_ventas_id_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from core import search
+
+
+def crear_indice(apps, schema_editor):
+    search.crear_indice(schema_editor)
+
+
+def borrar_indice(apps, schema_editor):
+    search.borrar_indice(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_libro_ventas_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
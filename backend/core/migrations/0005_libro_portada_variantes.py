@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_libro_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='portada_variantes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+from core import search
+
+
+def recrear_indice(apps, schema_editor):
+    # SQLite reconstruye core_libro al agregar la columna y se pierden los triggers FTS.
+    search.crear_indice(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_libro_portada_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(recrear_indice, migrations.RunPython.noop),
+    ]
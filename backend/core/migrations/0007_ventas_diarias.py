@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_libro_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiariaGenero',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('genero', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='core.genero')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'genero'), name='venta_diaria_genero_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaLibro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='core.libro')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'libro'), name='venta_diaria_libro_unica')],
+            },
+        ),
+    ]
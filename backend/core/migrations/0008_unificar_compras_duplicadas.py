@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, F, Min, OuterRef, Subquery, Sum
+
+
+def unificar_duplicados(apps, schema_editor):
+    """Deja los datos existentes dentro de las nuevas restricciones antes de crearlas."""
+    Compra = apps.get_model('core', 'Compra')
+    ItemCompra = apps.get_model('core', 'ItemCompra')
+
+    # Varios carritos del mismo usuario: se queda el último modificado con los ítems de todos.
+    usuarios = (Compra.objects.filter(estado='CARRITO').values('usuario_id')
+                .annotate(n=Count('id')).filter(n__gt=1).values_list('usuario_id', flat=True))
+    carritos = []
+    for usuario_id in list(usuarios):
+        ids = list(Compra.objects.filter(usuario_id=usuario_id, estado='CARRITO')
+                   .order_by('-fecha_actualizacion', '-id').values_list('id', flat=True))
+        ItemCompra.objects.filter(compra_id__in=ids[1:]).update(compra_id=ids[0])
+        Compra.objects.filter(id__in=ids[1:]).delete()
+        carritos.append(ids[0])
+
+    # El mismo libro repetido en una compra: una sola fila con la cantidad sumada.
+    repetidos = (ItemCompra.objects.values('compra_id', 'libro_id')
+                 .annotate(n=Count('id'), cantidad_total=Sum('cantidad'), primero=Min('id'))
+                 .filter(n__gt=1))
+    for fila in list(repetidos):
+        ItemCompra.objects.filter(id=fila['primero']).update(cantidad=fila['cantidad_total'])
+        ItemCompra.objects.filter(compra_id=fila['compra_id'], libro_id=fila['libro_id']).exclude(
+            id=fila['primero']).delete()
+
+    if carritos:
+        totales = (ItemCompra.objects.filter(compra_id=OuterRef('pk')).values('compra_id')
+                   .annotate(total=Sum(F('precio_unitario') * F('cantidad'),
+                                       output_field=DecimalField(max_digits=10, decimal_places=2)))
+                   .values('total'))
+        Compra.objects.filter(id__in=carritos).update(total=Subquery(totales))
+
+
+class Migration(migrations.Migration):
+    # Separada de 0009: en PostgreSQL no se puede alterar una tabla con
+    # chequeos de FK diferidos pendientes en la misma transacción.
+
+    dependencies = [
+        ('core', '0007_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.RunPython(unificar_duplicados, migrations.RunPython.noop),
+    ]
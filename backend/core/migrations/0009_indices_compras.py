@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unificar_compras_duplicadas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['-fecha_actualizacion'], name='compra_actualizacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['usuario', '-fecha_actualizacion'], name='compra_usuario_act_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='compra',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'CARRITO')), fields=('usuario',), name='compra_carrito_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemcompra',
+            constraint=models.UniqueConstraint(fields=('compra', 'libro'), name='item_compra_libro_unico'),
+        ),
+    ]
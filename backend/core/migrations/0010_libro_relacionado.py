@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indices_compras'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibroRelacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('veces', models.IntegerField()),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionados', to='core.libro')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.libro')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['libro', '-veces', 'relacionado'], name='relacionado_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('libro', 'relacionado'), name='libro_relacionado_unico')],
+            },
+        ),
+    ]
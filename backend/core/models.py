@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import DecimalField, F, Q, Sum
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 class User(AbstractUser):
@@ -17,8 +19,15 @@ class Libro(models.Model):
     isbn = models.CharField(max_length=20, unique=True)
     descripcion = models.TextField()
     portada = models.ImageField(upload_to='portadas/')
+    portada_variantes = models.JSONField(null=True, blank=True, editable=False)
     generos = models.ManyToManyField(Genero, related_name='libros')
     ventas_totales = models.PositiveIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-ventas_totales', '-id'], name='libro_ventas_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.autor}"
@@ -39,6 +48,16 @@ class Compra(models.Model):
 
     class Meta:
         ordering = ['-fecha_actualizacion']
+        indexes = [
+            # Listado del admin (orden por defecto) y "mis compras" del usuario.
+            models.Index(fields=['-fecha_actualizacion'], name='compra_actualizacion_idx'),
+            models.Index(fields=['usuario', '-fecha_actualizacion'], name='compra_usuario_act_idx'),
+        ]
+        constraints = [
+            # Un solo carrito activo por usuario; mi-carrito lo busca por este índice.
+            models.UniqueConstraint(fields=['usuario'], condition=Q(estado='CARRITO'),
+                                    name='compra_carrito_unico'),
+        ]
 
     def __str__(self):
         return f"{'Carrito' if self.estado == 'CARRITO' else 'Compra'} #{self.id} - {self.usuario.username} - {self.estado}"
@@ -53,14 +72,123 @@ class Compra(models.Model):
         """Determina si es una compra ya enviada"""
         return self.estado in ['PENDIENTE', 'CONFIRMADA', 'RECHAZADA']
 
+    def recalcular_total(self):
+        """Recalcula el total con un SUM en la base de datos y lo guarda (marca la compra como modificada)"""
+        total = self.items.aggregate(
+            total=Sum(F('precio_unitario') * F('cantidad'),
+                      output_field=DecimalField(max_digits=10, decimal_places=2))
+        )['total'] or 0
+        # update() no aplica auto_now: sin la fecha, ?since de /api/export/compras no vería el cambio.
+        ahora = timezone.now()
+        Compra.objects.filter(pk=self.pk).update(total=total, fecha_actualizacion=ahora)
+        self.total, self.fecha_actualizacion = total, ahora
+        return total
+
 class ItemCompra(models.Model):
     compra = models.ForeignKey(Compra, on_delete=models.CASCADE, related_name='items')
     libro = models.ForeignKey(Libro, on_delete=models.PROTECT)
     precio_unitario = models.DecimalField(max_digits=8, decimal_places=2)
     cantidad = models.IntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # Cada libro aparece una vez por compra; agregar-items suma a la cantidad.
+            models.UniqueConstraint(fields=['compra', 'libro'], name='item_compra_libro_unico'),
+        ]
+
     def __str__(self):
         return f"{self.libro.titulo} x {self.cantidad}"
 
     def subtotal(self):
         return self.precio_unitario * self.cantidad
+
+
+class VentaDiariaLibro(models.Model):
+    """Acumulado de ventas confirmadas por día (fecha de la compra) y libro"""
+    fecha = models.DateField()
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='ventas_diarias')
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'libro'], name='venta_diaria_libro_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.libro_id}: {self.unidades}"
+
+
+class VentaDiariaGenero(models.Model):
+    """Acumulado de ventas confirmadas por día y género (un libro suma en cada uno de sus géneros)"""
+    fecha = models.DateField()
+    genero = models.ForeignKey(Genero, on_delete=models.CASCADE, related_name='ventas_diarias')
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'genero'], name='venta_diaria_genero_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.genero_id}: {self.unidades}"
+
+
+class LibroRelacionado(models.Model):
+    """
+    Vecinos de un libro por compras en común: solo los K con más compras
+    confirmadas compartidas (ver core/relacionados.py).
+    """
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='relacionados')
+    relacionado = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='+')
+    veces = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'relacionado'], name='libro_relacionado_unico'),
+        ]
+        indexes = [
+            # Cubre la lectura de los vecinos: WHERE libro_id = ? ORDER BY veces DESC, relacionado_id.
+            models.Index(fields=['libro', '-veces', 'relacionado'], name='relacionado_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.libro_id} -> {self.relacionado_id}: {self.veces}"
+
+
+class Tarea(models.Model):
+    """Trabajo diferido de la cola de core/tareas.py; la tabla es también el estado de cada tarea."""
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_CURSO', 'En curso'),
+        ('COMPLETADA', 'Completada'),
+        ('FALLIDA', 'Fallida'),
+        ('CANCELADA', 'Cancelada'),
+    ]
+    nombre = models.CharField(max_length=200)
+    argumentos = models.JSONField(default=dict)
+    # Clave de deduplicación: a lo sumo una tarea PENDIENTE por clave.
+    clave = models.CharField(max_length=200, null=True, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default='PENDIENTE')
+    intentos = models.IntegerField(default=0)
+    max_intentos = models.IntegerField(default=5)
+    disponible_desde = models.DateTimeField()
+    bloqueada_hasta = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    terminada = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Próxima tarea a reclamar y tareas EN_CURSO con el bloqueo vencido.
+            models.Index(fields=['estado', 'disponible_desde'], name='tarea_estado_disponible_idx'),
+            models.Index(fields=['estado', 'bloqueada_hasta'], name='tarea_estado_bloqueo_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['clave'], condition=Q(estado='PENDIENTE'), name='tarea_clave_pendiente_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} #{self.id} - {self.estado}"
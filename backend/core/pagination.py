@@ -0,0 +1,147 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def query_params(request):
+    """Parámetros GET de una Request de DRF o de un HttpRequest de Django."""
+    return getattr(request, 'query_params', request.GET)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre un orden estable.
+
+    Es opcional: solo se activa si la petición trae ?cursor= o ?limit=, así
+    los clientes que esperan la lista completa siguen funcionando igual.
+    El cursor guarda los valores de la última fila entregada, de modo que
+    cada página es un WHERE sobre el índice y no un OFFSET.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 50
+    max_limit = 200
+    ordering = ('id',)
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.preparar(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.recortar(list(queryset[:self.limit + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Versión async para las vistas de core.views.async_views."""
+        queryset = self.preparar(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.recortar([row async for row in queryset[:self.limit + 1]])
+
+    def preparar(self, queryset, request, view=None):
+        """Queryset ordenado y filtrado desde el cursor; None si no se pidió paginar."""
+        params = query_params(request)
+        if self.cursor_query_param not in params and self.limit_query_param not in params:
+            return None
+
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.limit = self.get_limit(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset
+
+    def recortar(self, rows):
+        # Se pide una fila de más para saber si hay página siguiente.
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_position = self.get_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        next_cursor = self.encode_cursor(self.next_position)
+        return {
+            'next': self.get_next_link(next_cursor),
+            'next_cursor': next_cursor,
+            'results': data,
+        }
+
+    def get_ordering(self, view):
+        if view is not None and hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering())
+        return self.ordering
+
+    def get_limit(self, request):
+        try:
+            limit = int(query_params(request)[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get_position(self, row):
+        # Las filas pueden ser instancias o dicts de .values().
+        if isinstance(row, dict):
+            return [row[field.lstrip('-')] for field in self.ordering]
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+    def after(self, position):
+        """Filtro lexicográfico: filas estrictamente posteriores a `position`."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, request, model=None):
+        encoded = query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if model is not None:
+            position = [self.coerce(model, field.lstrip('-'), value) for field, value in zip(self.ordering, position)]
+        return position
+
+    def coerce(self, model, name, value):
+        """Valor del cursor convertido al tipo del campo (y dentro de su rango en la base)."""
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return field.clean(value, None)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        raw = json.dumps(position, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_next_link(self, next_cursor):
+        if next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, next_cursor)
@@ -0,0 +1,196 @@
+"""
+Variantes de portada (thumb/card/full) en WebP y JPEG.
+
+Las imágenes se generan fuera del request en un pool de procesos; cada
+variante se guarda con default_storage junto al original
+(`portadas/foo.jpg` -> `portadas/foo_thumb.webp`, ...), que elige otro nombre
+si ese ya existe. Al terminar, el mapa de variantes se guarda en
+`Libro.portada_variantes`, siempre que la portada no haya cambiado
+entretanto. Mientras tanto el serializer sigue devolviendo solo la original.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+
+# Ancho máximo de cada variante; nunca se agranda la original.
+VARIANTES = {'thumb': 160, 'card': 400, 'full': 1200}
+FORMATOS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+            'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def nombre_variante(nombre, variante, formato):
+    base, _ = os.path.splitext(nombre)
+    extension = 'jpg' if formato == 'jpeg' else formato
+    return f'{base}_{variante}.{extension}'
+
+
+def generar_archivos(origen):
+    """
+    Genera las variantes de `origen` (ruta absoluta) y devuelve
+    {variante: (ancho, {formato: bytes})}. Corre en un proceso hijo: solo usa
+    Pillow y no escribe nada; los archivos los guarda `guardar_variantes`.
+    """
+    from PIL import Image, ImageOps
+
+    generadas = {}
+    with Image.open(origen) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'L'):
+            original = original.convert('RGB')
+        for variante, ancho_max in VARIANTES.items():
+            imagen = original.copy()
+            if imagen.width > ancho_max:
+                alto = max(1, round(imagen.height * ancho_max / imagen.width))
+                imagen = imagen.resize((ancho_max, alto), Image.LANCZOS)
+            contenidos = {}
+            for formato, (pil_formato, opciones) in FORMATOS.items():
+                buffer = io.BytesIO()
+                imagen.save(buffer, pil_formato, **opciones)
+                contenidos[formato] = buffer.getvalue()
+            generadas[variante] = (imagen.width, contenidos)
+    return generadas
+
+
+def mapa_variantes(nombre, anchos):
+    """Mapa {variante: {'ancho', formato: nombre}} con los nombres derivados de `nombre`."""
+    return {
+        variante: {
+            'ancho': ancho,
+            **{formato: nombre_variante(nombre, variante, formato) for formato in FORMATOS},
+        }
+        for variante, ancho in anchos.items()
+    }
+
+
+def _archivos(variantes):
+    return [datos[formato] for datos in (variantes or {}).values() for formato in FORMATOS]
+
+
+def guardar_variantes(libro_id, nombre, generadas):
+    """
+    Guarda los archivos de `generar_archivos` (el storage elige nombres que no
+    pisen otros archivos) y el mapa en el libro si su portada sigue siendo
+    `nombre`. Borra los archivos que quedan sin usar: los nuevos si la portada
+    cambió, las variantes anteriores si no.
+    """
+    from . import catalogo
+    from .models import Libro
+
+    sugeridos = mapa_variantes(nombre, {variante: ancho for variante, (ancho, _) in generadas.items()})
+    variantes = {
+        variante: {
+            'ancho': datos['ancho'],
+            **{formato: default_storage.save(datos[formato], ContentFile(generadas[variante][1][formato]))
+               for formato in FORMATOS},
+        }
+        for variante, datos in sugeridos.items()
+    }
+    libro = Libro.objects.filter(pk=libro_id, portada=nombre)
+    anteriores = libro.values_list('portada_variantes', flat=True).first()
+    actualizados = libro.update(portada_variantes=variantes, fecha_actualizacion=timezone.now())
+    for archivo in _archivos(anteriores if actualizados else variantes):
+        default_storage.delete(archivo)
+    if actualizados:
+        catalogo.invalidar()
+    return actualizados
+
+
+def procesar(libro_id, nombre):
+    """Versión síncrona: genera y guarda en el proceso actual."""
+    return guardar_variantes(libro_id, nombre, generar_archivos(default_storage.path(nombre)))
+
+
+def get_pool(procesos=None, nuevo=False):
+    global _pool
+    with _pool_lock:
+        if _pool is None or nuevo:
+            _pool = ProcessPoolExecutor(
+                max_workers=procesos or getattr(settings, 'PORTADAS_PROCESOS', 2),
+                mp_context=get_context('spawn'),
+            )
+        return _pool
+
+
+def programar(libro_id, nombre):
+    """Encola la generación de variantes para la portada `nombre` del libro."""
+    if not nombre:
+        return None
+    if not getattr(settings, 'PORTADAS_EN_SEGUNDO_PLANO', True):
+        return procesar(libro_id, nombre)
+
+    ruta = default_storage.path(nombre)
+    try:
+        futuro = get_pool().submit(generar_archivos, ruta)
+    except BrokenProcessPool:
+        # Un hijo murió (p. ej. por falta de memoria): se arranca un pool nuevo.
+        futuro = get_pool(nuevo=True).submit(generar_archivos, ruta)
+
+    def al_terminar(futuro):
+        if futuro.exception() is not None:
+            logger.error('No se pudieron generar las variantes de %s: %s', nombre, futuro.exception())
+            return
+        try:
+            guardar_variantes(libro_id, nombre, futuro.result())
+        finally:
+            # El callback corre en un hilo del pool: su conexión no la cierra nadie más.
+            connection.close()
+
+    futuro.add_done_callback(al_terminar)
+    return futuro
+
+
+def _absoluta(nombre, request):
+    url = default_storage.url(nombre)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def miniatura(libro, request=None):
+    """URL de la variante más chica en JPEG; la original mientras no haya variantes."""
+    if libro.portada_variantes:
+        return _absoluta(libro.portada_variantes['thumb']['jpeg'], request)
+    if libro.portada:
+        return _absoluta(libro.portada.name, request)
+    return None
+
+
+def urls(libro, request=None):
+    """Mapa para el serializer: URLs por variante y srcset por formato."""
+    return urls_de_variantes(libro.portada_variantes, lambda nombre: _absoluta(nombre, request))
+
+
+def urls_de_variantes(variantes, absoluta):
+    """Como `urls`, a partir del JSON de variantes y de una función nombre -> URL."""
+    if not variantes:
+        return None
+
+    resultado = {}
+    srcset = {formato: [] for formato in FORMATOS}
+    anchos_vistos = set()
+    for variante, datos in variantes.items():
+        resultado[variante] = {'ancho': datos['ancho']}
+        # Si la original es chica varias variantes tienen el mismo ancho;
+        # el srcset no admite descriptores repetidos.
+        repetido = datos['ancho'] in anchos_vistos
+        anchos_vistos.add(datos['ancho'])
+        for formato in FORMATOS:
+            url = absoluta(datos[formato])
+            resultado[variante][formato] = url
+            if not repetido:
+                srcset[formato].append(f"{url} {datos['ancho']}w")
+    resultado['srcset'] = {formato: ', '.join(partes) for formato, partes in srcset.items()}
+    return resultado
@@ -0,0 +1,90 @@
+"""
+Ranking de más vendidos (global y por género) mantenido en memoria.
+
+Cada proceso guarda, por ámbito (None = global, o id de género), la lista
+top-N de pares (ventas_totales, id). La validez se controla con un número
+de versión guardado en la caché de Django: cualquier cambio que no se pueda
+aplicar de forma incremental (altas/bajas de libros, cambios de géneros)
+incrementa la versión y los procesos recalculan desde el índice
+(-ventas_totales, -id) la próxima vez que se pida el ámbito.
+
+Las confirmaciones de compra solo suben ventas, así que `registrar_ventas`
+fusiona los nuevos valores en las listas locales sin volver a consultar
+el ranking completo.
+"""
+import threading
+
+from . import versiones
+from .models import Libro
+
+TOP_N = 10
+VERSION_KEY = 'ranking:version'
+
+_lock = threading.Lock()
+_rankings = {}
+
+
+def version_actual():
+    return versiones.leer(VERSION_KEY)
+
+
+def invalidar():
+    return versiones.incrementar(VERSION_KEY)
+
+
+def _calcular(genero_id, n):
+    qs = Libro.objects.order_by('-ventas_totales', '-id')
+    if genero_id is not None:
+        qs = qs.filter(generos__id=genero_id)
+    return list(qs.values_list('ventas_totales', 'id')[:n])
+
+
+def top_ids(genero_id=None, n=TOP_N):
+    """Ids de los n libros más vendidos del ámbito, en orden de ranking."""
+    version = version_actual()
+    with _lock:
+        entrada = _rankings.get(genero_id)
+    if entrada is None or entrada[0] != version or entrada[1] < n:
+        capacidad = max(n, TOP_N)
+        entrada = (version, capacidad, _calcular(genero_id, capacidad))
+        with _lock:
+            _rankings[genero_id] = entrada
+    return [libro_id for _, libro_id in entrada[2][:n]]
+
+
+def registrar_ventas(libro_ids):
+    """
+    Aplica las nuevas ventas de `libro_ids` (ya guardadas en la BD) a los
+    rankings en memoria y publica una versión nueva para el resto de procesos.
+    """
+    libro_ids = set(libro_ids)
+    if not libro_ids:
+        return
+    ventas = dict(Libro.objects.filter(id__in=libro_ids).values_list('id', 'ventas_totales'))
+    generos = {}
+    for libro_id, genero_id in Libro.generos.through.objects.filter(
+            libro_id__in=libro_ids).values_list('libro_id', 'genero_id'):
+        generos.setdefault(libro_id, set()).add(genero_id)
+
+    version_previa = version_actual()
+    version = invalidar()
+    with _lock:
+        for ambito, (v, n, filas) in list(_rankings.items()):
+            # Si otro proceso cambió la versión entremedio, no sabemos qué
+            # cambió: descartamos y se recalculará al pedirlo.
+            if v != version_previa or version != version_previa + 1:
+                del _rankings[ambito]
+                continue
+            for libro_id, total in ventas.items():
+                if ambito is not None and ambito not in generos.get(libro_id, ()):
+                    continue
+                filas = _fusionar(filas, (total, libro_id), n)
+            _rankings[ambito] = (version, n, filas)
+
+
+def _fusionar(filas, candidato, n):
+    filas = [f for f in filas if f[1] != candidato[1]]
+    if len(filas) < n or candidato > filas[-1]:
+        filas.append(candidato)
+        filas.sort(reverse=True)
+    return filas[:n]
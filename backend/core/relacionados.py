@@ -0,0 +1,190 @@
+"""
+"Comprados juntos": para cada libro, los K libros que más veces aparecen en
+las mismas compras CONFIRMADA, guardados en LibroRelacionado. Leer los
+vecinos de un libro es un solo recorrido del índice (libro, -veces,
+relacionado).
+
+La tabla se mantiene desde core.ventas dentro de la misma transacción que
+el cambio de estado:
+
+- Al confirmar solo suben conteos, y solo los de pares de libros de las
+  compras confirmadas. `sumar` recuenta esos pares (una consulta) y los
+  fusiona con los top-K guardados; el resultado es exacto porque ningún par
+  que quedó afuera del top-K pudo subir.
+- Al deshacer una confirmación los conteos bajan y algún vecino que no
+  estaba guardado puede entrar al top-K: `recalcular` rehace desde cero las
+  listas de los libros afectados.
+
+`reconstruir` (comando rebuild_relacionados) rehace toda la tabla contando
+los pares con NumPy, de a lotes de compras.
+"""
+from django.db import connection, transaction
+from django.db.models import Max, Q
+
+from .models import Compra, ItemCompra, Libro, LibroRelacionado
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+K = 10
+TAMANO_LOTE = 1000
+
+
+def vecinos(libro_id, n=K):
+    """Ids de los libros más comprados junto con `libro_id`, en orden."""
+    return list(
+        LibroRelacionado.objects.filter(libro_id=libro_id)
+        .order_by('-veces', 'relacionado_id')
+        .values_list('relacionado_id', flat=True)[:n]
+    )
+
+
+def _contar(libro_ids, solo_entre=False):
+    """
+    {libro: {otro: compras confirmadas con ambos}} para los libros de
+    `libro_ids`; con `solo_entre` solo los pares con los dos libros en la lista.
+    """
+    items, compras = ItemCompra._meta.db_table, Compra._meta.db_table
+    marcas = ', '.join(['%s'] * len(libro_ids))
+    sql = (
+        f"SELECT a.libro_id, b.libro_id, COUNT(*) FROM {items} a "
+        f"JOIN {items} b ON b.compra_id = a.compra_id AND b.libro_id <> a.libro_id "
+        f"JOIN {compras} c ON c.id = a.compra_id "
+        f"WHERE c.estado = %s AND a.libro_id IN ({marcas})"
+    )
+    params = ['CONFIRMADA', *libro_ids]
+    if solo_entre:
+        sql += f" AND b.libro_id IN ({marcas})"
+        params += libro_ids
+    sql += " GROUP BY a.libro_id, b.libro_id"
+    conteos = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for libro_id, otro_id, veces in cursor.fetchall():
+            conteos.setdefault(libro_id, {})[otro_id] = veces
+    return conteos
+
+
+def _top(conteos):
+    return sorted(conteos.items(), key=lambda par: (-par[1], par[0]))[:K]
+
+
+def _guardar(listas):
+    """
+    Reemplaza los vecinos de cada libro de `listas` ({libro: [(otro, veces)]}):
+    borra los que salieron y hace upsert de los demás, así dos
+    confirmaciones simultáneas de los mismos libros no chocan al insertar.
+    """
+    salieron = Q(pk__in=[])
+    for libro_id, lista in listas.items():
+        salieron |= Q(libro_id=libro_id) & ~Q(relacionado_id__in=[otro_id for otro_id, _ in lista])
+    LibroRelacionado.objects.filter(salieron).delete()
+    LibroRelacionado.objects.bulk_create(
+        [
+            LibroRelacionado(libro_id=libro_id, relacionado_id=otro_id, veces=veces)
+            for libro_id, lista in listas.items() for otro_id, veces in lista
+        ],
+        update_conflicts=True, unique_fields=['libro', 'relacionado'], update_fields=['veces'],
+    )
+
+
+def sumar(libro_ids):
+    """Aplica una confirmación de compras con estos libros (ver el docstring del módulo)."""
+    libro_ids = sorted(set(libro_ids))
+    if len(libro_ids) < 2:
+        return
+    nuevos = _contar(libro_ids, solo_entre=True)
+    if not nuevos:
+        return
+    actuales = {}
+    for libro_id, otro_id, veces in LibroRelacionado.objects.select_for_update().filter(
+            libro_id__in=list(nuevos)).values_list('libro_id', 'relacionado_id', 'veces'):
+        actuales.setdefault(libro_id, {})[otro_id] = veces
+    _guardar({
+        libro_id: _top({**actuales.get(libro_id, {}), **conteos})
+        for libro_id, conteos in nuevos.items()
+    })
+
+
+def recalcular(libro_ids):
+    """Rehace desde las compras las listas de `libro_ids`."""
+    libro_ids = sorted(set(libro_ids))
+    if not libro_ids:
+        return
+    conteos = _contar(libro_ids)
+    _guardar({libro_id: _top(conteos.get(libro_id, {})) for libro_id in libro_ids})
+
+
+# ---------- Reconstrucción completa ----------
+
+def _pares(compras, libros):
+    """(a, b) de cada par ordenado de libros distintos de una misma compra."""
+    orden = np.argsort(compras, kind='stable')
+    compras, libros = compras[orden], libros[orden]
+    _, inicio, tamano = np.unique(compras, return_index=True, return_counts=True)
+    # Cada ítem se repite tantas veces como ítems tiene su compra y se empareja
+    # con cada uno de ellos (incluido él mismo, que se descarta al final).
+    repeticiones = np.repeat(tamano, tamano)
+    a = np.repeat(libros, repeticiones)
+    primero = np.repeat(np.repeat(inicio, tamano), repeticiones)
+    posicion = np.arange(len(a)) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+    b = libros[primero + posicion]
+    distintos = a != b
+    return a[distintos], b[distintos]
+
+
+def _acumular(codigos, veces, nuevos):
+    """Suma los pares `nuevos` (códigos a*base+b, con repeticiones) a la matriz dispersa (codigos, veces)."""
+    nuevos, cantidades = np.unique(nuevos, return_counts=True)
+    codigos, inversa = np.unique(np.concatenate([codigos, nuevos]), return_inverse=True)
+    veces = np.bincount(inversa, weights=np.concatenate([veces, cantidades])).astype(np.int64)
+    return codigos, veces
+
+
+def contar_pares(lote=TAMANO_LOTE):
+    """
+    Matriz de co-compras dispersa como (a, b, veces), contada de a `lote`
+    compras CONFIRMADA para acotar la memoria de los pares intermedios.
+    """
+    base = (Libro.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+    codigos, veces = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    confirmadas = Compra.objects.filter(estado='CONFIRMADA').order_by('id').values_list('id', flat=True)
+    ultima = 0
+    while True:
+        compra_ids = list(confirmadas.filter(id__gt=ultima)[:lote])
+        if not compra_ids:
+            break
+        ultima = compra_ids[-1]
+        filas = np.array(
+            list(ItemCompra.objects.filter(compra_id__in=compra_ids).values_list('compra_id', 'libro_id')),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        a, b = _pares(filas[:, 0], filas[:, 1])
+        if len(a):
+            codigos, veces = _acumular(codigos, veces, a * base + b)
+    return codigos // base, codigos % base, veces
+
+
+def top_k(a, b, veces, k=K):
+    """Filtra la matriz a los k vecinos de cada libro, ordenados por veces desc e id."""
+    orden = np.lexsort((b, -veces, a))
+    a, b, veces = a[orden], b[orden], veces[orden]
+    _, inicio, tamano = np.unique(a, return_index=True, return_counts=True)
+    rango = np.arange(len(a)) - np.repeat(inicio, tamano)
+    quedan = rango < k
+    return a[quedan], b[quedan], veces[quedan]
+
+
+def reconstruir(lote=TAMANO_LOTE):
+    """Rehace toda la tabla desde las compras confirmadas; devuelve {'libros', 'filas'}."""
+    a, b, veces = top_k(*contar_pares(lote))
+    with transaction.atomic():
+        LibroRelacionado.objects.all().delete()
+        for inicio in range(0, len(a), lote):
+            LibroRelacionado.objects.bulk_create([
+                LibroRelacionado(libro_id=int(x), relacionado_id=int(y), veces=int(v))
+                for x, y, v in zip(a[inicio:inicio + lote], b[inicio:inicio + lote], veces[inicio:inicio + lote])
+            ])
+    return {'libros': len(np.unique(a)), 'filas': len(a)}
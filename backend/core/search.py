@@ -0,0 +1,125 @@
+"""
+Búsqueda de texto completo sobre Libro con un índice FTS5 de SQLite.
+
+El índice es una tabla virtual de contenido externo (`core_libro_fts`) que
+apunta a `core_libro`; se mantiene sincronizada con triggers, así que también
+cubre `bulk_create`/`update()` que no disparan señales de Django.
+En motores que no son SQLite se cae a un filtro `icontains`.
+
+Ojo: si una migración reconstruye `core_libro` (SQLite lo hace al alterar
+columnas) los triggers se pierden; esa migración debe llamar a `crear_indice`.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'core_libro_fts'
+FTS_COLUMNS = ('titulo', 'autor', 'descripcion', 'isbn')
+# Pesos bm25 por columna, en el mismo orden que FTS_COLUMNS.
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+# Más allá de esto la paginación por offset recorre demasiadas filas.
+OFFSET_MAXIMO = 10000
+
+_cols = ', '.join(FTS_COLUMNS)
+_new = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+_old = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_cols}, content='core_libro', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_libro BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_libro BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_cols} ON core_libro BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new}); END",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_disponible(conn=None):
+    return (conn or connection).vendor == 'sqlite'
+
+
+def crear_indice(schema_editor):
+    """Crea la tabla FTS5 y sus triggers (idempotente). Usado desde migraciones."""
+    if not fts_disponible(schema_editor.connection):
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def borrar_indice(schema_editor):
+    if not fts_disponible(schema_editor.connection):
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+def reconstruir_indice():
+    """Regenera el índice completo desde core_libro en una sola sentencia."""
+    if not fts_disponible():
+        return False
+    with connection.cursor() as cursor:
+        for sql in CREATE_SQL:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return True
+
+
+def construir_consulta(texto):
+    """
+    Convierte el texto libre del usuario en una consulta FTS5 segura:
+    cada palabra se cita (sin operadores) y se busca por prefijo.
+    """
+    tokens = _TOKEN_RE.findall(texto or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def buscar_ids(texto, limit, offset=0):
+    """Devuelve los ids de Libro que coinciden, ordenados por relevancia (bm25)."""
+    consulta = construir_consulta(texto)
+    if not consulta:
+        return []
+
+    if not fts_disponible():
+        from .models import Libro
+        qs = Libro.objects.filter(filtro(texto)).order_by('id').values_list('id', flat=True)
+        return list(qs[offset:offset + limit])
+
+    pesos = ', '.join(str(w) for w in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {pesos}), rowid LIMIT %s OFFSET %s",
+            [consulta, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def filtro(texto):
+    """Q sobre Libro con los libros que coinciden con `texto`, sin orden ni límite."""
+    consulta = construir_consulta(texto)
+    if not consulta:
+        return Q(pk__in=[])
+    if fts_disponible():
+        return Q(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [consulta]))
+    condicion = Q()
+    for token in _TOKEN_RE.findall(texto):
+        condicion &= (Q(titulo__icontains=token) | Q(autor__icontains=token)
+                      | Q(descripcion__icontains=token) | Q(isbn__icontains=token))
+    return condicion
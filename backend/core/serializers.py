@@ -1,9 +1,38 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from . import portadas
 from .models import Genero, Libro, Compra, ItemCompra
 
 User = get_user_model()
 
+
+def validar_precio(value):
+    if value <= 0:
+        raise serializers.ValidationError("El precio debe ser mayor que 0")
+    return value
+
+
+def validar_isbn(value):
+    if not value or len(value.strip()) < 10:
+        raise serializers.ValidationError("ISBN debe tener al menos 10 caracteres")
+    return value.strip()
+
+
+class CamposDinamicosMixin:
+    """
+    Sparse fieldsets: si el contexto trae `fields`, la representación solo
+    incluye esos campos. No se aplica a serializers de entrada (con `data`).
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        pedidos = self.context.get('fields')
+        if pedidos and not hasattr(self.root, 'initial_data'):
+            for nombre in set(fields) - set(pedidos):
+                fields.pop(nombre)
+        return fields
+
+
 class GeneroSerializer(serializers.ModelSerializer):
     class Meta:
         model = Genero
@@ -11,10 +40,15 @@ class GeneroSerializer(serializers.ModelSerializer):
 
 class LibroSerializer(serializers.ModelSerializer):
     generos = GeneroSerializer(many=True,read_only=True)
+    portadas = serializers.SerializerMethodField()
 
     class Meta:
         model = Libro
-        fields = ['id', 'titulo', 'autor', 'precio', 'isbn', 'descripcion', 'portada', 'generos', 'ventas_totales']
+        fields = ['id', 'titulo', 'autor', 'precio', 'isbn', 'descripcion', 'portada', 'portadas', 'generos', 'ventas_totales']
+
+    def get_portadas(self, obj):
+        return portadas.urls(obj, self.context.get('request'))
+
     def create(self, validated_data):
         generos = validated_data.pop('generos', [])
         libro = Libro.objects.create(**validated_data)
@@ -31,9 +65,61 @@ class LibroSerializer(serializers.ModelSerializer):
         return instance
 
 
+class LibroResumenSerializer(serializers.ModelSerializer):
+    """Lo justo para mostrar un libro dentro de un carrito o una compra."""
+    miniatura = serializers.SerializerMethodField()
+
+    # Columnas que necesita; las vistas las usan con .only().
+    CAMPOS_CONSULTA = ['id', 'titulo', 'autor', 'precio', 'portada', 'portada_variantes']
+
+    class Meta:
+        model = Libro
+        fields = ['id', 'titulo', 'autor', 'precio', 'miniatura']
+
+    def get_miniatura(self, obj):
+        return portadas.miniatura(obj, self.context.get('request'))
+
+
+class LibroEnLoteField(serializers.PrimaryKeyRelatedField):
+    """Usa los libros que ItemCompraListSerializer ya trajo en bloque; si no hay, consulta como siempre."""
+
+    def to_internal_value(self, data):
+        libros = getattr(self.parent, 'libros_en_lote', None)
+        if libros is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in libros:
+            self.fail('does_not_exist', pk_value=data)
+        return libros[pk]
+
+
+class ItemCompraListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # Una consulta para todos los libros de la lista en vez de una por ítem.
+        if isinstance(data, list):
+            ids = set()
+            for item in data:
+                try:
+                    ids.add(int(item.get('libro_id')))
+                except (AttributeError, TypeError, ValueError):
+                    pass
+            # Fuera del rango de INTEGER la consulta falla con OverflowError; esos ids no existen.
+            ids = {pk for pk in ids if 1 <= pk < 2 ** 63}
+            self.child.libros_en_lote = Libro.objects.in_bulk(ids)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.child.libros_en_lote = None
+
+
 class ItemCompraSerializer(serializers.ModelSerializer):
     libro = LibroSerializer(read_only=True)
-    libro_id = serializers.PrimaryKeyRelatedField(
+    libro_id = LibroEnLoteField(
         queryset=Libro.objects.all(),
         source='libro',
         write_only=True
@@ -42,13 +128,21 @@ class ItemCompraSerializer(serializers.ModelSerializer):
     class Meta:
         model = ItemCompra
         fields = ['id', 'libro', 'libro_id', 'precio_unitario', 'cantidad']
+        list_serializer_class = ItemCompraListSerializer
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Las vistas de compras piden el libro completo solo con ?expand=libro.
+        if not self.context.get('expandir_libro', True):
+            fields['libro'] = LibroResumenSerializer(read_only=True)
+        return fields
 
 class UserMiniSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username']
 
-class CompraSerializer(serializers.ModelSerializer):
+class CompraSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     items = ItemCompraSerializer(many=True)
     usuario = UserMiniSerializer(read_only=True)
     comprobante = serializers.ImageField(read_only=True)
@@ -60,13 +154,15 @@ class CompraSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         compra = Compra.objects.create(**validated_data)
-        for item in items_data:
-            ItemCompra.objects.create(
+        ItemCompra.objects.bulk_create([
+            ItemCompra(
                 compra=compra,
                 libro=item['libro'],
                 precio_unitario=item['precio_unitario'],
                 cantidad=item.get('cantidad', 1)
             )
+            for item in items_data
+        ])
         return compra
 
 class UserSerializer(serializers.ModelSerializer):
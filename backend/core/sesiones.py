@@ -0,0 +1,265 @@
+"""
+Backend de sesiones (SESSION_ENGINE = 'core.sesiones') en tres niveles:
+
+1. Un LRU en memoria del proceso, acotado a SESIONES_LRU_MAX sesiones.
+2. La cache SESIONES_CACHE (FileBasedCache), compartida por los workers de
+   la misma máquina.
+3. La tabla django_session, que sigue siendo la fuente de verdad.
+
+Las lecturas prueban en ese orden; con la sesión en el LRU una request
+autenticada no toca ni el disco ni la base. Crear la sesión o cambiar sus
+datos (login, logout, set_expiry) escribe primero en la base y después en
+los otros niveles, como el backend cached_db.
+
+Las renovaciones (SESSION_SAVE_EVERY_REQUEST sin cambios en los datos) solo
+corren el vencimiento: se aplican enseguida en el LRU y la cache, y a la
+base llegan en segundo plano, en lotes, cada SESIONES_ESCRITURA_DEMORA
+segundos. Las que están a menos de SESIONES_RENOVAR_CADA segundos de la
+anterior se ignoran.
+
+Cada entrada del LRU vale SESIONES_LRU_TTL segundos: es lo que puede tardar
+otro worker en enterarse de un logout o un cambio hecho en este.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+PREFIJO = 'sesion:'
+
+logger = logging.getLogger(__name__)
+
+# datos: sesión codificada; expira: vencimiento conocido; hasta: fin de validez en el LRU (monotonic)
+Entrada = namedtuple('Entrada', 'datos expira hasta')
+
+_lru = None
+_lru_lock = threading.Lock()
+
+_pendientes = {}
+_lock = threading.Lock()
+_timer = None
+
+
+class LRU:
+    """Diccionario acotado: al pasar de `maximo` entradas se descarta la menos usada."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is not None:
+                self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def get_lru():
+    global _lru
+    with _lru_lock:
+        if _lru is None:
+            _lru = LRU(getattr(settings, 'SESIONES_LRU_MAX', 10000))
+        return _lru
+
+
+def get_cache():
+    return caches[getattr(settings, 'SESIONES_CACHE', 'sesiones')]
+
+
+def _segundos_hasta(expira):
+    return max(0, int((expira - timezone.now()).total_seconds()))
+
+
+def _recordar(clave, datos, expira):
+    hasta = time.monotonic() + getattr(settings, 'SESIONES_LRU_TTL', 10)
+    get_lru().set(clave, Entrada(datos, expira, hasta))
+
+
+class SessionStore(DBStore):
+
+    # ---------- Lectura ----------
+
+    def _desde_memoria(self):
+        entrada = get_lru().get(self.session_key)
+        if entrada is None:
+            return None
+        if entrada.hasta < time.monotonic() or entrada.expira <= timezone.now():
+            get_lru().delete(self.session_key)
+            return None
+        return entrada
+
+    def load(self):
+        entrada = self._desde_memoria()
+        if entrada is not None:
+            return self.decode(entrada.datos)
+        guardada = get_cache().get(PREFIJO + self.session_key)
+        if guardada is None:
+            sesion = self._get_session_from_db()
+            if sesion is None:
+                return {}
+            guardada = (sesion.session_data, sesion.expire_date)
+            get_cache().set(PREFIJO + self.session_key, guardada, _segundos_hasta(sesion.expire_date))
+        _recordar(self.session_key, *guardada)
+        return self.decode(guardada[0])
+
+    async def aload(self):
+        # Del LRU se lee sin salir del event loop; el resto de los niveles es síncrono.
+        entrada = self._desde_memoria()
+        if entrada is not None:
+            return self.decode(entrada.datos)
+        return await sync_to_async(self.load)()
+
+    # ---------- Escritura ----------
+
+    def save(self, must_create=False):
+        if self.session_key is not None and not must_create and not self.modified:
+            self._get_session()
+            if self.session_key is not None:
+                return self._renovar()
+        super().save(must_create=must_create)
+        datos, expira = self.encode(self._get_session(no_load=must_create)), self.get_expiry_date()
+        get_cache().set(PREFIJO + self.session_key, (datos, expira), _segundos_hasta(expira))
+        _recordar(self.session_key, datos, expira)
+
+    def _renovar(self):
+        clave = self.session_key
+        expira = self.get_expiry_date()
+        entrada = get_lru().get(clave)
+        if entrada is None:
+            # Se descartó del LRU entre la carga y el guardado: se guarda completa.
+            self.modified = True
+            return self.save()
+        if expira - entrada.expira < timedelta(seconds=getattr(settings, 'SESIONES_RENOVAR_CADA', 60)):
+            return
+        get_lru().set(clave, entrada._replace(expira=expira))
+        # touch conserva los datos que tenga la cache; solo se reescriben si la entrada ya no estaba.
+        if not get_cache().touch(PREFIJO + clave, _segundos_hasta(expira)):
+            get_cache().set(PREFIJO + clave, (entrada.datos, expira), _segundos_hasta(expira))
+        programar(clave, expira)
+
+    def delete(self, session_key=None):
+        clave = session_key or self.session_key
+        super().delete(session_key)
+        if clave is not None:
+            get_lru().delete(clave)
+            get_cache().delete(PREFIJO + clave)
+            with _lock:
+                _pendientes.pop(clave, None)
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create=must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        purgar_expiradas()
+
+
+# ---------- Escritura diferida de renovaciones ----------
+
+def programar(clave, expira):
+    """Anota el nuevo vencimiento de `clave` para la próxima escritura en lote."""
+    global _timer
+    with _lock:
+        _pendientes[clave] = expira
+        if _timer is None and getattr(settings, 'SESIONES_ESCRITURA_EN_SEGUNDO_PLANO', True):
+            _timer = threading.Timer(getattr(settings, 'SESIONES_ESCRITURA_DEMORA', 5.0), _escribir_en_segundo_plano)
+            _timer.daemon = True
+            _timer.start()
+
+
+def escribir_pendientes():
+    """Pasa a la base los vencimientos pendientes con UPDATEs en lote; devuelve cuántos."""
+    with _lock:
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+    if not pendientes:
+        return 0
+    modelo = SessionStore.get_model_class()
+    try:
+        modelo.objects.bulk_update(
+            [modelo(session_key=clave, expire_date=expira) for clave, expira in pendientes.items()],
+            ['expire_date'], batch_size=getattr(settings, 'SESIONES_LOTE', 500),
+        )
+    except DatabaseError:
+        # Vuelven a la cola sin pisar renovaciones más nuevas; se reintenta en la próxima.
+        with _lock:
+            for clave, expira in pendientes.items():
+                _pendientes.setdefault(clave, expira)
+        raise
+    return len(pendientes)
+
+
+def _escribir_en_segundo_plano():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        escribir_pendientes()
+    except Exception:
+        logger.exception('No se pudieron guardar las renovaciones de sesión')
+    finally:
+        # Corre en el hilo del timer: su conexión no la cierra nadie más.
+        connection.close()
+
+
+@atexit.register
+def _al_salir():
+    try:
+        escribir_pendientes()
+    except Exception:
+        logger.exception('No se pudieron guardar las renovaciones de sesión al salir')
+
+
+# ---------- Limpieza ----------
+
+def purgar_expiradas(lote=500, margen=0, pausa=0.0):
+    """
+    Borra las sesiones vencidas hace más de `margen` segundos, de a `lote`
+    por transacción y esperando `pausa` segundos entre lotes, así ninguna
+    escritura bloquea la base por mucho tiempo. Devuelve cuántas borró.
+    """
+    modelo = SessionStore.get_model_class()
+    limite = timezone.now() - timedelta(seconds=margen)
+    vencidas = modelo.objects.filter(expire_date__lt=limite)
+    total = 0
+    while True:
+        claves = list(vencidas.values_list('session_key', flat=True)[:lote])
+        if not claves:
+            return total
+        total += vencidas.filter(session_key__in=claves).delete()[0]
+        if len(claves) < lote:
+            return total
+        if pausa:
+            time.sleep(pausa)
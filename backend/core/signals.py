@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalogo, ranking
+from .models import Genero, Libro
+
+
+def _catalogo_cambiado(invalidar_ranking=True):
+    transaction.on_commit(catalogo.invalidar)
+    if invalidar_ranking:
+        transaction.on_commit(ranking.invalidar)
+
+
+@receiver(post_save, sender=Libro)
+def libro_guardado(sender, instance, created, update_fields=None, **kwargs):
+    # Las subidas de ventas las aplica ranking.registrar_ventas de forma incremental.
+    solo_ventas = bool(update_fields) and set(update_fields) <= {'ventas_totales'}
+    _catalogo_cambiado(invalidar_ranking=not solo_ventas)
+
+
+@receiver(post_delete, sender=Libro)
+def libro_borrado(sender, instance, **kwargs):
+    _catalogo_cambiado()
+
+
+@receiver(m2m_changed, sender=Libro.generos.through)
+def generos_de_libro_cambiados(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _catalogo_cambiado()
+
+
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+def genero_cambiado(sender, **kwargs):
+    _catalogo_cambiado(invalidar_ranking=False)
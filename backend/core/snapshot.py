@@ -0,0 +1,175 @@
+"""
+Snapshot del catálogo público en disco, precomprimido.
+
+Un solo JSON con todos los libros (con sus géneros, igual que /api/libros/),
+la lista de géneros y los ids del top-10, escrito por versión del catálogo
+junto a su variante gzip. La variante brotli está apagada por defecto: solo
+se genera si se instala el paquete opcional `brotli`, que el proyecto no
+trae como dependencia.
+
+    CATALOGO_SNAPSHOT_DIR/catalogo-<version>.json[.gz|.br]
+    CATALOGO_SNAPSHOT_DIR/actual.json   -> {"version": ..., "codificaciones": [...]}
+
+`actual.json` se reemplaza de forma atómica al final, así quien lee nunca ve
+un snapshot a medio escribir. Cada `catalogo.invalidar()` programa una
+reconstrucción en segundo plano con debounce: se espera a que pasen
+CATALOGO_SNAPSHOT_DEMORA segundos sin cambios, pero nunca más de
+CATALOGO_SNAPSHOT_ESPERA_MAXIMA desde el primer cambio pendiente. Con
+TAREAS_EN_SEGUNDO_PLANO la reconstrucción va a la cola de tareas con una
+clave fija: los cambios que llegan mientras espera se juntan en una sola.
+
+Las URLs de portadas son relativas a MEDIA_URL: el archivo es el mismo para
+cualquier host.
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from . import catalogo, lectura, ranking, tareas
+from .models import Genero, Libro
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+ACTUAL = 'actual.json'
+# Versiones anteriores que se conservan para clientes que todavía las estén bajando.
+CONSERVAR = 3
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_timer = None
+_primer_cambio = None
+
+
+def directorio():
+    return str(getattr(settings, 'CATALOGO_SNAPSHOT_DIR', os.path.join(settings.BASE_DIR, 'snapshots')))
+
+
+def nombre_archivo(version, codificacion=None):
+    extension = {None: '', 'gzip': '.gz', 'br': '.br'}[codificacion]
+    return os.path.join(directorio(), f'catalogo-{version}.json{extension}')
+
+
+def codificaciones_disponibles():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def actual():
+    """{'version', 'codificaciones'} del último snapshot escrito, o None si no hay."""
+    try:
+        with open(os.path.join(directorio(), ACTUAL), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir(ruta, contenido):
+    # Archivo temporal en el mismo directorio + os.replace: el cambio es atómico.
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def contenido():
+    """JSON del snapshot; la versión se lee antes que los datos para no etiquetarlos de más."""
+    version = catalogo.version_actual()
+    datos = {
+        'version': version,
+        'generos': list(Genero.objects.values('id', 'nombre')),
+        'top': ranking.top_ids(),
+        'libros': lectura.serializar(lectura.filas(Libro.objects.order_by('id'))),
+    }
+    return version, JSONRenderer().render(datos)
+
+
+def construir(forzar=False):
+    """Escribe el snapshot de la versión actual si todavía no existe y devuelve `actual()`."""
+    existente = actual()
+    if not forzar and existente and existente['version'] == catalogo.version_actual():
+        return existente
+
+    os.makedirs(directorio(), exist_ok=True)
+    version, json_bytes = contenido()
+    _escribir(nombre_archivo(version), json_bytes)
+    # mtime=0: mismo contenido, mismos bytes comprimidos.
+    _escribir(nombre_archivo(version, 'gzip'), gzip.compress(json_bytes, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _escribir(nombre_archivo(version, 'br'), brotli.compress(json_bytes, quality=11))
+
+    nuevo = {'version': version, 'codificaciones': list(codificaciones_disponibles())}
+    _escribir(os.path.join(directorio(), ACTUAL), json.dumps(nuevo).encode('utf-8'))
+    _limpiar(version)
+    return nuevo
+
+
+def _limpiar(version_actual):
+    versiones = set()
+    for nombre in os.listdir(directorio()):
+        if nombre.startswith('catalogo-'):
+            try:
+                versiones.add(int(nombre[len('catalogo-'):].split('.', 1)[0]))
+            except ValueError:
+                continue
+    viejas = sorted(v for v in versiones if v != version_actual)[:-(CONSERVAR - 1) or None]
+    for version in viejas:
+        for codificacion in (None, 'gzip', 'br'):
+            try:
+                os.unlink(nombre_archivo(version, codificacion))
+            except FileNotFoundError:
+                pass
+
+
+def programar():
+    """Agenda una reconstrucción con debounce (ver el docstring del módulo)."""
+    global _timer, _primer_cambio
+    if not getattr(settings, 'CATALOGO_SNAPSHOT_EN_SEGUNDO_PLANO', True):
+        return
+    demora = getattr(settings, 'CATALOGO_SNAPSHOT_DEMORA', 2.0)
+    if tareas.en_segundo_plano():
+        construir_en_cola.encolar(clave='catalogo:snapshot', demora=demora)
+        return
+    espera_maxima = getattr(settings, 'CATALOGO_SNAPSHOT_ESPERA_MAXIMA', 30.0)
+    with _lock:
+        ahora = time.monotonic()
+        if _primer_cambio is None:
+            _primer_cambio = ahora
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(min(demora, max(0.0, _primer_cambio + espera_maxima - ahora)), _reconstruir)
+        _timer.daemon = True
+        _timer.start()
+
+
+@tareas.tarea(max_intentos=3)
+def construir_en_cola():
+    construir()
+
+
+def _reconstruir():
+    global _timer, _primer_cambio
+    with _lock:
+        _timer = None
+        _primer_cambio = None
+    try:
+        construir()
+    except Exception:
+        logger.exception('No se pudo reconstruir el snapshot del catálogo')
+    finally:
+        # Corre en el hilo del timer: su conexión no la cierra nadie más.
+        connection.close()
@@ -0,0 +1,244 @@
+"""
+Cola de tareas en la base de datos, sin broker: solo hace falta la base
+(SQLite alcanza).
+
+    @tareas.tarea()
+    def aplicar_efectos(compra_ids, signo): ...
+
+    aplicar_efectos.encolar(compra_ids=[1, 2], signo=1)
+
+`encolar` inserta una fila en Tarea dentro de la transacción en curso, así
+la tarea existe solo si el cambio que la origina se confirma. Con
+TAREAS_EN_SEGUNDO_PLANO apagado la función se ejecuta en el momento, como
+antes de existir la cola.
+
+`manage.py run_workers` reclama tareas (UPDATE condicional sobre el estado,
+sin SELECT FOR UPDATE) y las ejecuta en un pool de procesos. Cada tarea
+corre en una transacción junto con el cambio a COMPLETADA: sus escrituras en
+la base se aplican una sola vez aunque el worker muera a mitad de camino.
+Si falla vuelve a PENDIENTE con espera exponencial hasta agotar
+`max_intentos` (FALLIDA); una tarea EN_CURSO cuyo bloqueo vence (worker
+muerto) cuenta como un intento fallido.
+
+Con `clave` hay a lo sumo una tarea PENDIENTE por clave: encolar otra
+devuelve la existente. Las tareas de la cola deben leer el estado actual al
+ejecutarse, no depender de lo que había al encolarlas.
+
+Los workers son otros procesos: lo que invaliden en la caché
+(catalogo.invalidar, ranking...) solo llega al servidor web si
+CACHES['default'] es compartida.
+"""
+import functools
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import workers
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+
+class TareaPerdida(Exception):
+    """La tarea dejó de estar EN_CURSO para este worker mientras corría."""
+
+
+def tarea(max_intentos=5):
+    """Registra la función como tarea; se encola con `funcion.encolar(**kwargs)`."""
+    def decorador(funcion):
+        funcion.nombre_tarea = f'{funcion.__module__}.{funcion.__qualname__}'
+        funcion.max_intentos = max_intentos
+        funcion.encolar = functools.partial(encolar, funcion)
+        return funcion
+    return decorador
+
+
+def en_segundo_plano():
+    return getattr(settings, 'TAREAS_EN_SEGUNDO_PLANO', False)
+
+
+def encolar(funcion, clave=None, demora=0, **kwargs):
+    """
+    Encola `funcion(**kwargs)` (los argumentos tienen que ser JSON) y
+    devuelve la Tarea; si ya hay una PENDIENTE con `clave`, devuelve esa.
+    Sin segundo plano ejecuta la función en el momento y devuelve None.
+    """
+    if not en_segundo_plano():
+        funcion(**kwargs)
+        return None
+    datos = {
+        'nombre': funcion.nombre_tarea, 'argumentos': kwargs, 'clave': clave,
+        'max_intentos': funcion.max_intentos,
+        'disponible_desde': timezone.now() + timedelta(seconds=demora),
+    }
+    if clave is None:
+        return Tarea.objects.create(**datos)
+    try:
+        with transaction.atomic():
+            return Tarea.objects.create(**datos)
+    except IntegrityError:
+        existente = Tarea.objects.filter(clave=clave, estado='PENDIENTE').first()
+        if existente is None:
+            # La que estaba pendiente se reclamó entremedio: esta es la nueva pendiente.
+            return Tarea.objects.create(**datos)
+        return existente
+
+
+def espera(intentos):
+    """Segundos hasta el próximo intento: exponencial, con tope y ±20% al azar."""
+    base = getattr(settings, 'TAREAS_REINTENTO_BASE', 5)
+    maximo = getattr(settings, 'TAREAS_REINTENTO_MAXIMO', 600)
+    return min(maximo, base * 2 ** (intentos - 1)) * random.uniform(0.8, 1.2)
+
+
+def identificador():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# ---------- Worker ----------
+
+def reclamar(worker, cantidad):
+    """Pasa a EN_CURSO hasta `cantidad` tareas disponibles y devuelve sus ids."""
+    bloqueo = timedelta(seconds=getattr(settings, 'TAREAS_BLOQUEO', 300))
+    reclamadas = []
+    while len(reclamadas) < cantidad:
+        ahora = timezone.now()
+        candidatas = list(
+            Tarea.objects.filter(estado='PENDIENTE', disponible_desde__lte=ahora)
+            .order_by('disponible_desde', 'id').values_list('id', flat=True)[:cantidad - len(reclamadas)]
+        )
+        if not candidatas:
+            break
+        for tarea_id in candidatas:
+            # Si otro worker la tomó antes, el UPDATE no encuentra la fila PENDIENTE.
+            if Tarea.objects.filter(id=tarea_id, estado='PENDIENTE').update(
+                    estado='EN_CURSO', worker=worker, bloqueada_hasta=ahora + bloqueo, intentos=F('intentos') + 1):
+                reclamadas.append(tarea_id)
+    return reclamadas
+
+
+def _fallo(tarea_id, worker, error):
+    tarea = Tarea.objects.filter(id=tarea_id, estado='EN_CURSO', worker=worker).first()
+    if tarea is None:
+        return
+    cambios = {'error': error, 'bloqueada_hasta': None}
+    if tarea.intentos >= tarea.max_intentos:
+        cambios.update(estado='FALLIDA', terminada=timezone.now())
+    else:
+        cambios.update(estado='PENDIENTE',
+                       disponible_desde=timezone.now() + timedelta(seconds=espera(tarea.intentos)))
+    try:
+        with transaction.atomic():
+            Tarea.objects.filter(id=tarea_id, estado='EN_CURSO', worker=worker).update(**cambios)
+    except IntegrityError:
+        # Ya hay otra pendiente con la misma clave: hará el mismo trabajo.
+        Tarea.objects.filter(id=tarea_id, estado='EN_CURSO', worker=worker).update(
+            estado='CANCELADA', error=error, bloqueada_hasta=None, terminada=timezone.now())
+
+
+def ejecutar(tarea_id, worker):
+    """Ejecuta una tarea ya reclamada por `worker`; devuelve el estado en que quedó."""
+    tarea = Tarea.objects.get(id=tarea_id)
+    if (tarea.estado, tarea.worker) != ('EN_CURSO', worker):
+        return tarea.estado
+    try:
+        funcion = import_string(tarea.nombre)
+        if getattr(funcion, 'nombre_tarea', None) != tarea.nombre:
+            raise ValueError(f'{tarea.nombre} no es una tarea registrada')
+        with transaction.atomic():
+            funcion(**tarea.argumentos)
+            # Si otro worker la recuperó por bloqueo vencido, se deshace todo.
+            if not Tarea.objects.filter(id=tarea_id, estado='EN_CURSO', worker=worker).update(
+                    estado='COMPLETADA', error='', bloqueada_hasta=None, terminada=timezone.now()):
+                raise TareaPerdida(tarea_id)
+    except TareaPerdida:
+        logger.warning('La tarea %s dejó de pertenecer a %s; se descartó el resultado', tarea_id, worker)
+    except Exception:
+        logger.exception('Falló la tarea %s (%s), intento %s', tarea_id, tarea.nombre, tarea.intentos)
+        _fallo(tarea_id, worker, traceback.format_exc())
+    return Tarea.objects.values_list('estado', flat=True).get(id=tarea_id)
+
+
+def recuperar_vencidas():
+    """Las EN_CURSO con el bloqueo vencido (worker muerto) cuentan como un intento fallido."""
+    vencidas = Tarea.objects.filter(estado='EN_CURSO', bloqueada_hasta__lt=timezone.now())
+    recuperadas = 0
+    for tarea_id, worker in vencidas.values_list('id', 'worker'):
+        _fallo(tarea_id, worker, 'Bloqueo vencido: el worker no terminó la tarea')
+        recuperadas += 1
+    return recuperadas
+
+
+def limpiar():
+    """Borra las COMPLETADA y CANCELADA de hace más de TAREAS_CONSERVAR_DIAS días."""
+    limite = timezone.now() - timedelta(days=getattr(settings, 'TAREAS_CONSERVAR_DIAS', 7))
+    return Tarea.objects.filter(estado__in=['COMPLETADA', 'CANCELADA'], terminada__lt=limite).delete()[0]
+
+
+def ejecutar_pendientes(worker=None, limite=None):
+    """Ejecuta en este proceso las tareas disponibles (tests, run_workers --procesos 0)."""
+    worker = worker or identificador()
+    ejecutadas = 0
+    while limite is None or ejecutadas < limite:
+        ids = reclamar(worker, 1)
+        if not ids:
+            break
+        ejecutar(ids[0], worker)
+        ejecutadas += 1
+    return ejecutadas
+
+
+def consumir(procesos, detener, intervalo=None, una_vez=False):
+    """
+    Bucle de run_workers: reclama tareas mientras haya procesos libres y las
+    reparte en un ProcessPoolExecutor. Termina cuando `detener` (un Event) se
+    activa o, con `una_vez`, cuando no quedan tareas disponibles.
+    """
+    intervalo = intervalo if intervalo is not None else getattr(settings, 'TAREAS_INTERVALO', 1.0)
+    worker = identificador()
+    nuevo_pool = functools.partial(ProcessPoolExecutor, max_workers=procesos, mp_context=get_context('spawn'),
+                                   initializer=workers.inicializar)
+    pool = nuevo_pool()
+    en_vuelo = {}
+    ultimo_mantenimiento = 0.0
+    try:
+        while not detener.is_set():
+            if time.monotonic() - ultimo_mantenimiento > intervalo * 30:
+                recuperar_vencidas()
+                limpiar()
+                ultimo_mantenimiento = time.monotonic()
+
+            for futuro in [f for f in en_vuelo if f.done()]:
+                tarea_id = en_vuelo.pop(futuro)
+                if isinstance(futuro.exception(), BrokenProcessPool):
+                    # Un hijo murió: la tarea sigue EN_CURSO hasta que venza su bloqueo.
+                    logger.error('Se perdió el proceso de la tarea %s; se reinicia el pool', tarea_id)
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = nuevo_pool()
+
+            ids = reclamar(worker, procesos - len(en_vuelo)) if len(en_vuelo) < procesos else []
+            for tarea_id in ids:
+                en_vuelo[pool.submit(workers.ejecutar, tarea_id, worker)] = tarea_id
+            if una_vez and not ids and not en_vuelo:
+                break
+            if not ids:
+                if en_vuelo:
+                    wait(en_vuelo, timeout=intervalo, return_when=FIRST_COMPLETED)
+                else:
+                    detener.wait(intervalo)
+    finally:
+        pool.shutdown(wait=True)
+        close_old_connections()
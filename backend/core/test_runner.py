@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Corre los tests sin trabajo en segundo plano fuera del control de cada
+    test: el snapshot del catálogo no se reconstruye con timers (que compiten
+    con la base de tests) y, si un test lo construye, lo escribe en un
+    directorio temporal en vez de BASE_DIR/snapshots. Las sesiones usan una
+    caché en memoria en vez de la de disco (que sobrevive entre corridas) y
+    sus renovaciones no se escriben desde un timer.
+    """
+
+    def ajustes(self, temporal):
+        return {
+            'CATALOGO_SNAPSHOT_EN_SEGUNDO_PLANO': False,
+            'CATALOGO_SNAPSHOT_DIR': f'{temporal}/snapshots',
+            'CACHES': {
+                **settings.CACHES,
+                'sesiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sesiones'},
+            },
+            'SESIONES_ESCRITURA_EN_SEGUNDO_PLANO': False,
+        }
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._temporal = tempfile.mkdtemp(prefix='tests-')
+        self._ajustes = override_settings(**self.ajustes(self._temporal))
+        self._ajustes.enable()
+
+    def teardown_databases(self, old_config, **kwargs):
+        from core import sesiones
+
+        # Las renovaciones pendientes son de la base de tests: no deben llegar a la real al salir.
+        sesiones.escribir_pendientes()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self._ajustes.disable()
+        shutil.rmtree(self._temporal, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
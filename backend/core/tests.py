@@ -1,3 +1,1511 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import random
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from . import catalogo, estadisticas, facetas, idempotencia, metricas, portadas, ranking, relacionados, search, sesiones, snapshot, tareas, ventas
+from .models import (Compra, Genero, ItemCompra, Libro, LibroRelacionado, Tarea, User,
+                     VentaDiariaGenero, VentaDiariaLibro)
+from .serializers import LibroSerializer
+from .views.compra_views import CompraViewSet
+
+
+# ---------- Presupuestos de consultas ----------
+
+# Máximo de consultas SQL por endpoint y acción. Cada test mide con dos
+# tamaños de datos: además de no pasar el presupuesto, la cantidad tiene que
+# ser la misma en ambos (no puede crecer con los datos).
+PRESUPUESTOS = {
+    'generos-list': 1,
+    'generos-libros': 3,
+    'generos-top': 4,
+    'libros-list': 2,
+    'libros-list-paginado': 2,
+    'libros-retrieve': 2,
+    'libros-top': 3,
+    'libros-buscar': 3,
+    'libros-facetas': 3,
+    'compras-list': 2,
+    'compras-retrieve': 2,
+    'compras-create': 4,
+    'compras-mi-carrito': 2,
+    'compras-mi-carrito-expandido': 3,
+    'compras-agregar-items': 10,
+    'compras-checkout': 9,
+    'compras-confirmar-lote': 14,
+}
+
+TAMANOS = (3, 30)
+
+
+class PresupuestoConsultasMixin:
+    """Helpers para medir consultas de una request y comparar entre tamaños."""
+
+    def medir(self, metodo, url, data=None, usuario=None):
+        self.client.force_authenticate(usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            response = getattr(self.client, metodo)(url, data, format='json')
+        self.assertLess(response.status_code, 400, response.content[:500])
+        return len(consultas)
+
+    def assertPresupuesto(self, nombre, medir_con_tamano):
+        """`medir_con_tamano(n)` prepara datos de tamaño n y devuelve las consultas de la request."""
+        conteos = []
+        for tamano in TAMANOS:
+            cache.clear()
+            ranking.invalidar()
+            conteos.append(medir_con_tamano(tamano))
+        for tamano, conteo in zip(TAMANOS, conteos):
+            self.assertLessEqual(
+                conteo, PRESUPUESTOS[nombre],
+                f'{nombre}: {conteo} consultas con tamaño {tamano} (presupuesto {PRESUPUESTOS[nombre]})'
+            )
+        self.assertEqual(
+            len(set(conteos)), 1,
+            f'{nombre}: las consultas crecen con los datos ({dict(zip(TAMANOS, conteos))})'
+        )
+
+
+class PresupuestoCatalogoTests(PresupuestoConsultasMixin, APITestCase):
+    def crear_catalogo(self, n):
+        """n géneros y n*2 libros, cada libro en todos los géneros."""
+        Libro.objects.all().delete()
+        Genero.objects.all().delete()
+        generos = Genero.objects.bulk_create([Genero(nombre=f'G{n}-{i}') for i in range(n)])
+        libros = Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {i}', autor=f'Autor {i % 5}', precio=Decimal('10.00') + i,
+                  isbn=f'{n:04d}{i:09d}', descripcion='descripción', portada='portadas/x.jpg',
+                  ventas_totales=i)
+            for i in range(n * 2)
+        ])
+        Libro.generos.through.objects.bulk_create([
+            Libro.generos.through(libro_id=libro.id, genero_id=genero.id)
+            for libro in libros for genero in generos
+        ])
+        return generos, libros
+
+    def test_generos_list(self):
+        def medir(n):
+            self.crear_catalogo(n)
+            return self.medir('get', '/api/generos/')
+        self.assertPresupuesto('generos-list', medir)
+
+    def test_generos_libros(self):
+        def medir(n):
+            generos, _ = self.crear_catalogo(n)
+            return self.medir('get', f'/api/generos/{generos[0].id}/libros/')
+        self.assertPresupuesto('generos-libros', medir)
+
+    def test_generos_top(self):
+        def medir(n):
+            generos, _ = self.crear_catalogo(n)
+            return self.medir('get', f'/api/generos/{generos[0].id}/top/')
+        self.assertPresupuesto('generos-top', medir)
+
+    def test_libros_list(self):
+        def medir(n):
+            self.crear_catalogo(n)
+            return self.medir('get', '/api/libros/')
+        self.assertPresupuesto('libros-list', medir)
+
+    def test_libros_list_paginado(self):
+        def medir(n):
+            self.crear_catalogo(n)
+            return self.medir('get', '/api/libros/?limit=5')
+        self.assertPresupuesto('libros-list-paginado', medir)
+
+    def test_libros_retrieve(self):
+        def medir(n):
+            _, libros = self.crear_catalogo(n)
+            return self.medir('get', f'/api/libros/{libros[0].id}/')
+        self.assertPresupuesto('libros-retrieve', medir)
+
+    def test_libros_top(self):
+        def medir(n):
+            self.crear_catalogo(n)
+            return self.medir('get', '/api/libros/top/')
+        self.assertPresupuesto('libros-top', medir)
+
+    def test_libros_buscar(self):
+        def medir(n):
+            self.crear_catalogo(n)
+            return self.medir('get', '/api/libros/buscar/?q=Libro')
+        self.assertPresupuesto('libros-buscar', medir)
+
+    def test_libros_facetas(self):
+        def medir(n):
+            generos, _ = self.crear_catalogo(n)
+            return self.medir('get', f'/api/libros/facetas/?generos={generos[0].id}&precio_max=20&q=Libro')
+        self.assertPresupuesto('libros-facetas', medir)
+
+
+class PresupuestoComprasTests(PresupuestoConsultasMixin, APITestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('cliente', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        genero = Genero.objects.create(nombre='Novela')
+        self.libros = Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {i}', autor='Autor', precio=Decimal('5.00') + i,
+                  isbn=f'{i:013d}', descripcion='descripción', portada='portadas/x.jpg')
+            for i in range(max(TAMANOS) * 2)
+        ])
+        Libro.generos.through.objects.bulk_create([
+            Libro.generos.through(libro_id=libro.id, genero_id=genero.id) for libro in self.libros
+        ])
+
+    def crear_compra(self, n, estado='CARRITO', usuario=None):
+        compra = Compra.objects.create(usuario=usuario or self.usuario, total=0, estado=estado)
+        ItemCompra.objects.bulk_create([
+            ItemCompra(compra=compra, libro=libro, precio_unitario=libro.precio, cantidad=1)
+            for libro in self.libros[:n]
+        ])
+        return compra
+
+    def test_compras_list(self):
+        def medir(n):
+            Compra.objects.all().delete()
+            for _ in range(n):
+                self.crear_compra(n, estado='PENDIENTE')
+            return self.medir('get', '/api/compras/', usuario=self.usuario)
+        self.assertPresupuesto('compras-list', medir)
+
+    def test_compras_retrieve(self):
+        def medir(n):
+            compra = self.crear_compra(n, estado='PENDIENTE')
+            return self.medir('get', f'/api/compras/{compra.id}/', usuario=self.usuario)
+        self.assertPresupuesto('compras-retrieve', medir)
+
+    def test_compras_create(self):
+        def medir(n):
+            items = [{'libro_id': libro.id, 'precio_unitario': str(libro.precio), 'cantidad': 1}
+                     for libro in self.libros[:n]]
+            return self.medir('post', '/api/compras/', {'items': items}, usuario=self.usuario)
+        self.assertPresupuesto('compras-create', medir)
+
+    def test_compras_mi_carrito(self):
+        def medir(n):
+            Compra.objects.all().delete()
+            self.crear_compra(n)
+            return self.medir('get', '/api/compras/mi-carrito/', usuario=self.usuario)
+        self.assertPresupuesto('compras-mi-carrito', medir)
+
+    def test_compras_mi_carrito_expandido(self):
+        def medir(n):
+            Compra.objects.all().delete()
+            self.crear_compra(n)
+            return self.medir('get', '/api/compras/mi-carrito/?expand=libro', usuario=self.usuario)
+        self.assertPresupuesto('compras-mi-carrito-expandido', medir)
+
+    def test_compras_agregar_items(self):
+        def medir(n):
+            Compra.objects.filter(estado='CARRITO').delete()
+            carrito = self.crear_compra(n)
+            # La mitad ya está en el carrito y la otra mitad es nueva.
+            items = [{'libro_id': libro.id, 'cantidad': 1} for libro in self.libros[n // 2:n + n // 2]]
+            return self.medir('post', f'/api/compras/{carrito.id}/agregar-items/', {'items': items},
+                              usuario=self.usuario)
+        self.assertPresupuesto('compras-agregar-items', medir)
+
+    def test_compras_checkout(self):
+        def medir(n):
+            carrito = self.crear_compra(n)
+            return self.medir('post', f'/api/compras/{carrito.id}/checkout/', usuario=self.usuario)
+        self.assertPresupuesto('compras-checkout', medir)
+
+    def test_compras_confirmar_lote(self):
+        def medir(n):
+            ids = [self.crear_compra(n, estado='PENDIENTE').id for _ in range(n)]
+            return self.medir('post', '/api/compras/confirmar-lote/', {'ids': ids}, usuario=self.admin)
+        self.assertPresupuesto('compras-confirmar-lote', medir)
+
+
+# ---------- Índices y restricciones ----------
+
+@skipUnless(connection.vendor == 'sqlite', 'los planes se comparan con el formato de EXPLAIN QUERY PLAN de SQLite')
+class IndicesTests(APITestCase):
+    """Las consultas calientes usan un índice y no recorren la tabla ni ordenan aparte."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cliente', password='x')
+        self.libro = Libro.objects.create(titulo='Libro', autor='Autor', precio=Decimal('5.00'),
+                                          isbn='0000000000001', descripcion='d', portada='portadas/x.jpg')
+        self.carrito = Compra.objects.create(usuario=self.usuario, total=0, estado='CARRITO')
+
+    def assertUsaIndice(self, queryset, indice=None):
+        plan = queryset.explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX ' + (indice or ''), plan)
+        self.assertNotIn('TEMP B-TREE', plan, plan)
+
+    def test_planes(self):
+        self.assertUsaIndice(Compra.objects.filter(usuario=self.usuario, estado='CARRITO').order_by(),
+                             'compra_carrito_unico')
+        self.assertUsaIndice(Compra.objects.filter(usuario=self.usuario), 'compra_usuario_act_idx')
+        self.assertUsaIndice(Compra.objects.all()[:50], 'compra_actualizacion_idx')
+        self.assertUsaIndice(Libro.objects.order_by('-ventas_totales', '-id')[:10], 'libro_ventas_id_idx')
+        # La restricción única (compra, libro) crea un índice automático con nombre de SQLite.
+        self.assertUsaIndice(ItemCompra.objects.filter(compra=self.carrito, libro_id__in=[self.libro.id]))
+
+    def test_un_carrito_por_usuario(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Compra.objects.create(usuario=self.usuario, total=0, estado='CARRITO')
+        Compra.objects.create(usuario=self.usuario, total=0, estado='PENDIENTE')
+
+        self.client.force_authenticate(self.usuario)
+        self.assertEqual(self.client.get('/api/compras/mi-carrito/').json()['id'], self.carrito.id)
+
+    def test_agregar_items_suma_cantidades(self):
+        self.client.force_authenticate(self.usuario)
+        url = f'/api/compras/{self.carrito.id}/agregar-items/'
+        for cantidad in (2, 3):
+            response = self.client.post(url, {'items': [{'libro_id': self.libro.id, 'cantidad': cantidad}]},
+                                        format='json')
+            self.assertEqual(response.status_code, 200)
+        item = ItemCompra.objects.get(compra=self.carrito)
+        self.assertEqual((item.cantidad, item.precio_unitario), (5, Decimal('5.00')))
+        self.assertEqual(response.json()['total'], '25.00')
+
+    def test_agregar_items_fuera_de_rango(self):
+        self.client.force_authenticate(self.usuario)
+        url = f'/api/compras/{self.carrito.id}/agregar-items/'
+        caro = Libro.objects.create(titulo='Caro', autor='Autor', precio=Decimal('999999.99'),
+                                    isbn='0000000000002', descripcion='d', portada='portadas/x.jpg')
+        for items in ([{'libro_id': self.libro.id, 'cantidad': 2 ** 40}],
+                      [{'libro_id': self.libro.id, 'cantidad': 2 ** 70}],
+                      [{'libro_id': 2 ** 70, 'cantidad': 1}],
+                      [{'libro_id': 0, 'cantidad': 1}],
+                      [{'libro_id': caro.id, 'cantidad': 101}]):
+            response = self.client.post(url, {'items': items}, format='json')
+            self.assertEqual(response.status_code, 400, items)
+
+        # El tope por libro cuenta lo que ya estaba en el carrito.
+        response = self.client.post(url, {'items': [{'libro_id': self.libro.id, 'cantidad': 1000}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(url, {'items': [{'libro_id': self.libro.id, 'cantidad': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Un rechazo no deja nada a medias y el carrito se sigue leyendo.
+        response = self.client.post(url, {'items': [{'libro_id': caro.id, 'cantidad': 100}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ItemCompra.objects.filter(compra=self.carrito, libro=caro).exists())
+        response = self.client.get('/api/compras/mi-carrito/')
+        self.assertEqual((response.status_code, response.json()['total']), (200, '5000.00'))
+
+    def test_crear_compra_con_libro_inexistente(self):
+        self.client.force_authenticate(self.usuario)
+        for libro_id in (999999, 2 ** 63, 2 ** 70, 0):
+            response = self.client.post('/api/compras/', {'items': [
+                {'libro_id': self.libro.id, 'precio_unitario': '5.00', 'cantidad': 1},
+                {'libro_id': libro_id, 'precio_unitario': '5.00', 'cantidad': 1},
+            ]}, format='json')
+            self.assertEqual(response.status_code, 400, libro_id)
+            self.assertIn('libro_id', response.json()['items']['1'])
+
+
+# ---------- Cambios de estado ----------
+
+class CambioEstadoTests(APITestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('cliente', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.libro = Libro.objects.create(titulo='Libro', autor='Autor', precio=Decimal('5.00'),
+                                          isbn='0000000000001', descripcion='d', portada='portadas/x.jpg')
+        self.client.force_authenticate(self.admin)
+
+    def crear_compra(self, cantidad=2):
+        compra = Compra.objects.create(usuario=self.usuario, total=0, estado='PENDIENTE')
+        ItemCompra.objects.create(compra=compra, libro=self.libro, precio_unitario=self.libro.precio,
+                                  cantidad=cantidad)
+        return compra
+
+    def cambiar(self, compra, estado):
+        return self.client.patch(f'/api/compras/{compra.id}/', {'estado': estado}, format='json')
+
+    def ventas(self):
+        self.libro.refresh_from_db()
+        return self.libro.ventas_totales
+
+    def test_confirmar_dos_veces_suma_una_vez(self):
+        compra = self.crear_compra(cantidad=2)
+        for _ in range(2):
+            response = self.cambiar(compra, 'CONFIRMADA')
+            self.assertEqual((response.status_code, response.json()['estado']), (200, 'CONFIRMADA'))
+        self.assertEqual(self.ventas(), 2)
+
+    def test_rechazar_una_confirmada_revierte_las_ventas(self):
+        compra = self.crear_compra(cantidad=3)
+        self.cambiar(compra, 'CONFIRMADA')
+        self.assertEqual(self.ventas(), 3)
+        response = self.cambiar(compra, 'RECHAZADA')
+        self.assertEqual((response.status_code, response.json()['estado']), (200, 'RECHAZADA'))
+        self.assertEqual(self.ventas(), 0)
+        self.assertEqual(VentaDiariaLibro.objects.get(libro=self.libro).unidades, 0)
+
+    def test_cambio_simultaneo_da_409(self):
+        compra = self.crear_compra()
+        original = CompraViewSet.get_object
+
+        def get_object(vista):
+            # Otro admin la rechaza entre la lectura y el cambio de estado.
+            leida = original(vista)
+            Compra.objects.filter(pk=leida.pk).update(estado='RECHAZADA')
+            return leida
+
+        with mock.patch.object(CompraViewSet, 'get_object', get_object):
+            response = self.cambiar(compra, 'CONFIRMADA')
+        self.assertEqual(response.status_code, 409)
+        compra.refresh_from_db()
+        self.assertEqual(compra.estado, 'RECHAZADA')
+        self.assertEqual(self.ventas(), 0)
+
+    def test_confirmar_lote(self):
+        pendientes = [self.crear_compra(cantidad=1) for _ in range(3)]
+        rechazada = self.crear_compra()
+        Compra.objects.filter(pk=rechazada.pk).update(estado='RECHAZADA')
+        ids = [compra.id for compra in pendientes] + [rechazada.id, 999999]
+
+        response = self.client.post('/api/compras/confirmar-lote/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'estado': 'CONFIRMADA',
+            'procesadas': sorted(compra.id for compra in pendientes),
+            'omitidas': sorted([rechazada.id, 999999]),
+        })
+        self.assertEqual(self.ventas(), 3)
+
+        # Las que ya se confirmaron quedan omitidas en un segundo lote.
+        response = self.client.post('/api/compras/confirmar-lote/', {'ids': ids[:2], 'estado': 'RECHAZADA'},
+                                    format='json')
+        self.assertEqual(response.json()['procesadas'], [])
+        self.assertEqual(response.json()['omitidas'], sorted(ids[:2]))
+        self.assertEqual(self.ventas(), 3)
+
+    def test_confirmar_lote_ids_fuera_de_rango(self):
+        compra = self.crear_compra()
+        for ids in ([2 ** 70], [compra.id, 2 ** 63], [0], [-1]):
+            response = self.client.post('/api/compras/confirmar-lote/', {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
+        compra.refresh_from_db()
+        self.assertEqual(compra.estado, 'PENDIENTE')
+
+
+# ---------- Camino rápido de lectura ----------
+
+class DatosCatalogoMixin:
+    """Libros con precios, portadas y géneros que ejercitan los casos borde de la salida."""
+
+    def setUp(self):
+        cache.clear()
+        ranking.invalidar()
+        self.generos = Genero.objects.bulk_create([Genero(nombre=n) for n in ('Novela', 'Ñandú & Cía', 'Ciencia')])
+        variantes = portadas.mapa_variantes('portadas/con variantes.jpg', {'thumb': 160, 'card': 400, 'full': 400})
+        datos = [
+            # (precio, portada, variantes, ventas)
+            (Decimal('5.5'), 'portadas/simple.jpg', None, 3),
+            (Decimal('1000'), '', None, 0),
+            (Decimal('12.34'), 'portadas/con variantes.jpg', variantes, 7),
+            (Decimal('0.01'), 'portadas/año ñ (1).png', None, 7),
+            (Decimal('999999.99'), 'portadas/x.jpg', None, 1),
+        ]
+        self.libros = Libro.objects.bulk_create([
+            Libro(titulo=f'Libro «{i}»', autor='Autor "citado"', precio=precio, isbn=f'{i:013d}',
+                  descripcion='Línea 1\nLínea 2 — ü', portada=portada, portada_variantes=vars_,
+                  ventas_totales=ventas)
+            for i, (precio, portada, vars_, ventas) in enumerate(datos)
+        ])
+        # Relaciones insertadas desordenadas para que el orden de los géneros no sea trivial.
+        through = Libro.generos.through
+        through.objects.bulk_create([
+            through(libro_id=self.libros[0].id, genero_id=self.generos[2].id),
+            through(libro_id=self.libros[2].id, genero_id=self.generos[1].id),
+            through(libro_id=self.libros[0].id, genero_id=self.generos[0].id),
+            through(libro_id=self.libros[2].id, genero_id=self.generos[0].id),
+            through(libro_id=self.libros[3].id, genero_id=self.generos[1].id),
+            through(libro_id=self.libros[4].id, genero_id=self.generos[0].id),
+        ])
+
+
+class PaginacionKeysetTests(DatosCatalogoMixin, APITestCase):
+    """Los cursores con valores que no son del tipo del campo dan 404, no un 500."""
+
+    def cursor(self, posicion):
+        return base64.urlsafe_b64encode(json.dumps(posicion).encode('ascii')).decode('ascii')
+
+    def test_recorre_todas_las_paginas(self):
+        ids, url = [], '/api/libros/?orden=top&limit=2'
+        while url:
+            cuerpo = self.client.get(url).json()
+            ids += [libro['id'] for libro in cuerpo['results']]
+            url = cuerpo['next']
+        self.assertEqual(ids, list(Libro.objects.order_by('-ventas_totales', '-id').values_list('id', flat=True)))
+
+    def test_cursor_invalido(self):
+        invalidos = [['abc', 1], [None, 1], [{}, 1], ['x', 1], [1, 2 ** 70], [1], 'no-es-lista']
+        with self.settings(ROOT_URLCONF='core.urls_async'):
+            asincronas = [async_to_sync(self.async_client.get)(f'/libros/?orden=top&cursor={self.cursor(p)}')
+                          for p in invalidos]
+        for posicion in invalidos:
+            response = self.client.get(f'/api/libros/?orden=top&cursor={self.cursor(posicion)}')
+            self.assertEqual(response.status_code, 404, posicion)
+            self.assertEqual(response.json(), {'detail': 'Cursor inválido'})
+        for posicion in (['abc'], [None], [{}], [2 ** 70]):
+            self.assertEqual(self.client.get(f'/api/libros/?cursor={self.cursor(posicion)}').status_code, 404)
+        genero = self.generos[0]
+        self.assertEqual(self.client.get(f'/api/generos/{genero.id}/libros/?cursor={self.cursor(["x"])}').status_code,
+                         404)
+        for posicion, response in zip(invalidos, asincronas):
+            self.assertEqual((response.status_code, response.json()), (404, {'detail': 'Cursor inválido'}), posicion)
+        # Un número en texto es un valor válido para el campo.
+        self.assertEqual(self.client.get(f'/api/libros/?cursor={self.cursor(["1"])}').status_code, 200)
+
+
+class BusquedaTests(APITestCase):
+    """/libros/buscar/ ordena por bm25 con el índice FTS5 y cae a icontains sin él."""
+
+    def setUp(self):
+        cache.clear()
+        self.en_descripcion, self.en_titulo, self.en_autor, self.otro = Libro.objects.bulk_create([
+            Libro(titulo='Crónicas', autor='Ana', precio=Decimal('1'), isbn='1000000000001',
+                  descripcion='Un dragon aparece en el capítulo tres'),
+            Libro(titulo='El último Dragón', autor='Ana', precio=Decimal('1'), isbn='1000000000002'),
+            Libro(titulo='Memorias', autor='Dragonetti', precio=Decimal('1'), isbn='1000000000003'),
+            Libro(titulo='Sin relación', autor='Beto', precio=Decimal('1'), isbn='1000000000004'),
+        ])
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [libro['id'] for libro in response.json()['results']]
+
+    def test_ranking_por_columna(self):
+        # Título (peso 10) antes que autor (5) y descripción (1); sin tildes y por prefijo.
+        self.assertEqual(self.ids('/api/libros/buscar/?q=dragon'),
+                         [self.en_titulo.id, self.en_autor.id, self.en_descripcion.id])
+        self.assertEqual(self.ids('/api/libros/buscar/?q=DRAG'),
+                         [self.en_titulo.id, self.en_autor.id, self.en_descripcion.id])
+        # Los operadores de FTS5 se toman como texto.
+        self.assertEqual(self.ids('/api/libros/buscar/?q=dragon%20OR%20beto'), [])
+        self.assertEqual(self.client.get('/api/libros/buscar/?q=').status_code, 400)
+
+    def test_indice_sigue_los_cambios(self):
+        Libro.objects.filter(id=self.otro.id).update(titulo='Dragón de papel')
+        self.en_titulo.delete()
+        self.assertEqual(self.ids('/api/libros/buscar/?q=dragon')[0], self.otro.id)
+        self.assertNotIn(self.en_titulo.id, self.ids('/api/libros/buscar/?q=dragon'))
+
+    def test_paginado(self):
+        primera = self.client.get('/api/libros/buscar/?q=dragon&limit=2').json()
+        self.assertEqual(len(primera['results']), 2)
+        self.assertEqual(self.ids(primera['next']), [self.en_descripcion.id])
+        self.assertEqual(self.ids('/api/libros/buscar/?q=dragon&offset=10000'), [])
+        for offset in (10001, 2 ** 70):
+            self.assertEqual(self.client.get(f'/api/libros/buscar/?q=dragon&offset={offset}').status_code, 400)
+
+    def test_sin_fts(self):
+        with mock.patch.object(search, 'fts_disponible', return_value=False):
+            # icontains no ignora tildes y ordena por id.
+            self.assertEqual(self.ids('/api/libros/buscar/?q=dragon'), [self.en_descripcion.id, self.en_autor.id])
+            self.assertEqual(self.ids('/api/libros/buscar/?q=ana%20dragón'), [self.en_titulo.id])
+
+
+class IdempotenciaTests(APITestCase):
+    """Un POST con Idempotency-Key se ejecuta una vez; los reintentos reciben la misma respuesta."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('idempotencia', password='x')
+        self.client.force_authenticate(self.usuario)
+        libro = Libro.objects.create(titulo='Libro', autor='Autor', precio=Decimal('8'), isbn='2000000000001')
+        self.carrito = Compra.objects.create(usuario=self.usuario, total=0, estado='CARRITO')
+        ItemCompra.objects.create(compra=self.carrito, libro=libro, precio_unitario=libro.precio, cantidad=1)
+        self.url = f'/api/compras/{self.carrito.id}/checkout/'
+
+    def test_reintento_devuelve_la_misma_respuesta(self):
+        primera = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(primera.json()['estado'], 'PENDIENTE')
+        with self.assertNumQueries(0):
+            reintento = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual((reintento.status_code, reintento.json()), (200, primera.json()))
+        self.assertEqual(reintento['Idempotent-Replayed'], 'true')
+        # Con otra clave la vista se ejecuta y el carrito ya no está activo.
+        self.assertEqual(self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='otra').status_code, 400)
+
+    def test_en_curso_da_409(self):
+        cache.set(f'idempotencia:{self.usuario.pk}:{self.url}:abc', idempotencia.EN_CURSO)
+        response = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, 409)
+        self.carrito.refresh_from_db()
+        self.assertEqual(self.carrito.estado, 'CARRITO')
+
+    def test_clave_por_usuario_y_larga(self):
+        self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='abc')
+        otro = User.objects.create_user('otro', password='x')
+        self.client.force_authenticate(otro)
+        self.assertNotIn('Idempotent-Replayed', self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='abc'))
+        self.assertEqual(self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='x' * 256).status_code, 400)
+
+
+class ImportacionTests(APITestCase):
+    """La importación hace upsert por isbn y reporta las filas malas sin cortarse."""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('admin', password='x', is_staff=True))
+        self.existente = Libro.objects.create(titulo='Viejo', autor='Autor', precio=Decimal('1'), isbn='9780306406157')
+
+    def importar(self, nombre, contenido):
+        archivo = io.BytesIO(contenido)
+        archivo.name = nombre
+        response = self.client.post('/api/libros/importar/', {'archivo': archivo}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_csv_upsert_y_errores(self):
+        contenido = (
+            '\ufeffisbn,titulo,autor,precio,generos\n'
+            '9780306406157,Nuevo título,Autor,12.50,Novela|Drama\n'
+            '9781861972712,Otro,Autora,"3",Novela\n'
+            '9781861972712,Otro repetido,Autora,4,\n'
+            'corto,Malo,Autor,1,\n'
+            '9780131103627,Sin precio,Autor,,\n'
+        ).encode('utf-8')
+        resumen = self.importar('libros.csv', contenido)
+        self.assertEqual((resumen['procesadas'], resumen['importadas'], resumen['errores']), (5, 2, 2))
+        self.assertEqual([e['fila'] for e in resumen['detalle_errores']], [5, 6])
+        self.assertIn('isbn', resumen['detalle_errores'][0]['errores'])
+        self.assertIn('precio', resumen['detalle_errores'][1]['errores'])
+
+        self.existente.refresh_from_db()
+        self.assertEqual((self.existente.titulo, self.existente.precio), ('Nuevo título', Decimal('12.50')))
+        self.assertEqual(sorted(self.existente.generos.values_list('nombre', flat=True)), ['Drama', 'Novela'])
+        otro = Libro.objects.get(isbn='9781861972712')
+        # Dentro del lote gana la última fila; sin géneros no se tocan los que tenía.
+        self.assertEqual((otro.titulo, otro.precio), ('Otro repetido', Decimal('4')))
+        self.assertEqual(Libro.objects.count(), 2)
+
+    def test_jsonl_y_bytes_invalidos(self):
+        contenido = b'\n'.join([
+            json.dumps({'isbn': '9781861972712', 'titulo': 'Uno', 'autor': 'A', 'precio': '2'}).encode('utf-8'),
+            b'{"isbn": "9780131103627", "titulo": "Mal \xff codificado", "autor": "A", "precio": "2"}',
+            b'no es json',
+            b'',
+            json.dumps({'isbn': '9780306406157', 'titulo': 'Tres', 'autor': 'A', 'precio': '5'}).encode('utf-8'),
+        ])
+        resumen = self.importar('libros.jsonl', contenido)
+        self.assertEqual((resumen['procesadas'], resumen['importadas'], resumen['errores']), (4, 2, 2))
+        self.assertEqual([e['fila'] for e in resumen['detalle_errores']], [2, 3])
+        self.assertFalse(Libro.objects.filter(isbn='9780131103627').exists())
+
+    def test_csv_con_bytes_invalidos(self):
+        contenido = (b'isbn,titulo,autor,precio\n'
+                     b'9781861972712,Bien,A,2\n'
+                     b'9780131103627,Mal \xe9,A,2\n'
+                     b'9780306406157,Tambi\xc3\xa9n bien,A,3\n')
+        resumen = self.importar('libros.csv', contenido)
+        self.assertEqual((resumen['importadas'], resumen['errores']), (2, 1))
+        self.assertEqual(resumen['detalle_errores'][0]['fila'], 3)
+        self.assertEqual(Libro.objects.get(isbn='9780306406157').titulo, 'También bien')
+
+
+class ExportacionTests(APITestCase):
+    """Los export en streaming filtran por ?since y salen en NDJSON o CSV."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', password='x', is_staff=True))
+        self.usuario = User.objects.create_user('comprador', password='x')
+        self.libros = Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {i}', autor='Autor, con coma', precio=Decimal('5'), isbn=f'300000000000{i}')
+            for i in range(3)
+        ])
+        self.libros[0].generos.add(Genero.objects.create(nombre='Novela'), Genero.objects.create(nombre='Drama'))
+
+    def leer(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def ndjson(self, url, **params):
+        return [json.loads(linea) for linea in self.leer(url, **params)[1].splitlines()]
+
+    def test_libros_ndjson_y_csv(self):
+        filas = self.ndjson('/api/export/libros')
+        self.assertEqual([f['id'] for f in filas], [l.id for l in self.libros])
+        self.assertEqual(sorted(filas[0]['generos']), ['Drama', 'Novela'])
+
+        response, texto = self.leer('/api/export/libros?formato=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        filas = list(csv.DictReader(io.StringIO(texto)))
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[0]['autor'], 'Autor, con coma')
+        self.assertEqual(sorted(filas[0]['generos'].split('|')), ['Drama', 'Novela'])
+        self.assertEqual(self.client.get('/api/export/libros?formato=xml').status_code, 400)
+
+    def test_since(self):
+        corte = timezone.now()
+        Libro.objects.filter(id=self.libros[1].id).update(fecha_actualizacion=corte + timedelta(seconds=1))
+        self.assertEqual([f['id'] for f in self.ndjson('/api/export/libros', since=corte.isoformat())],
+                         [self.libros[1].id])
+        self.assertEqual(len(self.ndjson('/api/export/libros', since=str((corte - timedelta(days=1)).date()))), 3)
+        self.assertEqual(self.client.get('/api/export/libros?since=ayer').status_code, 400)
+
+    def test_compras_since_ve_cambios_de_items(self):
+        compra = Compra.objects.create(usuario=self.usuario, total=0, estado='CARRITO')
+        item = ItemCompra.objects.create(compra=compra, libro=self.libros[0], precio_unitario=Decimal('5'), cantidad=1)
+        ItemCompra.objects.create(compra=compra, libro=self.libros[1], precio_unitario=Decimal('5'), cantidad=2)
+        compra.recalcular_total()
+        corte = timezone.now()
+        self.assertEqual(self.ndjson('/api/export/compras', since=corte.isoformat()), [])
+
+        response = self.client.delete(f'/api/compras/{compra.id}/eliminar-item/{item.id}/')
+        self.assertEqual(response.status_code, 204)
+        filas = self.ndjson('/api/export/compras', since=corte.isoformat())
+        self.assertEqual([(f['id'], f['total'], len(f['items'])) for f in filas], [(compra.id, '10.00', 1)])
+
+        texto = self.leer('/api/export/compras?formato=csv')[1]
+        filas = list(csv.DictReader(io.StringIO(texto)))
+        self.assertEqual([(f['compra_id'], f['libro_id'], f['cantidad']) for f in filas],
+                         [(str(compra.id), str(self.libros[1].id), '2')])
+
+
+class EstadisticasTests(APITestCase):
+    """Los acumulados diarios siguen a las confirmaciones y /api/estadisticas/ los lee."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', password='x', is_staff=True))
+        usuario = User.objects.create_user('comprador', password='x')
+        self.novela = Genero.objects.create(nombre='Novela')
+        self.libro, self.otro = Libro.objects.bulk_create([
+            Libro(titulo='Uno', autor='A', precio=Decimal('10'), isbn='4000000000001'),
+            Libro(titulo='Dos', autor='A', precio=Decimal('3'), isbn='4000000000002'),
+        ])
+        self.libro.generos.add(self.novela)
+        self.compras = []
+        for dia, cantidad in ((1, 2), (1, 1), (2, 4)):
+            compra = Compra.objects.create(usuario=usuario, total=0, estado='PENDIENTE')
+            Compra.objects.filter(id=compra.id).update(
+                fecha=timezone.make_aware(timezone.datetime(2026, 3, dia, 12)))
+            ItemCompra.objects.bulk_create([
+                ItemCompra(compra=compra, libro=self.libro, precio_unitario=Decimal('10'), cantidad=cantidad),
+                ItemCompra(compra=compra, libro=self.otro, precio_unitario=Decimal('3'), cantidad=1),
+            ])
+            self.compras.append(compra.id)
+
+    def acumulados(self):
+        return (sorted(VentaDiariaLibro.objects.values_list('fecha', 'libro_id', 'unidades', 'ingresos')),
+                sorted(VentaDiariaGenero.objects.values_list('fecha', 'genero_id', 'unidades', 'ingresos')))
+
+    def get(self, **params):
+        response = self.client.get('/api/estadisticas/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_confirmar_y_revertir(self):
+        ventas.cambiar_estado(self.compras, 'PENDIENTE', 'CONFIRMADA')
+        incremental = self.acumulados()
+        estadisticas.reconstruir()
+        self.assertEqual(incremental, self.acumulados())
+        dia1 = timezone.datetime(2026, 3, 1).date()
+        self.assertIn((dia1, self.libro.id, 3, Decimal('30')), incremental[0])
+        self.assertIn((dia1, self.novela.id, 3, Decimal('30')), incremental[1])
+
+        ventas.cambiar_estado(self.compras[:1], 'CONFIRMADA', 'RECHAZADA')
+        self.assertIn((dia1, self.libro.id, 1, Decimal('10')), self.acumulados()[0])
+        incremental = self.acumulados()
+        estadisticas.reconstruir()
+        # reconstruir no deja filas en cero; el incremental sí.
+        self.assertEqual([f for f in incremental[0] if f[2]], self.acumulados()[0])
+
+    def test_confirmaciones_sueltas_del_mismo_dia(self):
+        ItemCompra.objects.filter(libro=self.libro).update(precio_unitario=Decimal('10.10'))
+        # Cada confirmación encuentra (o no) la fila del día y suma sobre ella.
+        for compra_id in self.compras:
+            ventas.cambiar_estado([compra_id], 'PENDIENTE', 'CONFIRMADA')
+        incremental = self.acumulados()
+        estadisticas.reconstruir()
+        self.assertEqual(incremental, self.acumulados())
+        dia1 = timezone.datetime(2026, 3, 1).date()
+        self.assertIn((dia1, self.libro.id, 3, Decimal('30.30')), incremental[0])
+
+    def test_endpoint(self):
+        ventas.cambiar_estado(self.compras, 'PENDIENTE', 'CONFIRMADA')
+        data = self.get()
+        self.assertEqual((data['unidades'], data['ingresos']), (10, '79.00'))
+        self.assertEqual([(f['fecha'], f['unidades']) for f in data['resultados']],
+                         [('2026-03-01', 5), ('2026-03-02', 5)])
+        data = self.get(desde='2026-03-02', hasta='2026-03-02', por='libro')
+        self.assertEqual([(f['titulo'], f['unidades'], f['ingresos']) for f in data['resultados']],
+                         [('Uno', 4, '40.00'), ('Dos', 1, '3.00')])
+        self.assertEqual(self.get(por='genero')['resultados'],
+                         [{'genero_id': self.novela.id, 'nombre': 'Novela', 'unidades': 7, 'ingresos': '70.00'}])
+        self.assertEqual(len(self.get(libro=self.otro.id)['resultados']), 2)
+        # limit se acota a [1, max_limit].
+        self.assertEqual(len(self.get(por='libro', limit=-1)['resultados']), 1)
+        self.assertEqual(len(self.get(por='libro', limit=0)['resultados']), 1)
+
+    def test_parametros_invalidos(self):
+        for params in ({'limit': 'abc'}, {'desde': '2026-13-01'}, {'por': 'mes'}, {'libro': 'x'},
+                       {'libro': str(2 ** 70)}, {'genero': '-1'}, {'libro': '1', 'genero': '1'},
+                       {'libro': '1', 'por': 'genero'}):
+            self.assertEqual(self.client.get('/api/estadisticas/', params).status_code, 400, params)
+
+
+class MetricasTests(APITestCase):
+    """El middleware cuenta requests, consultas y bytes por vista y /api/metrics los expone."""
+
+    def setUp(self):
+        cache.clear()
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        Libro.objects.create(titulo='Uno', autor='A', precio=Decimal('1'), isbn='5000000000001')
+
+    def exportado(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return {linea.rsplit(' ', 1)[0]: float(linea.rsplit(' ', 1)[1])
+                for linea in response.content.decode('utf-8').splitlines() if not linea.startswith('#')}
+
+    def test_contadores_por_vista(self):
+        cuerpos = [self.client.get('/api/libros/').content for _ in range(2)]
+        self.client.get('/api/libros/999999/')
+        self.client.get('/no-existe/')
+        for metodo in ('FOO', 'BAR'):
+            self.client.generic(metodo, '/no-existe/')
+            self.client.generic(metodo, '/api/libros/')
+        valores = self.exportado()
+
+        etiquetas = '{view="LibroViewSet",action="list"'
+        self.assertEqual(valores[f'http_responses_total{etiquetas},status="200"}}'], 2)
+        self.assertEqual(valores[f'http_request_duration_seconds_count{etiquetas}}}'], 2)
+        self.assertEqual(valores[f'http_request_duration_seconds_bucket{etiquetas},le="+Inf"}}'], 2)
+        self.assertEqual(valores[f'http_response_bytes_total{etiquetas}}}'], sum(len(c) for c in cuerpos))
+        self.assertGreater(valores[f'http_request_sql_queries_sum{etiquetas}}}'], 0)
+        self.assertEqual(valores['http_responses_total{view="LibroViewSet",action="retrieve",status="404"}'], 1)
+        self.assertEqual(valores['http_responses_total{view="sin_vista",action="get",status="404"}'], 1)
+        # Los métodos desconocidos comparten una serie.
+        self.assertEqual(valores['http_responses_total{view="sin_vista",action="otro",status="404"}'], 2)
+        self.assertEqual(valores['http_request_duration_seconds_count{view="LibroViewSet",action="otro"}'], 2)
+        self.assertFalse([clave for clave in valores if 'foo' in clave.lower()])
+
+    def test_bytes_en_streaming(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/export/libros')
+        contenido = b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(self.exportado()['http_response_bytes_total{view="ExportLibrosView",action="get"}'],
+                         len(contenido))
+
+    def test_solo_admin(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+
+
+class LecturaRapidaTests(DatosCatalogoMixin, APITestCase):
+    """Los listados con core.lectura deben dar el mismo JSON, byte a byte, que LibroSerializer."""
+
+    def esperado(self, response, libros):
+        data = LibroSerializer(libros, many=True, context={'request': response.wsgi_request}).data
+        return JSONRenderer().render(data)
+
+    def assertMismoJSON(self, url, libros, paginado=False):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        esperado = self.esperado(response, libros)
+        if paginado:
+            cuerpo = response.json()
+            envoltorio = {'next': cuerpo['next'], 'next_cursor': cuerpo['next_cursor'], 'results': '@'}
+            esperado = JSONRenderer().render(envoltorio).replace(b'"@"', esperado)
+        self.assertEqual(response.content, esperado)
+
+    def test_libros_list(self):
+        self.assertMismoJSON('/api/libros/', Libro.objects.prefetch_related('generos'))
+
+    def test_libros_list_paginado(self):
+        libros = Libro.objects.prefetch_related('generos').order_by('-ventas_totales', '-id')
+        self.assertMismoJSON('/api/libros/?orden=top&limit=3', libros[:3], paginado=True)
+        cursor = self.client.get('/api/libros/?orden=top&limit=3').json()['next_cursor']
+        self.assertMismoJSON(f'/api/libros/?orden=top&limit=3&cursor={cursor}', libros[3:], paginado=True)
+
+    def test_generos_libros(self):
+        genero = self.generos[0]
+        self.assertMismoJSON(f'/api/generos/{genero.id}/libros/',
+                             genero.libros.all().prefetch_related('generos'))
+        self.assertMismoJSON(f'/api/generos/{genero.id}/libros/?limit=2',
+                             genero.libros.all().prefetch_related('generos').order_by('id')[:2], paginado=True)
+
+    def test_libros_top(self):
+        ids = ranking.top_ids()
+        libros = Libro.objects.prefetch_related('generos').in_bulk(ids)
+        self.assertMismoJSON('/api/libros/top/', [libros[i] for i in ids])
+
+    def test_generos_top(self):
+        genero = self.generos[0]
+        ids = ranking.top_ids(genero.id)
+        libros = Libro.objects.prefetch_related('generos').in_bulk(ids)
+        self.assertMismoJSON(f'/api/generos/{genero.id}/top/', [libros[i] for i in ids])
+
+
+class CatalogoCondicionalTests(DatosCatalogoMixin, APITestCase):
+    """GET condicional de las vistas DRF: 304 con el ETag vigente y ETag nuevo tras cambiar el catálogo."""
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNoModificado(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, url)
+        self.assertEqual(response.content, b'')
+
+    def test_list_y_retrieve(self):
+        for url in ('/api/libros/', f'/api/libros/{self.libros[0].id}/'):
+            self.assertNoModificado(url, self.etag(url))
+        self.assertEqual(self.client.get('/api/libros/', HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+    def test_guardar_libro_cambia_el_etag(self):
+        url = f'/api/libros/{self.libros[0].id}/'
+        etag = self.etag(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libros[0].titulo = 'Otro título'
+            self.libros[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_cambiar_generos_cambia_el_etag(self):
+        etag = self.etag('/api/libros/')
+        version = catalogo.version_actual()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libros[1].generos.add(self.generos[2])
+        self.assertGreater(catalogo.version_actual(), version)
+        response = self.client.get('/api/libros/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        libro = next(libro for libro in response.json() if libro['id'] == self.libros[1].id)
+        self.assertEqual([g['id'] for g in libro['generos']], [self.generos[2].id])
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libros[1].generos.clear()
+        self.assertEqual(self.client.get('/api/libros/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class RankingTests(DatosCatalogoMixin, APITestCase):
+    """Las confirmaciones se fusionan en los top en memoria sin recalcularlos desde la base."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.novela = self.generos[0]
+        # El libro 4 (1 venta, en Novela) pasa a ser el más vendido con 10 unidades más.
+        self.compra = Compra.objects.create(usuario=self.admin, total=0, estado='PENDIENTE')
+        ItemCompra.objects.create(compra=self.compra, libro=self.libros[4], precio_unitario=Decimal('1'),
+                                  cantidad=10)
+
+    def top(self):
+        return ([libro['id'] for libro in self.client.get('/api/libros/top/').json()],
+                [libro['id'] for libro in self.client.get(f'/api/generos/{self.novela.id}/top/').json()])
+
+    def confirmar(self):
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/compras/{self.compra.id}/', {'estado': 'CONFIRMADA'},
+                                         format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_confirmar_actualiza_sin_recalcular(self):
+        global_, novela = self.top()
+        self.assertNotEqual(global_[0], self.libros[4].id)
+        self.confirmar()
+        with mock.patch.object(ranking, '_calcular', wraps=ranking._calcular) as calcular:
+            global_, novela = self.top()
+        calcular.assert_not_called()
+        self.assertEqual((global_[0], novela[0]), (self.libros[4].id, self.libros[4].id))
+        # Lo mismo que daría recalcular desde el índice.
+        self.assertEqual(global_, [libro_id for _, libro_id in ranking._calcular(None, ranking.TOP_N)])
+        self.assertEqual(novela, [libro_id for _, libro_id in ranking._calcular(self.novela.id, ranking.TOP_N)])
+
+    def test_otro_proceso_cambio_la_version(self):
+        self.top()
+        # Otro proceso invalidó el ranking: lo que hay en memoria ya no se puede fusionar.
+        ranking.invalidar()
+        self.confirmar()
+        with mock.patch.object(ranking, '_calcular', wraps=ranking._calcular) as calcular:
+            global_, novela = self.top()
+        self.assertEqual(calcular.call_count, 2)
+        self.assertEqual((global_[0], novela[0]), (self.libros[4].id, self.libros[4].id))
+
+
+class VistasAsyncTests(DatosCatalogoMixin, APITestCase):
+    """Las vistas async de core/urls_async.py responden lo mismo que los viewsets."""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('async', 'async@example.com', 'x')
+        carrito = Compra.objects.create(usuario=self.usuario, total=0, estado='CARRITO')
+        ItemCompra.objects.create(compra=carrito, libro=self.libros[2],
+                                  precio_unitario=self.libros[2].precio, cantidad=2)
+
+    def sync(self, url, **extra):
+        with self.settings(ROOT_URLCONF='core.urls'):
+            return self.client.get(url, **extra)
+
+    def asincrona(self, url, **extra):
+        with self.settings(ROOT_URLCONF='core.urls_async'):
+            return async_to_sync(self.async_client.get)(url, **extra)
+
+    def assertMismaRespuesta(self, url):
+        esperado, obtenido = self.sync(url), self.asincrona(url)
+        self.assertEqual(obtenido.status_code, esperado.status_code, url)
+        self.assertEqual(obtenido.content, esperado.content, url)
+        self.assertEqual(obtenido.get('ETag'), esperado.get('ETag'), url)
+
+    def test_catalogo(self):
+        cursor = self.sync('/libros/?orden=top&limit=2').json()['next_cursor']
+        for url in ('/generos/', '/libros/', '/libros/?limit=2', f'/libros/?orden=top&limit=2&cursor={cursor}',
+                    f'/libros/{self.libros[2].id}/', '/libros/999999/', '/libros/top/'):
+            self.assertMismaRespuesta(url)
+
+    def test_catalogo_no_modificado(self):
+        etag = self.asincrona('/libros/')['ETag']
+        self.assertEqual(self.asincrona('/libros/', headers={'If-None-Match': etag}).status_code, 304)
+
+    def test_usuario(self):
+        urls = ('/auth/user/', '/compras/mi-carrito/', '/compras/mi-carrito/?expand=libro',
+                '/compras/mi-carrito/?fields=id,total')
+        for url in urls[:2]:
+            self.assertMismaRespuesta(url)
+        self.client.force_login(self.usuario)
+        self.async_client.force_login(self.usuario)
+        for url in urls:
+            self.assertMismaRespuesta(url)
+
+    def test_otros_metodos_van_a_la_vista_sync(self):
+        self.async_client.force_login(self.usuario)
+        with self.settings(ROOT_URLCONF='core.urls_async'):
+            response = async_to_sync(self.async_client.post)(
+                '/generos/', {'nombre': 'Nuevo'}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Genero.objects.filter(nombre='Nuevo').exists())
+
+
+class SnapshotCatalogoTests(DatosCatalogoMixin, APITestCase):
+    """El snapshot en disco tiene el catálogo completo y se sirve según Accept-Encoding."""
+
+    def setUp(self):
+        super().setUp()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+        ajustes = self.settings(CATALOGO_SNAPSHOT_DIR=self.directorio, CATALOGO_SNAPSHOT_EN_SEGUNDO_PLANO=False)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def leer(self, response):
+        cuerpo = b''.join(response.streaming_content)
+        return json.loads(gzip.decompress(cuerpo) if response.get('Content-Encoding') == 'gzip' else cuerpo)
+
+    def test_contenido(self):
+        data = self.leer(self.client.get('/api/catalogo/snapshot'))
+        self.assertEqual(data['version'], catalogo.version_actual())
+        self.assertEqual(data['top'], ranking.top_ids())
+        self.assertEqual(data['generos'], self.client.get('/api/generos/').json())
+        libros = self.client.get('/api/libros/').json()
+        self.assertEqual([l['id'] for l in data['libros']], [l['id'] for l in libros])
+        self.assertEqual([l['generos'] for l in data['libros']], [l['generos'] for l in libros])
+
+    def test_negociacion_y_cabeceras(self):
+        plano = self.client.get('/api/catalogo/snapshot', HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertIsNone(plano.get('Content-Encoding'))
+        self.assertIn('no-cache', plano['Cache-Control'])
+        comprimido = self.client.get('/api/catalogo/snapshot', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(comprimido['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', comprimido['Vary'])
+        self.assertNotEqual(plano['ETag'], comprimido['ETag'])
+        self.assertEqual(self.leer(plano), self.leer(comprimido))
+
+        self.assertEqual(self.client.get('/api/catalogo/snapshot', HTTP_IF_NONE_MATCH=plano['ETag']).status_code, 304)
+        version = self.client.get(plano['Content-Location'])
+        self.assertEqual(version.status_code, 200)
+        self.assertIn('immutable', version['Cache-Control'])
+        self.assertEqual(self.client.get('/api/catalogo/snapshot/1').status_code, 404)
+
+    def test_nueva_version(self):
+        anterior = snapshot.construir()
+        self.assertEqual(snapshot.construir(), anterior)
+        Libro.objects.filter(pk=self.libros[0].pk).update(titulo='Cambiado')
+        catalogo.invalidar()
+        nuevo = snapshot.construir()
+        self.assertGreater(nuevo['version'], anterior['version'])
+        data = self.leer(self.client.get('/api/catalogo/snapshot'))
+        self.assertEqual(data['libros'][0]['titulo'], 'Cambiado')
+        # La versión anterior se sigue pudiendo bajar por su URL.
+        self.assertEqual(self.client.get(f'/api/catalogo/snapshot/{anterior["version"]}').status_code, 200)
+
+
+class BatchTests(DatosCatalogoMixin, APITestCase):
+    """/api/batch/ responde lo mismo que cada request por separado, en el orden pedido."""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('batch', 'batch@example.com', 'x')
+        self.carrito = Compra.objects.create(usuario=self.usuario, total=0, estado='CARRITO')
+        self.client.force_login(self.usuario)
+
+    def batch(self, requests, client=None, **extra):
+        return (client or self.client).post('/api/batch/', {'requests': requests}, format='json', **extra)
+
+    def test_mismas_respuestas(self):
+        paths = ['/api/auth/user/', '/api/generos/', '/api/libros/top/', '/api/libros/?limit=2',
+                 '/api/compras/mi-carrito/', '/api/libros/999999/']
+        response = self.batch([{'id': path, 'path': path} for path in paths])
+        self.assertEqual(response.status_code, 200)
+        respuestas = response.json()['responses']
+        self.assertEqual([r['id'] for r in respuestas], paths)
+        for sub in respuestas:
+            individual = self.client.get(sub['id'])
+            self.assertEqual(sub['status'], individual.status_code, sub['id'])
+            self.assertEqual(sub['body'], individual.json(), sub['id'])
+            self.assertEqual(sub['headers'].get('ETag'), individual.get('ETag'), sub['id'])
+        self.assertEqual(self.batch([{'path': '/api/no-existe/'}]).json()['responses'][0]['status'], 404)
+
+    def test_escritura_y_lectura_en_orden(self):
+        client = APIClient(enforce_csrf_checks=True)
+        client.force_login(self.usuario)
+        respuestas = self.batch([{'path': '/api/auth/csrf/'}], client=client).json()['responses']
+        token = respuestas[0]['body']['csrf_token']
+        self.assertIn('csrftoken', client.cookies)
+
+        agregar = {'method': 'POST', 'path': f'/api/compras/{self.carrito.id}/agregar-items/',
+                   'body': {'items': [{'libro_id': self.libros[0].id, 'cantidad': 2}]}}
+        sin_token = self.batch([agregar], client=client).json()['responses']
+        self.assertEqual(sin_token[0]['status'], 403)
+        self.assertFalse(self.carrito.items.exists())
+
+        respuestas = self.batch([agregar, {'path': '/api/compras/mi-carrito/?fields=total'}],
+                                client=client, HTTP_X_CSRFTOKEN=token).json()['responses']
+        self.assertEqual(respuestas[0]['status'], 200)
+        self.assertEqual(Decimal(respuestas[1]['body']['total']), 2 * self.libros[0].precio)
+
+    def test_requests_invalidas(self):
+        for requests in ('x', [], [{'path': 'libros/'}], [{'path': '/api/libros/', 'method': 'HEAD'}],
+                         [{'path': '/api/generos/'}] * 21):
+            self.assertEqual(self.batch(requests).status_code, 400, requests)
+        anidado = self.batch([{'path': '/api/batch/', 'method': 'POST'}]).json()['responses'][0]
+        self.assertEqual(anidado['status'], 400)
+
+    def test_una_sub_request_que_falla(self):
+        paths = ['/api/generos/', '/api/libros/facetas/', '/api/libros/top/']
+        with mock.patch.object(facetas, 'facetas', side_effect=RuntimeError('falla')), \
+                self.assertLogs('core.batch', 'ERROR'):
+            response = self.batch([{'path': p} for p in paths])
+        self.assertEqual(response.status_code, 200)
+        respuestas = response.json()['responses']
+        self.assertEqual([r['status'] for r in respuestas], [200, 500, 200])
+        self.assertEqual(respuestas[1]['body'], {'detail': 'Error interno del servidor'})
+
+
+class BatchConcurrenteTests(DatosCatalogoMixin, APITransactionTestCase):
+    """Fuera de una transacción los GET consecutivos corren en el pool de hilos."""
+
+    def test_mismas_respuestas(self):
+        paths = ['/api/generos/', '/api/libros/top/', '/api/libros/', f'/api/libros/{self.libros[1].id}/']
+        with self.settings(BATCH_CONCURRENCIA=4):
+            respuestas = self.client.post('/api/batch/', {'requests': [{'path': p} for p in paths]},
+                                          format='json').json()['responses']
+        self.assertEqual([r['body'] for r in respuestas], [self.client.get(p).json() for p in paths])
+
+    def test_una_sub_request_que_falla(self):
+        paths = ['/api/generos/', '/api/libros/facetas/', '/api/libros/top/']
+        with self.settings(BATCH_CONCURRENCIA=4), self.assertLogs('core.batch', 'ERROR'), \
+                mock.patch.object(facetas, 'facetas', side_effect=RuntimeError('falla')):
+            respuestas = self.client.post('/api/batch/', {'requests': [{'path': p} for p in paths]},
+                                          format='json').json()['responses']
+        self.assertEqual([r['status'] for r in respuestas], [200, 500, 200])
+
+
+class SesionesTests(APITestCase):
+    """core.sesiones: las requests autenticadas no leen django_session y las renovaciones se escriben en lote."""
+
+    def setUp(self):
+        ajustes = self.settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'sesiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sesiones'}},
+            SESIONES_ESCRITURA_EN_SEGUNDO_PLANO=False,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        sesiones.get_lru().clear()
+        self.addCleanup(sesiones.escribir_pendientes)
+        self.usuario = User.objects.create_user('sesion', 'sesion@example.com', 'x')
+        self.client.force_login(self.usuario)
+        self.clave = self.client.cookies['sessionid'].value
+
+    def consultas_de_sesion(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get('/api/auth/user/').status_code, 200)
+        return [q['sql'] for q in consultas.captured_queries if 'django_session' in q['sql']]
+
+    def test_lectura_sin_base(self):
+        self.assertEqual(self.consultas_de_sesion(), [])
+        # Sin el LRU se lee de la cache compartida, tampoco de la base.
+        sesiones.get_lru().clear()
+        self.assertEqual(self.consultas_de_sesion(), [])
+        sesiones.get_lru().clear()
+        sesiones.get_cache().clear()
+        self.assertEqual(len(self.consultas_de_sesion()), 1)
+
+    def test_renovacion_diferida(self):
+        antes = Session.objects.get(pk=self.clave).expire_date
+        with self.settings(SESIONES_RENOVAR_CADA=0):
+            self.assertEqual(self.consultas_de_sesion(), [])
+        self.assertEqual(Session.objects.get(pk=self.clave).expire_date, antes)
+        self.assertEqual(sesiones.escribir_pendientes(), 1)
+        self.assertGreater(Session.objects.get(pk=self.clave).expire_date, antes)
+        # Dentro de SESIONES_RENOVAR_CADA no hay nada que escribir.
+        self.consultas_de_sesion()
+        self.assertEqual(sesiones.escribir_pendientes(), 0)
+
+    def test_logout(self):
+        self.client.post('/api/auth/logout/')
+        self.client.cookies['sessionid'] = self.clave
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 403)
+        self.assertFalse(Session.objects.filter(pk=self.clave).exists())
+
+    def test_purgar(self):
+        vencida = timezone.now() - timedelta(hours=2)
+        Session.objects.bulk_create([Session(session_key=f'vencida{i:025d}', session_data='', expire_date=vencida)
+                                     for i in range(5)])
+        call_command('purgar_sesiones', lote=2, pausa=0, margen=3600 * 3, stdout=io.StringIO())
+        self.assertEqual(Session.objects.count(), 6)
+        call_command('purgar_sesiones', lote=2, pausa=0, margen=60, stdout=io.StringIO())
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), [self.clave])
+
+    def test_lru_acotado(self):
+        lru = sesiones.LRU(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c'), len(lru)), (1, None, 3, 2))
+
+
+class FacetasTests(DatosCatalogoMixin, APITestCase):
+    """/api/libros/facetas/ cuenta lo mismo que filtrar los libros a mano."""
+
+    def facetas(self, **params):
+        response = self.client.get('/api/libros/facetas/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_sin_filtro(self):
+        data = self.facetas()
+        self.assertEqual(data['total'], len(self.libros))
+        self.assertEqual({g['nombre']: g['cantidad'] for g in data['generos']},
+                         {'Novela': 3, 'Ñandú & Cía': 2, 'Ciencia': 1})
+        self.assertEqual([t['cantidad'] for t in data['precios']], [2, 1, 0, 0, 0, 2])
+        self.assertEqual(data['precios'][-1], {'desde': '250.00', 'hasta': None, 'cantidad': 2})
+        self.assertEqual(data['autores'], [{'autor': 'Autor "citado"', 'cantidad': 5}])
+
+    def test_filtros_disyuntivos(self):
+        novela = self.generos[0].id
+        data = self.facetas(generos=f'{novela}', precio_max='100')
+        # Novela con precio <= 100: libros 0 (5.5) y 2 (12.34).
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['autores'][0]['cantidad'], 2)
+        # Los géneros se cuentan sin el filtro de género; los precios, sin el de precio.
+        self.assertEqual({g['nombre']: g['cantidad'] for g in data['generos']},
+                         {'Novela': 2, 'Ñandú & Cía': 2, 'Ciencia': 1})
+        self.assertEqual(sum(t['cantidad'] for t in data['precios']), 3)
+
+        data = self.facetas(q='Libro 3', generos=f'{novela},{self.generos[1].id}')
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(self.facetas(q='¡!')['total'], len(self.libros))
+
+    def test_cache_por_version(self):
+        self.facetas(precio_min='10')
+        with self.assertNumQueries(0):
+            self.facetas(precio_min='10')
+        Libro.objects.filter(pk=self.libros[1].pk).update(precio=Decimal('1'))
+        catalogo.invalidar()
+        self.assertEqual(self.facetas(precio_min='10')['total'], 2)
+
+    def test_filtro_invalido(self):
+        for params in ({'precio_min': 'x'}, {'precio_max': '-1'}, {'generos': 'a'},
+                       {'generos': '99999999999999999999999'}, {'generos': '1,0'}, {'generos': '-3'}):
+            self.assertEqual(self.client.get('/api/libros/facetas/', params).status_code, 400, params)
+        self.assertEqual(self.client.get('/api/libros/facetas/', {'precio_min': '1e30'}).status_code, 200)
+
+
+class RelacionadosTests(DatosCatalogoMixin, APITestCase):
+    """La tabla de comprados juntos mantenida al confirmar es la misma que la reconstruida desde cero."""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('relacionados', password='x')
+        # Más libros que K, para que las listas se recorten.
+        self.libros += Libro.objects.bulk_create([
+            Libro(titulo=f'Extra {i}', autor='Otro', precio=Decimal('3'), isbn=f'9{i:012d}')
+            for i in range(relacionados.K + 4)
+        ])
+        azar = random.Random(7)
+        self.compras = []
+        for _ in range(40):
+            compra = Compra.objects.create(usuario=self.usuario, total=0, estado='PENDIENTE')
+            ItemCompra.objects.bulk_create([
+                ItemCompra(compra=compra, libro=libro, precio_unitario=libro.precio, cantidad=1)
+                for libro in azar.sample(self.libros, azar.randint(1, 6))
+            ])
+            self.compras.append(compra.id)
+
+    def tabla(self):
+        return sorted(LibroRelacionado.objects.values_list('libro_id', 'relacionado_id', 'veces'))
+
+    def assertIgualReconstruida(self):
+        incremental = self.tabla()
+        relacionados.reconstruir(lote=7)
+        self.assertEqual(incremental, self.tabla())
+        return incremental
+
+    def test_incremental(self):
+        for compra_id in self.compras[:25]:
+            ventas.cambiar_estado([compra_id], 'PENDIENTE', 'CONFIRMADA')
+        ventas.cambiar_estado(self.compras[25:], 'PENDIENTE', 'CONFIRMADA')
+        tabla = self.assertIgualReconstruida()
+        self.assertTrue(any(veces > 1 for _, _, veces in tabla))
+        self.assertLessEqual(max(LibroRelacionado.objects.values('libro_id').annotate(n=Count('id'))
+                                 .values_list('n', flat=True)), relacionados.K)
+
+        ventas.cambiar_estado(self.compras[::3], 'CONFIRMADA', 'RECHAZADA')
+        self.assertIgualReconstruida()
+
+    def test_otra_confirmacion_inserta_entremedio(self):
+        bulk_create = LibroRelacionado.objects.bulk_create
+
+        def con_carrera(filas, **kwargs):
+            # Otra confirmación de los mismos libros guardó su lista después del borrado.
+            for fila in filas[:3]:
+                LibroRelacionado.objects.create(libro_id=fila.libro_id, relacionado_id=fila.relacionado_id, veces=1)
+            return bulk_create(filas, **kwargs)
+
+        with mock.patch.object(LibroRelacionado.objects, 'bulk_create', con_carrera):
+            ventas.cambiar_estado(self.compras, 'PENDIENTE', 'CONFIRMADA')
+        self.assertIgualReconstruida()
+
+    def test_endpoint(self):
+        ventas.cambiar_estado(self.compras, 'PENDIENTE', 'CONFIRMADA')
+        libro_id = LibroRelacionado.objects.values_list('libro_id', flat=True).first()
+        with self.assertNumQueries(3):
+            data = self.client.get(f'/api/libros/{libro_id}/relacionados/').json()
+        self.assertEqual([l['id'] for l in data], relacionados.vecinos(libro_id))
+        self.assertEqual(data[0], self.client.get(f'/api/libros/{data[0]["id"]}/').json())
+        for pk in ('999999', '-5', '99999999999999999999999', 'abc'):
+            self.assertEqual(self.client.get(f'/api/libros/{pk}/relacionados/').status_code, 404, pk)
+        # Un libro sin compras confirmadas existe pero no tiene vecinos.
+        sin_ventas = Libro.objects.create(titulo='Nuevo', autor='A', precio=Decimal('1'), isbn='6000000000001')
+        self.assertEqual(self.client.get(f'/api/libros/{sin_ventas.id}/relacionados/').json(), [])
+
+
+class PortadasTests(APITestCase):
+    """Las variantes se generan con Pillow y se guardan con nombres que elige el storage."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+        ajustes = self.settings(MEDIA_ROOT=self.directorio, PORTADAS_EN_SEGUNDO_PLANO=False)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.libro = Libro.objects.create(titulo='Libro', autor='Autor', precio=Decimal('5'), isbn='7000000000001',
+                                          descripcion='d', portada=default_storage.save('portadas/tapa.jpg', self.imagen()))
+
+    def imagen(self, ancho=800, alto=1200, color='red'):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (ancho, alto), color).save(buffer, 'JPEG')
+        return ContentFile(buffer.getvalue(), name='tapa.jpg')
+
+    def anchos(self, variantes):
+        from PIL import Image
+
+        anchos = {}
+        for variante, datos in variantes.items():
+            for formato in portadas.FORMATOS:
+                with default_storage.open(datos[formato]) as archivo, Image.open(archivo) as imagen:
+                    self.assertEqual(imagen.format, portadas.FORMATOS[formato][0])
+                    self.assertEqual(imagen.width, datos['ancho'])
+            anchos[variante] = datos['ancho']
+        return anchos
+
+    def test_procesar(self):
+        # Otro archivo con el nombre que tendría la variante no se pisa.
+        ajeno = default_storage.save('portadas/tapa_thumb.jpg', ContentFile(b'otro archivo'))
+        self.assertEqual(portadas.procesar(self.libro.id, self.libro.portada.name), 1)
+        self.libro.refresh_from_db()
+        variantes = self.libro.portada_variantes
+        self.assertEqual(self.anchos(variantes), {'thumb': 160, 'card': 400, 'full': 800})
+        self.assertNotEqual(variantes['thumb']['jpeg'], ajeno)
+        with default_storage.open(ajeno) as archivo:
+            self.assertEqual(archivo.read(), b'otro archivo')
+
+        portadas_api = self.client.get(f'/api/libros/{self.libro.id}/').json()['portadas']
+        self.assertTrue(portadas_api['thumb']['webp'].endswith(variantes['thumb']['webp']))
+        self.assertIn(' 160w', portadas_api['srcset']['jpeg'])
+
+    def test_regenerar_borra_las_anteriores(self):
+        portadas.procesar(self.libro.id, self.libro.portada.name)
+        self.libro.refresh_from_db()
+        anteriores = self.libro.portada_variantes
+        portadas.procesar(self.libro.id, self.libro.portada.name)
+        self.libro.refresh_from_db()
+        for variante, datos in anteriores.items():
+            for formato in portadas.FORMATOS:
+                self.assertFalse(default_storage.exists(datos[formato]))
+                self.assertTrue(default_storage.exists(self.libro.portada_variantes[variante][formato]))
+
+    def test_portada_cambiada_entretanto(self):
+        generadas = portadas.generar_archivos(default_storage.path(self.libro.portada.name))
+        Libro.objects.filter(id=self.libro.id).update(portada='portadas/otra.jpg')
+        archivos = set(default_storage.listdir('portadas')[1])
+        self.assertEqual(portadas.guardar_variantes(self.libro.id, self.libro.portada.name, generadas), 0)
+        self.libro.refresh_from_db()
+        self.assertIsNone(self.libro.portada_variantes)
+        # Los archivos recién guardados no quedan huérfanos.
+        self.assertEqual(set(default_storage.listdir('portadas')[1]), archivos)
+
+    def test_subir_portada_programa_las_variantes(self):
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/libros/', {
+                'titulo': 'Nuevo', 'autor': 'Autor', 'precio': '9.50', 'isbn': '7000000000002',
+                'descripcion': 'd', 'portada': self.imagen(120, 90, 'blue'),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        libro = Libro.objects.get(id=response.json()['id'])
+        # La original es más chica que todas las variantes: no se agranda.
+        self.assertEqual(self.anchos(libro.portada_variantes), {'thumb': 120, 'card': 120, 'full': 120})
+
+    def test_comando(self):
+        Libro.objects.create(titulo='Sin archivo', autor='A', precio=Decimal('1'), isbn='7000000000003',
+                             descripcion='d', portada='portadas/no-existe.jpg')
+        salida = io.StringIO()
+        call_command('generar_portadas', procesos=1, stdout=salida)
+        self.assertIn('no existe portadas/no-existe.jpg', salida.getvalue())
+        self.assertIn('Portadas generadas: 1. Errores: 0.', salida.getvalue())
+        self.libro.refresh_from_db()
+        self.assertEqual(self.anchos(self.libro.portada_variantes), {'thumb': 160, 'card': 400, 'full': 800})
+
+        for procesos in (0, -1):
+            with self.assertRaises(CommandError):
+                call_command('generar_portadas', procesos=procesos, stdout=io.StringIO())
+
+
+@tareas.tarea(max_intentos=2)
+def tarea_que_falla(nombre):
+    Genero.objects.create(nombre=nombre)
+    raise RuntimeError('falla a propósito')
+
+
+class TareasTests(DatosCatalogoMixin, APITestCase):
+    """La cola saca los efectos de la request, los aplica una vez y reintenta lo que falla."""
+
+    def setUp(self):
+        super().setUp()
+        # El snapshot va a la cola en vez de a un timer.
+        ajustes = self.settings(TAREAS_EN_SEGUNDO_PLANO=True, CATALOGO_SNAPSHOT_EN_SEGUNDO_PLANO=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        usuario = User.objects.create_user('tareas', password='x')
+        self.compra = Compra.objects.create(usuario=usuario, total=0, estado='PENDIENTE')
+        ItemCompra.objects.create(compra=self.compra, libro=self.libros[0], precio_unitario=Decimal('10'), cantidad=2)
+
+    def test_efectos_de_confirmar_en_la_cola(self):
+        ventas.cambiar_estado([self.compra.id], 'PENDIENTE', 'CONFIRMADA')
+        self.libros[0].refresh_from_db()
+        self.assertEqual(self.libros[0].ventas_totales, 3)
+        tarea = Tarea.objects.get()
+        self.assertEqual((tarea.nombre, tarea.estado), ('core.ventas.aplicar_efectos', 'PENDIENTE'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(tareas.ejecutar_pendientes(), 1)
+        self.libros[0].refresh_from_db()
+        self.assertEqual(self.libros[0].ventas_totales, 5)
+        self.assertEqual(Tarea.objects.get(id=tarea.id).estado, 'COMPLETADA')
+        # catalogo.invalidar encoló el snapshot, con su demora.
+        snapshot_pendiente = Tarea.objects.get(clave='catalogo:snapshot')
+        self.assertEqual(snapshot_pendiente.estado, 'PENDIENTE')
+        self.assertEqual(tareas.ejecutar_pendientes(), 0)
+
+    def test_reintentos_con_espera_y_fallida(self):
+        tarea = tarea_que_falla.encolar(nombre='No debe quedar')
+        with self.assertLogs('core.tareas', 'ERROR'):
+            self.assertEqual(tareas.ejecutar_pendientes(), 1)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('PENDIENTE', 1))
+        self.assertIn('falla a propósito', tarea.error)
+        self.assertGreater(tarea.disponible_desde, timezone.now())
+        self.assertFalse(Genero.objects.filter(nombre='No debe quedar').exists())
+        # Todavía no está disponible.
+        self.assertEqual(tareas.ejecutar_pendientes(), 0)
+
+        Tarea.objects.filter(id=tarea.id).update(disponible_desde=timezone.now())
+        with self.assertLogs('core.tareas', 'ERROR'):
+            self.assertEqual(tareas.ejecutar_pendientes(), 1)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('FALLIDA', 2))
+        self.assertIsNotNone(tarea.terminada)
+
+    def test_clave_deduplica_pendientes(self):
+        primera = snapshot.construir_en_cola.encolar(clave='catalogo:snapshot')
+        self.assertEqual(snapshot.construir_en_cola.encolar(clave='catalogo:snapshot').id, primera.id)
+        self.assertEqual(Tarea.objects.count(), 1)
+        # Una vez reclamada, la clave admite una nueva pendiente.
+        self.assertEqual(tareas.reclamar('w', 1), [primera.id])
+        self.assertNotEqual(snapshot.construir_en_cola.encolar(clave='catalogo:snapshot').id, primera.id)
+
+    def test_bloqueo_vencido_vuelve_a_pendiente(self):
+        tarea = tarea_que_falla.encolar(nombre='x')
+        tareas.reclamar('muerto', 1)
+        Tarea.objects.filter(id=tarea.id).update(bloqueada_hasta=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(tareas.recuperar_vencidas(), 1)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos, tarea.worker), ('PENDIENTE', 1, 'muerto'))
+        # El worker original ya no puede completarla.
+        self.assertEqual(tareas.ejecutar(tarea.id, 'muerto'), 'PENDIENTE')
+
+    def test_run_workers_en_el_proceso(self):
+        ventas.cambiar_estado([self.compra.id], 'PENDIENTE', 'CONFIRMADA')
+        salida = io.StringIO()
+        call_command('run_workers', procesos=0, stdout=salida)
+        self.assertIn('1 tareas ejecutadas', salida.getvalue())
+        self.assertEqual(Tarea.objects.get().estado, 'COMPLETADA')
+        for opciones in ({'procesos': -1}, {'intervalo': 0}):
+            with self.assertRaises(CommandError):
+                call_command('run_workers', **opciones)
+
+    def test_sin_segundo_plano_se_ejecuta_en_el_momento(self):
+        with self.settings(TAREAS_EN_SEGUNDO_PLANO=False):
+            ventas.cambiar_estado([self.compra.id], 'PENDIENTE', 'CONFIRMADA')
+        self.libros[0].refresh_from_db()
+        self.assertEqual(self.libros[0].ventas_totales, 5)
+        self.assertFalse(Tarea.objects.exists())
@@ -6,6 +6,12 @@ from .views import (
     LibroViewSet,
     CompraViewSet,
     UsuarioViewSet,
+    ExportLibrosView,
+    ExportComprasView,
+    EstadisticasView,
+    MetricasView,
+    CatalogoSnapshotView,
+    batch_view,
     RegisterView,
     LoginView,
     LogoutView,
@@ -26,4 +32,11 @@ urlpatterns = [
     path('auth/logout/', LogoutView.as_view(), name='auth-logout'),
     path('auth/user/', UserDetailView.as_view(), name='auth-user'),
     path('auth/csrf/', obtain_csrf_token, name='auth-csrf'),
+    path('export/libros', ExportLibrosView.as_view(), name='export-libros'),
+    path('export/compras', ExportComprasView.as_view(), name='export-compras'),
+    path('estadisticas/', EstadisticasView.as_view(), name='estadisticas'),
+    path('metrics', MetricasView.as_view(), name='metrics'),
+    path('batch/', batch_view, name='batch'),
+    path('catalogo/snapshot', CatalogoSnapshotView.as_view(), name='catalogo-snapshot'),
+    path('catalogo/snapshot/<int:version>', CatalogoSnapshotView.as_view(), name='catalogo-snapshot-version'),
 ]
@@ -0,0 +1,20 @@
+"""
+Rutas de la API con las lecturas más usadas servidas por vistas async.
+
+Son las mismas URLs que core/urls.py; las de aquí van primero y todo lo
+demás cae en las rutas síncronas. Se usa cuando settings.VISTAS_ASYNC está
+activo (ver core_project/urls.py).
+"""
+from django.urls import include, path
+
+from .views import async_views
+
+urlpatterns = [
+    path('generos/', async_views.generos, name='genero-list'),
+    path('libros/', async_views.libros, name='libro-list'),
+    path('libros/top/', async_views.top_libros, name='libro-top-libros'),
+    path('libros/<int:pk>/', async_views.libro, name='libro-detail'),
+    path('compras/mi-carrito/', async_views.mi_carrito, name='compra-mi-carrito'),
+    path('auth/user/', async_views.usuario_actual, name='auth-user'),
+    path('', include('core.urls')),
+]
@@ -0,0 +1,77 @@
+"""
+Transiciones de estado de Compra y su efecto sobre Libro.ventas_totales.
+
+Todo se resuelve con sentencias sobre conjuntos: un UPDATE condicional para
+el estado y un UPDATE con F() + subconsulta agregada para las ventas, así el
+número de consultas no depende de cuántas compras o ítems haya y dos
+confirmaciones simultáneas no pisan el contador.
+
+El cambio de estado se hace en la request; sus efectos (ventas,
+estadísticas, relacionados, ranking y caché del catálogo) van en la tarea
+`aplicar_efectos`, que con TAREAS_EN_SEGUNDO_PLANO corre en run_workers
+(ver core/tareas.py) y si no, en la misma transacción que el cambio.
+"""
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from . import catalogo, estadisticas, ranking, relacionados, tareas
+from .models import Compra, ItemCompra, Libro
+
+
+def aplicar_ventas(compra_ids, signo=1):
+    """Suma (signo=1) o resta (signo=-1) las cantidades de las compras a ventas_totales."""
+    items = ItemCompra.objects.filter(compra_id__in=compra_ids).order_by()
+    libro_ids = list(items.values_list('libro_id', flat=True).distinct())
+    if not libro_ids:
+        return []
+    cantidades = (
+        items.filter(libro_id=OuterRef('pk'))
+        .values('libro_id')
+        .annotate(total=Sum('cantidad'))
+        .values('total')
+    )
+    Libro.objects.filter(id__in=libro_ids).update(
+        ventas_totales=F('ventas_totales') + signo * Subquery(cantidades),
+        fecha_actualizacion=timezone.now(),
+    )
+    return libro_ids
+
+
+@tareas.tarea()
+def aplicar_efectos(compra_ids, signo):
+    """Confirmación (signo=1) o su reversión (signo=-1) de las compras, fuera del cambio de estado."""
+    if signo == 1:
+        libro_ids = aplicar_ventas(compra_ids, 1)
+        estadisticas.aplicar(compra_ids, 1)
+        relacionados.sumar(libro_ids)
+        transaction.on_commit(lambda: ranking.registrar_ventas(libro_ids))
+    else:
+        relacionados.recalcular(aplicar_ventas(compra_ids, -1))
+        estadisticas.aplicar(compra_ids, -1)
+        transaction.on_commit(ranking.invalidar)
+    transaction.on_commit(catalogo.invalidar)
+
+
+def cambiar_estado(compra_ids, estado_anterior, estado_nuevo):
+    """
+    Pasa de `estado_anterior` a `estado_nuevo` las compras indicadas que sigan
+    en `estado_anterior` y encola sus efectos. Devuelve los ids que cambiaron;
+    las que otro proceso movió antes quedan fuera.
+    """
+    with transaction.atomic():
+        ids = list(
+            Compra.objects.select_for_update()
+            .filter(id__in=compra_ids, estado=estado_anterior)
+            .values_list('id', flat=True)
+        )
+        if not ids:
+            return []
+        Compra.objects.filter(id__in=ids, estado=estado_anterior).update(
+            estado=estado_nuevo, fecha_actualizacion=timezone.now()
+        )
+        if estado_nuevo == 'CONFIRMADA':
+            aplicar_efectos.encolar(compra_ids=ids, signo=1)
+        elif estado_anterior == 'CONFIRMADA':
+            aplicar_efectos.encolar(compra_ids=ids, signo=-1)
+    return ids
@@ -0,0 +1,32 @@
+"""
+Contadores de versión guardados en la caché de Django.
+
+Sirven para invalidar datos derivados (rankings, ETags del catálogo...) sin
+consultar la base de datos. El valor inicial se toma del reloj, así un
+reinicio de la caché nunca vuelve a emitir una versión ya usada.
+Para que la invalidación llegue a todos los procesos, CACHES['default'] debe
+ser una caché compartida.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _semilla():
+    return int(time.time() * 1000)
+
+
+def leer(clave):
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, _semilla(), timeout=None)
+        valor = cache.get(clave)
+    return valor
+
+
+def incrementar(clave):
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        cache.add(clave, _semilla(), timeout=None)
+        return cache.incr(clave)
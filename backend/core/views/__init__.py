@@ -2,6 +2,11 @@ from .genero_views import GeneroViewSet
 from .libro_views import LibroViewSet
 from .compra_views import CompraViewSet
 from .usuario_views import UsuarioViewSet
+from .export_views import ExportLibrosView, ExportComprasView
+from .estadisticas_views import EstadisticasView
+from .metricas_views import MetricasView
+from .snapshot_views import CatalogoSnapshotView
+from .batch_views import batch_view
 from .auth_views import (RegisterView,
     LoginView,
     LogoutView,
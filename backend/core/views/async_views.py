@@ -0,0 +1,149 @@
+"""
+Versiones async de las lecturas más usadas (catálogo, mi-carrito, auth/user).
+
+Bajo ASGI las vistas de DRF son síncronas y cada request ocupa un hilo
+mientras espera a la base de datos; estas usan el ORM async y el event loop
+atiende a otros clientes mientras tanto. Solo se reemplaza el GET: el resto
+de métodos de la misma URL va a la vista DRF de siempre. Las respuestas son
+las mismas (mismo JSON, ETag y códigos de estado) que las de los viewsets.
+
+Se montan desde core/urls_async.py cuando settings.VISTAS_ASYNC está activo
+(por defecto al servir con core_project.asgi).
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db.models import aprefetch_related_objects
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotAuthenticated, NotFound
+from rest_framework.renderers import JSONRenderer
+
+from .. import lectura, ranking
+from ..catalogo import condicional_async
+from ..models import Compra, Genero, Libro
+from ..pagination import KeysetPagination
+from ..serializers import CompraSerializer
+from .auth_views import UserDetailView
+from .compra_views import CompraViewSet, campos_pedidos, expandir_libro, prefetch_items
+from .genero_views import GeneroViewSet
+from .libro_views import LibroViewSet
+
+_renderer = JSONRenderer()
+
+
+def _json(data, status=200):
+    response = HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+    response['Vary'] = 'Accept'
+    return response
+
+
+def con_respaldo(vista_sync):
+    """
+    Atiende el GET con la vista async decorada y el resto de métodos con
+    `vista_sync`. Las métricas se registran con el nombre de la vista DRF.
+    """
+    respaldo = sync_to_async(vista_sync)
+
+    def decorador(vista):
+        @functools.wraps(vista)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await respaldo(request, *args, **kwargs)
+            return await vista(request, *args, **kwargs)
+
+        for atributo in ('cls', 'view_class', 'actions'):
+            if hasattr(vista_sync, atributo):
+                setattr(wrapper, atributo, getattr(vista_sync, atributo))
+        # DRF valida el CSRF por su cuenta en los métodos que caen en la vista sync.
+        return csrf_exempt(wrapper)
+    return decorador
+
+
+async def _usuario(request):
+    usuario = await request.auser()
+    return usuario if usuario.is_authenticated else None
+
+
+def _no_autenticado():
+    return _json({'detail': NotAuthenticated.default_detail}, status=403)
+
+
+# ---------- Catálogo ----------
+
+@con_respaldo(LibroViewSet.as_view({'get': 'list', 'post': 'create'}, basename='libro', detail=False))
+@condicional_async
+async def libros(request):
+    filas = lectura.filas(Libro.objects.all())
+    paginador = KeysetPagination()
+    if request.GET.get('orden') == 'top':
+        paginador.ordering = ('-ventas_totales', '-id')
+    try:
+        page = await paginador.apaginate_queryset(filas, request)
+    except NotFound as error:
+        return _json({'detail': error.detail}, status=404)
+    if page is not None:
+        return _json(paginador.get_paginated_data(await lectura.aserializar(page, request)))
+    return _json(await lectura.aserializar(filas, request))
+
+
+@con_respaldo(LibroViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+    basename='libro', detail=True,
+))
+@condicional_async
+async def libro(request, pk):
+    datos = await lectura.aserializar(lectura.filas(Libro.objects.filter(pk=pk)), request)
+    if not datos:
+        return _json({'detail': f'No {Libro._meta.object_name} matches the given query.'}, status=404)
+    return _json(datos[0])
+
+
+@con_respaldo(LibroViewSet.as_view({'get': 'top_libros'}, basename='libro', detail=False))
+@condicional_async
+async def top_libros(request):
+    ids = await sync_to_async(ranking.top_ids)()
+    return _json(await lectura.aserializar_ids(ids, request))
+
+
+@con_respaldo(GeneroViewSet.as_view({'get': 'list', 'post': 'create'}, basename='genero', detail=False))
+@condicional_async
+async def generos(request):
+    return _json([genero async for genero in Genero.objects.values('id', 'nombre')])
+
+
+# ---------- Usuario ----------
+
+@con_respaldo(CompraViewSet.as_view({'get': 'mi_carrito'}, basename='compra', detail=False))
+async def mi_carrito(request):
+    usuario = await _usuario(request)
+    if usuario is None:
+        return _no_autenticado()
+    carrito, _ = await Compra.objects.select_related('usuario').aget_or_create(
+        usuario=usuario, estado='CARRITO', defaults={'total': 0}
+    )
+
+    campos, expandir = campos_pedidos(request.GET), expandir_libro(request.GET)
+    prefetch = prefetch_items(campos, expandir)
+    if prefetch is not None:
+        await aprefetch_related_objects([carrito], prefetch)
+    # Con los ítems precargados serializar no consulta la base: se hace en el event loop.
+    serializer = CompraSerializer(carrito, context={
+        'request': request, 'expandir_libro': expandir, 'fields': campos,
+    })
+    return _json(serializer.data)
+
+
+@con_respaldo(UserDetailView.as_view())
+async def usuario_actual(request):
+    usuario = await _usuario(request)
+    if usuario is None:
+        return _no_autenticado()
+    return _json({
+        'id': usuario.id,
+        'username': usuario.username,
+        'email': usuario.email,
+        'first_name': usuario.first_name,
+        'last_name': usuario.last_name,
+        'is_staff': usuario.is_staff,
+    })
@@ -0,0 +1,34 @@
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .. import batch
+
+
+class BatchView(APIView):
+    """
+    POST {"requests": [{"id": "user", "method": "GET", "path": "/api/auth/user/"}, ...]}
+    -> {"responses": [{"id", "status", "headers", "body"}, ...]} en el mismo orden.
+    Cada sub-request aplica sus propios permisos y CSRF (ver core/batch.py).
+    """
+    permission_classes = [AllowAny]
+
+    def perform_authentication(self, request):
+        # El usuario lo resuelve el middleware una vez y lo usan las sub-requests;
+        # el batch en sí no autentica ni valida CSRF (DRF además lo pisaría en la
+        # request de Django compartida).
+        pass
+
+    def post(self, request):
+        try:
+            subs = batch.validar(request.data)
+        except batch.BatchInvalido as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        resultados = batch.ejecutar(request._request, subs)
+        return batch.responder(request._request, resultados)
+
+
+# Marca para que un batch no se llame a sí mismo.
+batch_view = BatchView.as_view()
+batch_view.batch = True
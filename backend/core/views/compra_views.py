@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.middleware.csrf import get_token
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action, api_view, permission_classes
@@ -5,20 +7,85 @@ from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.views.decorators.csrf import csrf_exempt
+from django.db import connection, transaction
+from django.db.models import OuterRef, Prefetch, Subquery, prefetch_related_objects
+from django.utils import timezone
+from .. import ventas
+from ..idempotencia import idempotente
 from ..models import Genero, Libro, Compra, ItemCompra
 from ..serializers import (
     GeneroSerializer,
     LibroSerializer,
     CompraSerializer,
     ItemCompraSerializer,
+    LibroResumenSerializer,
     UserSerializer,
 )
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
 User = get_user_model()
+
+# Tope de unidades de un mismo libro en una compra.
+CANTIDAD_MAXIMA = 1000
+# Compra.total es DecimalField(max_digits=10, decimal_places=2).
+TOTAL_MAXIMO = Decimal(10) ** (Compra._meta.get_field('total').max_digits
+                               - Compra._meta.get_field('total').decimal_places)
+
+# Ítems con su libro y los géneros del libro: tres consultas sin importar cuántos haya.
+ITEMS_CON_LIBRO = Prefetch(
+    'items',
+    queryset=ItemCompra.objects.select_related('libro').prefetch_related('libro__generos'),
+)
+# Lo mismo para la representación resumida: solo las columnas del libro que se muestran.
+ITEMS_CON_RESUMEN = Prefetch(
+    'items',
+    queryset=ItemCompra.objects.select_related('libro').only(
+        'id', 'compra_id', 'libro_id', 'precio_unitario', 'cantidad',
+        *(f'libro__{campo}' for campo in LibroResumenSerializer.CAMPOS_CONSULTA),
+    ),
+)
+
+
+def campos_pedidos(params):
+    """Campos de ?fields=id,total,items; None si no se pidió."""
+    valor = params.get('fields')
+    if not valor:
+        return None
+    return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+
+def expandir_libro(params):
+    """Con ?expand=libro cada ítem trae el libro completo; si no, el resumen."""
+    return 'libro' in params.get('expand', '').split(',')
+
+
+def prefetch_items(campos, expandir):
+    if campos is not None and 'items' not in campos:
+        return None
+    return ITEMS_CON_LIBRO if expandir else ITEMS_CON_RESUMEN
+
+
+def sumar_items(compra_id, cantidades, precios):
+    """
+    Upsert sobre item_compra_libro_unico: inserta los libros nuevos y suma la
+    cantidad a los que ya estaban (conservan su precio_unitario), en una sola
+    sentencia. ON CONFLICT existe igual en SQLite y PostgreSQL.
+    """
+    tabla = connection.ops.quote_name(ItemCompra._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {tabla} (compra_id, libro_id, precio_unitario, cantidad) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (compra_id, libro_id) DO UPDATE SET cantidad = {tabla}.cantidad + excluded.cantidad',
+            [
+                (compra_id, libro_id, connection.ops.adapt_decimalfield_value(precios[libro_id], 8, 2), cantidad)
+                for libro_id, cantidad in cantidades.items()
+            ],
+        )
+
+
 # ---------- Compra ----------
 class CompraViewSet(viewsets.ModelViewSet):
-    queryset = Compra.objects.all().select_related('usuario').prefetch_related('items__libro')
+    queryset = Compra.objects.all().select_related('usuario').prefetch_related(ITEMS_CON_LIBRO)
     serializer_class = CompraSerializer
     permission_classes = [IsAuthenticated]
 
@@ -29,35 +96,56 @@ class CompraViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return Compra.objects.filter(usuario=user)
+        queryset = Compra.objects.select_related('usuario')
+        if self.action in ['list', 'retrieve']:
+            prefetch = self.get_prefetch_items()
+            if prefetch is not None:
+                queryset = queryset.prefetch_related(prefetch)
+        if user.is_staff:
+            return queryset
+        return queryset.filter(usuario=user)
 
+    def get_campos_pedidos(self):
+        return campos_pedidos(self.request.query_params)
 
-    def perform_create(self, serializer):
-        user = self.request.user
-        items_data = self.request.data.get('items', [])
-        total = 0
+    def expandir_libro(self):
+        return expandir_libro(self.request.query_params)
 
-        for item in items_data:
-            libro_obj = Libro.objects.get(pk=item['libro_id'])
-            total += libro_obj.precio * item.get('cantidad', 1)
+    def get_prefetch_items(self):
+        return prefetch_items(self.get_campos_pedidos(), self.expandir_libro())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expandir_libro'] = self.expandir_libro()
+        context['fields'] = self.get_campos_pedidos()
+        return context
 
-        serializer.save(usuario=user, total=total, estado='PENDIENTE')
+    def get_serializer_compra(self, compra):
+        """Serializer de una compra recién leída o modificada, con sus ítems precargados."""
+        prefetch = self.get_prefetch_items()
+        if prefetch is not None:
+            prefetch_related_objects([compra], prefetch)
+        return self.get_serializer(compra)
+
+    def perform_create(self, serializer):
+        user = self.request.user
+        # Los libros ya vienen resueltos por el serializer (una sola consulta para todos).
+        total = sum(
+            item['libro'].precio * item.get('cantidad', 1)
+            for item in serializer.validated_data['items']
+        )
+        compra = serializer.save(usuario=user, total=total, estado='PENDIENTE')
+        prefetch = self.get_prefetch_items()
+        if prefetch is not None:
+            prefetch_related_objects([compra], prefetch)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], url_path='mi-carrito')
     def mi_carrito(self, request):
-        user = request.user
-        carrito = Compra.objects.filter(
-            usuario=user,
-            estado='CARRITO'
-        ).first()
-        if not carrito:
-            carrito = Compra.objects.create(
-                usuario=user,
-                total=0,
-                estado='CARRITO'
-            )
-
-        serializer = self.get_serializer(carrito)
+        # compra_carrito_unico garantiza un solo carrito aunque lleguen dos primeras visitas a la vez.
+        carrito, _ = Compra.objects.select_related('usuario').get_or_create(
+            usuario=request.user, estado='CARRITO', defaults={'total': 0}
+        )
+        serializer = self.get_serializer_compra(carrito)
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], url_path='agregar-items')
@@ -77,30 +165,59 @@ class CompraViewSet(viewsets.ModelViewSet):
         if not isinstance(items_data, list) or len(items_data) == 0:
             return Response({'detail': 'Se requieren datos de items'}, status=status.HTTP_400_BAD_REQUEST)
 
+        cantidades = {}
         for item in items_data:
-            libro_id = item.get('libro_id')
-            cantidad = item.get('cantidad', 1)
             try:
-                libro_obj = Libro.objects.get(pk=libro_id)
-            except Libro.DoesNotExist:
+                libro_id = int(item.get('libro_id'))
+                cantidad = int(item.get('cantidad', 1))
+            except (AttributeError, TypeError, ValueError):
+                return Response({'detail': 'Items inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+            if not 1 <= libro_id < 2 ** 63:
+                return Response({'detail': f'Libro con id {libro_id} no existe'}, status=status.HTTP_400_BAD_REQUEST)
+            if cantidad < 1:
+                return Response({'detail': 'La cantidad debe ser mayor que 0'}, status=status.HTTP_400_BAD_REQUEST)
+            cantidades[libro_id] = cantidades.get(libro_id, 0) + cantidad
+            if cantidades[libro_id] > CANTIDAD_MAXIMA:
+                return Response({'detail': f'La cantidad por libro no puede pasar de {CANTIDAD_MAXIMA}'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        libros = Libro.objects.only('id', 'precio').in_bulk(list(cantidades))
+        for libro_id in cantidades:
+            if libro_id not in libros:
                 return Response({'detail': f'Libro con id {libro_id} no existe'}, status=status.HTTP_400_BAD_REQUEST)
-            item_existente = ItemCompra.objects.filter(compra=carrito, libro=libro_obj).first()
-            if item_existente:
-                item_existente.cantidad += cantidad
-                item_existente.save()
-            else:
-                ItemCompra.objects.create(
-                    compra=carrito,
-                    libro=libro_obj,
-                    precio_unitario=libro_obj.precio,
-                    cantidad=cantidad
-                )
 
-        total_calc = sum(i.precio_unitario * i.cantidad for i in carrito.items.all())
-        carrito.total = total_calc
-        carrito.save()
+        with transaction.atomic():
+            # El UPDATE bloquea el carrito y comprueba que siga activo antes de
+            # tocar sus ítems: un checkout simultáneo no lo envía a medias.
+            bloqueado = Compra.objects.filter(pk=carrito.pk, estado='CARRITO').update(
+                fecha_actualizacion=timezone.now()
+            )
+            if not bloqueado:
+                return Response(
+                    {'detail': 'Solo se pueden agregar items a carritos activos. Esta compra ya fue enviada.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            precios = {libro_id: libro.precio for libro_id, libro in libros.items()}
+            # Los ítems que ya estaban conservan su precio; el total tiene que entrar en la columna.
+            total = Decimal(0)
+            for libro_id, cantidad, precio in ItemCompra.objects.filter(compra_id=carrito.pk).values_list(
+                    'libro_id', 'cantidad', 'precio_unitario'):
+                if libro_id in cantidades:
+                    if cantidad + cantidades[libro_id] > CANTIDAD_MAXIMA:
+                        transaction.set_rollback(True)
+                        return Response({'detail': f'La cantidad por libro no puede pasar de {CANTIDAD_MAXIMA}'},
+                                        status=status.HTTP_400_BAD_REQUEST)
+                    precios[libro_id] = precio
+                total += precio * cantidad
+            total += sum(precios[libro_id] * cantidad for libro_id, cantidad in cantidades.items())
+            if total >= TOTAL_MAXIMO:
+                transaction.set_rollback(True)
+                return Response({'detail': 'El total de la compra supera el máximo permitido'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            sumar_items(carrito.pk, cantidades, precios)
+            carrito.recalcular_total()
 
-        serializer = self.get_serializer(carrito)
+        serializer = self.get_serializer_compra(carrito)
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], url_path='subir-comprobante')
@@ -125,6 +242,42 @@ class CompraViewSet(viewsets.ModelViewSet):
         compra.save()
         return Response({'detail': 'Comprobante subido correctamente'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @idempotente
+    def checkout(self, request, pk=None):
+        carrito = self.get_object()
+        user = request.user
+
+        if carrito.usuario != user and not user.is_staff:
+            return Response({'detail': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            bloqueado = Compra.objects.filter(pk=carrito.pk, estado='CARRITO').update(
+                fecha_actualizacion=timezone.now()
+            )
+            if not bloqueado:
+                return Response(
+                    {'detail': 'Solo se puede hacer checkout de un carrito activo'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Se cobra el precio actual de cada libro, no el del momento en que se agregó.
+            precio_actual = Libro.objects.filter(pk=OuterRef('libro_id')).values('precio')[:1]
+            if not ItemCompra.objects.filter(compra=carrito).update(precio_unitario=Subquery(precio_actual)):
+                transaction.set_rollback(True)
+                return Response({'detail': 'El carrito está vacío'}, status=status.HTTP_400_BAD_REQUEST)
+            carrito.recalcular_total()
+
+            carrito.estado = 'PENDIENTE'
+            campos = ['estado', 'fecha_actualizacion']
+            archivo = request.FILES.get('comprobante')
+            if archivo:
+                carrito.comprobante = archivo
+                campos.append('comprobante')
+            carrito.save(update_fields=campos)
+
+        serializer = self.get_serializer_compra(carrito)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['delete'], url_path='eliminar-item/(?P<item_id>[^/.]+)')
     def eliminar_item(self, request, pk=None, item_id=None):
         try:
@@ -139,9 +292,7 @@ class CompraViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         item.delete()
-        compra = item.compra
-        compra.total = sum(i.precio_unitario * i.cantidad for i in compra.items.all())
-        compra.save()
+        item.compra.recalcular_total()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 #admin editamos el estado
@@ -164,12 +315,35 @@ class CompraViewSet(viewsets.ModelViewSet):
                 {'detail': 'No se puede regresar una compra al estado de carrito'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        compra.estado = estado_nuevo
-        compra.save()
-        if estado_nuevo == 'CONFIRMADA':
-            for item in compra.items.all():
-                libro = item.libro
-                libro.ventas_totales += item.cantidad
-                libro.save()
+        if estado_nuevo != compra.estado:
+            if not ventas.cambiar_estado([compra.id], compra.estado, estado_nuevo):
+                return Response(
+                    {'detail': 'La compra cambió de estado mientras se procesaba. Intente de nuevo.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            compra.refresh_from_db()
+
+        serializer = self.get_serializer_compra(compra)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='confirmar-lote')
+    def confirmar_lote(self, request):
+        ids = request.data.get('ids', [])
+        estado_nuevo = request.data.get('estado', 'CONFIRMADA')
+        if estado_nuevo not in ['CONFIRMADA', 'RECHAZADA']:
+            return Response({'detail': 'Estado inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or len(ids) == 0:
+            return Response({'detail': 'Se requiere una lista de ids'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = {int(i) for i in ids}
+        except (TypeError, ValueError):
+            return Response({'detail': 'Ids inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(1 <= i < 2 ** 63 for i in ids):
+            return Response({'detail': 'Ids inválidos'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return super().partial_update(request, *args, **kwargs)
+        procesadas = ventas.cambiar_estado(ids, 'PENDIENTE', estado_nuevo)
+        return Response({
+            'estado': estado_nuevo,
+            'procesadas': sorted(procesadas),
+            'omitidas': sorted(ids - set(procesadas)),
+        })
@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+from django.db.models import F, Sum
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import VentaDiariaGenero, VentaDiariaLibro
+
+
+def _dinero(valor):
+    # Mismo formato que el resto de la API para importes: string con 2 decimales.
+    return str(Decimal(valor or 0).quantize(Decimal('0.01')))
+
+
+def _id(valor):
+    # Fuera del rango de INTEGER la consulta falla con OverflowError en vez de no encontrar nada.
+    numero = int(valor)
+    if not 1 <= numero < 2 ** 63:
+        raise ValueError(valor)
+    return numero
+
+
+class EstadisticasView(APIView):
+    """
+    Ventas confirmadas (unidades e ingresos) en un rango de fechas, leídas
+    solo de los acumulados diarios.
+
+    ?desde=&hasta= (YYYY-MM-DD, inclusive) y ?por=dia|libro|genero.
+    Con ?libro=<id> o ?genero=<id> devuelve la serie diaria de ese libro/género.
+    """
+    permission_classes = [IsAdminUser]
+    max_limit = 500
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            # parse_date da None si no tiene el formato y ValueError si la fecha no existe (2024-13-01).
+            desde = parse_date(params['desde']) if params.get('desde') else None
+            hasta = parse_date(params['hasta']) if params.get('hasta') else None
+        except ValueError:
+            desde = hasta = None
+        if (params.get('desde') and desde is None) or (params.get('hasta') and hasta is None):
+            return Response({'detail': 'Fechas inválidas, use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        por = params.get('por', 'dia')
+        if por not in ['dia', 'libro', 'genero']:
+            return Response({'detail': 'Agrupación inválida'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(params.get('limit', 100)), self.max_limit))
+            libro_id = _id(params['libro']) if params.get('libro') else None
+            genero_id = _id(params['genero']) if params.get('genero') else None
+        except ValueError:
+            return Response({'detail': 'Parámetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        # Los acumulados por género no tienen libro: no se pueden cruzar.
+        if libro_id is not None and (genero_id is not None or por == 'genero'):
+            return Response({'detail': '?libro no se puede combinar con ?genero ni con ?por=genero'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        modelo = VentaDiariaGenero if por == 'genero' or genero_id is not None else VentaDiariaLibro
+        filas = modelo.objects.all()
+        if desde:
+            filas = filas.filter(fecha__gte=desde)
+        if hasta:
+            filas = filas.filter(fecha__lte=hasta)
+        if libro_id is not None:
+            filas = filas.filter(libro_id=libro_id)
+        if genero_id is not None:
+            filas = filas.filter(genero_id=genero_id)
+
+        totales = {'unidades': Sum('unidades'), 'ingresos': Sum('ingresos')}
+        if por == 'dia' or libro_id is not None or genero_id is not None:
+            resultados = filas.values('fecha').annotate(**totales).order_by('fecha')
+        elif por == 'libro':
+            resultados = (
+                filas.values('libro_id').annotate(titulo=F('libro__titulo'), **totales)
+                .order_by('-ingresos', 'libro_id')[:limit]
+            )
+        else:
+            resultados = (
+                filas.values('genero_id').annotate(nombre=F('genero__nombre'), **totales)
+                .order_by('-ingresos', 'genero_id')[:limit]
+            )
+
+        resumen = filas.aggregate(**totales)
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'por': por,
+            'unidades': resumen['unidades'] or 0,
+            'ingresos': _dinero(resumen['ingresos']),
+            'resultados': [{**fila, 'ingresos': _dinero(fila['ingresos'])} for fila in resultados],
+        })
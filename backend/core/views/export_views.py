@@ -0,0 +1,144 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import Compra, Libro
+
+CHUNK_SIZE = 500
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _parse_since(valor):
+    if not valor:
+        return None
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(valor)
+        fecha = timezone.datetime(dia.year, dia.month, dia.day)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha, timezone.get_default_timezone())
+    return fecha
+
+
+class _ExportView(APIView):
+    """
+    Exportación en streaming (NDJSON o CSV con ?formato=csv).
+
+    Las filas salen de `.iterator(chunk_size=...)`, con los prefetch hechos
+    por bloque, así la memoria no crece con el tamaño de la tabla. Con
+    ?since=<fecha_actualizacion> solo se exporta lo modificado después.
+    """
+    permission_classes = [IsAdminUser]
+    nombre = None
+    columnas_csv = []
+
+    def get(self, request):
+        formato = request.query_params.get('formato', 'ndjson')
+        if formato not in ['ndjson', 'csv']:
+            return Response({'detail': 'Formato inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since = _parse_since(request.query_params.get('since'))
+        except ValueError:
+            return Response({'detail': 'Fecha inválida en since'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        if since is not None:
+            queryset = queryset.filter(fecha_actualizacion__gt=since)
+        objetos = queryset.order_by('fecha_actualizacion', 'id').iterator(chunk_size=CHUNK_SIZE)
+
+        if formato == 'csv':
+            contenido = self.stream_csv(objetos)
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            contenido = (json.dumps(fila, ensure_ascii=False) + '\n' for fila in self.filas(objetos))
+            content_type = 'application/x-ndjson; charset=utf-8'
+
+        response = StreamingHttpResponse(contenido, content_type=content_type)
+        extension = 'csv' if formato == 'csv' else 'ndjson'
+        response['Content-Disposition'] = f'attachment; filename="{self.nombre}.{extension}"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def stream_csv(self, objetos):
+        writer = csv.writer(_Eco())
+        yield writer.writerow(self.columnas_csv)
+        for fila in self.filas_csv(objetos):
+            yield writer.writerow(fila)
+
+
+class ExportLibrosView(_ExportView):
+    nombre = 'libros'
+    columnas_csv = ['id', 'titulo', 'autor', 'precio', 'isbn', 'descripcion', 'portada',
+                    'generos', 'ventas_totales', 'fecha_actualizacion']
+
+    def get_queryset(self):
+        return Libro.objects.defer('portada_variantes').prefetch_related('generos')
+
+    def filas(self, libros):
+        for libro in libros:
+            yield {
+                'id': libro.id,
+                'titulo': libro.titulo,
+                'autor': libro.autor,
+                'precio': str(libro.precio),
+                'isbn': libro.isbn,
+                'descripcion': libro.descripcion,
+                'portada': libro.portada.name or None,
+                'generos': [g.nombre for g in libro.generos.all()],
+                'ventas_totales': libro.ventas_totales,
+                'fecha_actualizacion': libro.fecha_actualizacion.isoformat(),
+            }
+
+    def filas_csv(self, libros):
+        # Los géneros van separados por "|", el mismo formato que acepta importar_libros.
+        for fila in self.filas(libros):
+            fila['generos'] = '|'.join(fila['generos'])
+            yield [fila[c] for c in self.columnas_csv]
+
+
+class ExportComprasView(_ExportView):
+    nombre = 'compras'
+    columnas_csv = ['compra_id', 'usuario', 'fecha', 'fecha_actualizacion', 'estado', 'total',
+                    'libro_id', 'cantidad', 'precio_unitario']
+
+    def get_queryset(self):
+        return Compra.objects.select_related('usuario').prefetch_related('items')
+
+    def filas(self, compras):
+        for compra in compras:
+            yield {
+                'id': compra.id,
+                'usuario_id': compra.usuario_id,
+                'usuario': compra.usuario.username,
+                'fecha': compra.fecha.isoformat(),
+                'fecha_actualizacion': compra.fecha_actualizacion.isoformat(),
+                'estado': compra.estado,
+                'total': str(compra.total),
+                'items': [
+                    {'libro_id': i.libro_id, 'cantidad': i.cantidad, 'precio_unitario': str(i.precio_unitario)}
+                    for i in compra.items.all()
+                ],
+            }
+
+    def filas_csv(self, compras):
+        # Una fila por ítem; las compras sin ítems salen con las columnas del ítem vacías.
+        for fila in self.filas(compras):
+            base = [fila['id'], fila['usuario'], fila['fecha'], fila['fecha_actualizacion'],
+                    fila['estado'], fila['total']]
+            for item in fila['items'] or [{'libro_id': '', 'cantidad': '', 'precio_unitario': ''}]:
+                yield base + [item['libro_id'], item['cantidad'], item['precio_unitario']]
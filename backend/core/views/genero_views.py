@@ -1,22 +1,43 @@
 from rest_framework import viewsets
 from rest_framework.permissions import AllowAny, IsAdminUser
+from .. import lectura, ranking
+from ..catalogo import CatalogoPublicoMixin, condicional
 from ..models import Genero
-from ..serializers import GeneroSerializer, LibroSerializer
+from ..pagination import KeysetPagination
+from ..serializers import GeneroSerializer
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-class GeneroViewSet(viewsets.ModelViewSet):
+class GeneroViewSet(CatalogoPublicoMixin, viewsets.ModelViewSet):
     queryset = Genero.objects.all()
     serializer_class = GeneroSerializer
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'libros']:
+        if self.action in ['list', 'retrieve', 'libros', 'top']:
             return [AllowAny()]
         return [IsAdminUser()]
 
+    @condicional
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @condicional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'])
+    @condicional
     def libros(self, request, pk=None):
         genero = self.get_object()
-        libros = genero.libros.all()
-        serializer = LibroSerializer(libros, many=True, context={'request': request})
-        return Response(serializer.data)
+        filas = lectura.filas(genero.libros.all())
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(filas, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(lectura.serializar(page, request))
+        return Response(lectura.serializar(filas, request))
+
+    @action(detail=True, methods=['get'])
+    @condicional
+    def top(self, request, pk=None):
+        genero = self.get_object()
+        return Response(lectura.serializar_ids(ranking.top_ids(genero.id), request))
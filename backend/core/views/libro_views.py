@@ -12,23 +12,53 @@ from ..serializers import (
     CompraSerializer,
     ItemCompraSerializer,
     UserSerializer,
+    validar_isbn,
+    validar_precio,
 )
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.utils.urls import replace_query_param
+from django.db import transaction
+from .. import facetas, importacion, lectura, portadas, ranking, relacionados, search
+from ..catalogo import CatalogoPublicoMixin, condicional
+from ..pagination import KeysetPagination
 
 User = get_user_model()
 # ---------- Libro ----------
 
 
-class LibroViewSet(viewsets.ModelViewSet):
+class LibroViewSet(CatalogoPublicoMixin, viewsets.ModelViewSet):
     queryset = Libro.objects.all().prefetch_related('generos')
     serializer_class = LibroSerializer
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'top_libros']:
+        if self.action in ['list', 'retrieve', 'top_libros', 'buscar', 'facetas', 'relacionados']:
             return [AllowAny()]
         return [IsAdminUser()]
 
+    def get_keyset_ordering(self):
+        if self.request.query_params.get('orden') == 'top':
+            return ('-ventas_totales', '-id')
+        return ('id',)
+
+    def programar_portadas(self, libro):
+        libro_id, nombre = libro.id, libro.portada.name
+        transaction.on_commit(lambda: portadas.programar(libro_id, nombre))
+
+    @condicional
+    def list(self, request, *args, **kwargs):
+        # Camino rápido (core.lectura): misma salida que LibroSerializer sin instanciarlo por fila.
+        filas = lectura.filas(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(filas)
+        if page is not None:
+            return self.get_paginated_response(lectura.serializar(page, request))
+        return Response(lectura.serializar(filas, request))
+
+    @condicional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         generos_ids = request.data.getlist('generos_ids', [])
         mutable_data = request.data.copy()
@@ -37,6 +67,7 @@ class LibroViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=mutable_data)
         serializer.is_valid(raise_exception=True)
         libro = serializer.save()
+        self.programar_portadas(libro)
         if generos_ids:
             try:
                 generos_ids = [int(gid) for gid in generos_ids]
@@ -55,7 +86,11 @@ class LibroViewSet(viewsets.ModelViewSet):
             del mutable_data['generos_ids']
         serializer = self.get_serializer(instance, data=mutable_data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        libro = serializer.save()
+        if 'portada' in request.FILES:
+            libro = serializer.save(portada_variantes=None)
+            self.programar_portadas(libro)
+        else:
+            libro = serializer.save()
         if generos_ids:
             try:
                 generos_ids = [int(gid) for gid in generos_ids]
@@ -66,10 +101,69 @@ class LibroViewSet(viewsets.ModelViewSet):
         return Response(self.get_serializer(libro).data)
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny], url_path='top')
+    @condicional
     def top_libros(self, request):
-        top10 = Libro.objects.order_by('-ventas_totales')[:10]
-        serializer = self.get_serializer(top10, many=True)
-        return Response(serializer.data)
+        return Response(lectura.serializar_ids(ranking.top_ids(), request))
+
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny], url_path='relacionados')
+    @condicional
+    def relacionados(self, request, pk=None):
+        # Sin get_object(): si el libro tiene vecinos existe; solo sin vecinos se consulta por la PK.
+        try:
+            libro_id = int(pk)
+        except ValueError:
+            libro_id = None
+        # Fuera del rango de INTEGER la consulta fallaría con OverflowError.
+        if libro_id is None or not 1 <= libro_id < 2 ** 63:
+            return Response({'detail': 'No encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        vecinos = relacionados.vecinos(libro_id)
+        if not vecinos and not Libro.objects.filter(pk=libro_id).exists():
+            return Response({'detail': 'No encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(lectura.serializar_ids(vecinos, request))
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny], url_path='buscar')
+    @condicional
+    def buscar(self, request):
+        texto = request.query_params.get('q', '').strip()
+        if not texto:
+            return Response({'detail': 'Se requiere el parámetro q'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = KeysetPagination().get_limit(request)
+        try:
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except ValueError:
+            offset = 0
+        if offset > search.OFFSET_MAXIMO:
+            return Response({'detail': f'offset no puede pasar de {search.OFFSET_MAXIMO}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        ids = search.buscar_ids(texto, limit + 1, offset)
+        hay_mas = len(ids) > limit
+        ids = ids[:limit]
+
+        next_url = None
+        if hay_mas:
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+        return Response({'next': next_url, 'results': lectura.serializar_ids(ids, request)})
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny], url_path='facetas')
+    @condicional
+    def facetas(self, request):
+        try:
+            filtro = facetas.leer_filtro(request.query_params)
+        except facetas.FiltroInvalido as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(facetas.facetas(filtro))
+
+    @action(detail=False, methods=['post'], url_path='importar')
+    def importar(self, request):
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'detail': 'Se requiere un archivo'}, status=status.HTTP_400_BAD_REQUEST)
+        formato = request.query_params.get('formato') or importacion.detectar_formato(archivo.name)
+        if formato not in ['csv', 'jsonl']:
+            return Response({'detail': 'Formato inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        resumen = importacion.importar(importacion.leer_filas(archivo, formato))
+        return Response(resumen, status=status.HTTP_200_OK)
 
 
 class LibroSerializer(serializers.ModelSerializer):
@@ -79,13 +173,9 @@ class LibroSerializer(serializers.ModelSerializer):
         model = Libro
         fields = ['id', 'titulo', 'autor', 'precio', 'isbn', 'descripcion', 'portada', 'generos', 'ventas_totales']
     def validate_precio(self, value):
-        if value <= 0:
-            raise serializers.ValidationError("El precio debe ser mayor que 0")
-        return value
+        return validar_precio(value)
     def validate_isbn(self, value):
-        if not value or len(value.strip()) < 10:
-            raise serializers.ValidationError("ISBN debe tener al menos 10 caracteres")
-        return value.strip()
+        return validar_isbn(value)
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
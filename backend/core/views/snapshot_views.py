@@ -0,0 +1,71 @@
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .. import snapshot
+
+UN_ANO = 365 * 24 * 3600
+
+
+def codificacion_preferida(cabecera, disponibles):
+    """Primera de `disponibles` que el cliente acepta en Accept-Encoding (q > 0); None = sin comprimir."""
+    aceptadas = {}
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.partition(';')
+        calidad = 1.0
+        parametros = parametros.strip().replace(' ', '')
+        if parametros.startswith('q='):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        if nombre.strip():
+            aceptadas[nombre.strip().lower()] = calidad
+    for codificacion in disponibles:
+        if aceptadas.get(codificacion, aceptadas.get('*', 0.0)) > 0:
+            return codificacion
+    return None
+
+
+class CatalogoSnapshotView(APIView):
+    """
+    Catálogo completo desde el snapshot en disco (core/snapshot.py) servido
+    con FileResponse, así el servidor puede usar sendfile. Sin versión en la
+    URL se entrega el último snapshot y el cliente revalida con ETag; con
+    versión (/catalogo/snapshot/<version>) la respuesta es inmutable.
+    """
+    permission_classes = [AllowAny]
+    # Público y sin datos del usuario: no hace falta cargar la sesión.
+    authentication_classes = []
+
+    def get(self, request, version=None):
+        actual = snapshot.actual() or snapshot.construir()
+        if version is None:
+            version = actual['version']
+        disponibles = [c for c in snapshot.codificaciones_disponibles() if c in actual['codificaciones']]
+        codificacion = codificacion_preferida(request.META.get('HTTP_ACCEPT_ENCODING', ''), disponibles)
+
+        etag = f'"catalogo-{version}-{codificacion or "identity"}"'
+        no_modificado = get_conditional_response(request, etag=etag)
+        if no_modificado is None:
+            try:
+                archivo = open(snapshot.nombre_archivo(version, codificacion), 'rb')
+            except FileNotFoundError:
+                return Response({'detail': 'Versión de snapshot inexistente'}, status=status.HTTP_404_NOT_FOUND)
+            response = FileResponse(archivo, content_type='application/json', filename='catalogo.json')
+            if codificacion:
+                response['Content-Encoding'] = codificacion
+        else:
+            response = no_modificado
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if 'version' in self.kwargs:
+            patch_cache_control(response, public=True, max_age=UN_ANO, immutable=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+            response['Content-Location'] = request.build_absolute_uri(f'{request.path}/{version}')
+        return response
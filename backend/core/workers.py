@@ -0,0 +1,22 @@
+"""
+Funciones que corren en los procesos hijos de run_workers (ver
+core/tareas.py). Los hijos arrancan con spawn y cargan este módulo antes de
+django.setup(), así que acá no se importa nada que necesite las apps.
+"""
+
+
+def inicializar():
+    import django
+    django.setup()
+
+
+def ejecutar(tarea_id, worker):
+    from django.db import close_old_connections
+
+    from . import tareas
+
+    close_old_connections()
+    try:
+        return tareas.ejecutar(tarea_id, worker)
+    finally:
+        close_old_connections()
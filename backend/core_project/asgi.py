@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core_project.settings')
+# Bajo ASGI se usan las vistas async de core.views.async_views (VISTAS_ASYNC=0 para desactivarlas).
+os.environ.setdefault('VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
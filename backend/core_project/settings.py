@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,12 +80,64 @@ WSGI_APPLICATION = 'core_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# Perfil elegido por variables de entorno (por defecto, el SQLite de desarrollo):
+#   DB_MOTOR=sqlite|postgresql        DB_PERFIL=desarrollo|produccion
+#   DB_NOMBRE, DB_USUARIO, DB_PASSWORD, DB_HOST, DB_PUERTO (PostgreSQL)
+#   DB_CONN_MAX_AGE (segundos; por defecto 0 en desarrollo y 600 en producción)
+#   DB_POOL_MIN, DB_POOL_MAX (PostgreSQL: pool de psycopg en vez de conexiones persistentes)
+# `manage.py bench_escrituras` mide el throughput de escritura de la configuración activa.
+
+DB_MOTOR = os.environ.get('DB_MOTOR', 'sqlite')
+DB_PERFIL = os.environ.get('DB_PERFIL', 'desarrollo')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600 if DB_PERFIL == 'produccion' else 0))
+
+if DB_MOTOR == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NOMBRE', 'libreria'),
+            'USER': os.environ.get('DB_USUARIO', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PUERTO', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('DB_POOL_MAX'):
+        # Requiere psycopg[pool]; Django no permite combinarlo con CONN_MAX_AGE.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ['DB_POOL_MAX']),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NOMBRE', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_MAX_AGE > 0,
+        }
+    }
+    if DB_PERFIL == 'produccion':
+        DATABASES['default']['OPTIONS'] = {
+            # Los escritores esperan el lock en vez de fallar con "database is locked";
+            # IMMEDIATE toma el lock de escritura al abrir la transacción y evita
+            # que dos lectores que quieren escribir se bloqueen mutuamente.
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=20000;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        }
 
 
 
@@ -150,6 +206,9 @@ CSRF_COOKIE_SECURE = False
 
 SESSION_COOKIE_AGE = 86400
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+# Vencimiento deslizante; las renovaciones llegan a la base en lote (ver core/sesiones.py)
+SESSION_SAVE_EVERY_REQUEST = True
+SESSION_ENGINE = 'core.sesiones'
 
 SESSION_COOKIE_DOMAIN   = 'localhost'
 CSRF_COOKIE_DOMAIN      = 'localhost'
@@ -164,3 +223,81 @@ CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
 ]
+
+# Variantes de portada (ver core/portadas.py)
+PORTADAS_EN_SEGUNDO_PLANO = True
+PORTADAS_PROCESOS = 2
+
+# Métricas por vista (ver core/middleware.py); requests más lentas se loguean con su SQL
+METRICAS_UMBRAL_LENTO = 0.5
+
+# Lecturas del catálogo, mi-carrito y auth/user con vistas async (core/urls_async.py).
+# core_project/asgi.py lo activa por defecto; bajo WSGI conviene dejarlo apagado.
+VISTAS_ASYNC = os.environ.get('VISTAS_ASYNC', '0') == '1'
+
+# Snapshot precomprimido del catálogo (ver core/snapshot.py)
+CATALOGO_SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+CATALOGO_SNAPSHOT_EN_SEGUNDO_PLANO = True
+CATALOGO_SNAPSHOT_DEMORA = 2.0
+CATALOGO_SNAPSHOT_ESPERA_MAXIMA = 30.0
+
+# Tests sin timers en segundo plano ni archivos en el árbol (ver core/test_runner.py)
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# /api/batch/ (ver core/batch.py): sub-requests por batch e hilos para los GET en paralelo
+BATCH_MAX_REQUESTS = 20
+BATCH_CONCURRENCIA = 4
+
+# Caché por defecto: versiones del catálogo (ETag/304), rankings, facetas y claves de
+# idempotencia. Todos los procesos que atienden requests (y run_workers) tienen que ver la
+# misma; si no, otro worker puede responder 304 con datos viejos o repetir un POST reintentado.
+#   CACHE_REDIS_URL=redis://host:6379/1   Redis (requiere el paquete redis)
+#   CACHE_TABLA=cache_compartida          tabla en la base (`manage.py createcachetable`)
+# Sin ninguna de las dos se usa LocMem, válida solo con un proceso (desarrollo, tests):
+# con DB_PERFIL=produccion es un error salvo que se declare CACHE_PROCESO_UNICO=1.
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHE_DEFAULT = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_REDIS_URL'],
+    }
+elif os.environ.get('CACHE_TABLA'):
+    # add() es atómico (INSERT con clave única): sirve para las claves de idempotencia.
+    CACHE_DEFAULT = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ['CACHE_TABLA'],
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+else:
+    if DB_PERFIL == 'produccion' and os.environ.get('CACHE_PROCESO_UNICO') != '1':
+        raise ImproperlyConfigured(
+            'DB_PERFIL=produccion necesita una caché compartida entre procesos: '
+            'definir CACHE_REDIS_URL o CACHE_TABLA (o CACHE_PROCESO_UNICO=1 con un solo proceso).'
+        )
+    CACHE_DEFAULT = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+# Sesiones (ver core/sesiones.py): LRU del proceso -> cache en disco compartida -> base
+CACHES = {
+    'default': CACHE_DEFAULT,
+    'sesiones': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SESIONES_CACHE_DIR', str(BASE_DIR / 'cache' / 'sesiones')),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+SESIONES_CACHE = 'sesiones'
+SESIONES_LRU_MAX = 10000
+SESIONES_LRU_TTL = 10
+SESIONES_RENOVAR_CADA = 60
+SESIONES_ESCRITURA_EN_SEGUNDO_PLANO = True
+SESIONES_ESCRITURA_DEMORA = 5.0
+SESIONES_LOTE = 500
+
+# Cola de tareas en la base (ver core/tareas.py), consumida por `manage.py run_workers`.
+# Los workers invalidan el catálogo en la caché: activarlo solo con una caché compartida (CACHE_*).
+TAREAS_EN_SEGUNDO_PLANO = os.environ.get('TAREAS_EN_SEGUNDO_PLANO', '0') == '1'
+TAREAS_PROCESOS = 2
+TAREAS_INTERVALO = 1.0
+TAREAS_BLOQUEO = 300
+TAREAS_REINTENTO_BASE = 5
+TAREAS_REINTENTO_MAXIMO = 600
+TAREAS_CONSERVAR_DIAS = 7
@@ -22,7 +22,8 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('core.urls')),
+    # Con VISTAS_ASYNC (ASGI) las lecturas más usadas van por vistas async.
+    path('api/', include('core.urls_async' if settings.VISTAS_ASYNC else 'core.urls')),
 ]
 
 if settings.DEBUG:
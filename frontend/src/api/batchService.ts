@@ -0,0 +1,72 @@
+import api from "./axiosConfig";
+
+export interface BatchRequest {
+  id?: string | number;
+  method?: "GET" | "POST" | "PUT" | "PATCH" | "DELETE";
+  path: string;
+  body?: unknown;
+}
+
+export interface BatchResponse<T = unknown> {
+  id: string | number;
+  status: number;
+  headers: Record<string, string>;
+  body: T;
+}
+
+// Paths relativos a /api, igual que en el resto de los services.
+export async function batch(requests: BatchRequest[]): Promise<BatchResponse[]> {
+  const res = await api.post<{ responses: BatchResponse[] }>("/batch/", {
+    requests: requests.map((r) => ({ ...r, id: r.id ?? r.path, path: `/api${r.path}` })),
+  });
+  return res.data.responses;
+}
+
+// Lo que piden AuthContext, CartContext y HomePage al arrancar la app.
+const CARGA_INICIAL = [
+  "/auth/csrf/",
+  "/auth/user/",
+  "/generos/",
+  "/libros/top/",
+  "/libros/facetas/",
+  "/compras/mi-carrito/",
+];
+
+let cargaInicial: Promise<Map<string, BatchResponse>> | null = null;
+const consumidas = new Set<string>();
+
+function getCargaInicial() {
+  if (!cargaInicial) {
+    cargaInicial = batch(CARGA_INICIAL.map((path) => ({ path }))).then(
+      (responses) => new Map(responses.map((r) => [String(r.id), r]))
+    );
+  }
+  return cargaInicial;
+}
+
+/**
+ * Respuesta de `path` tomada del batch de arranque. Cada path se usa una sola
+ * vez: las llamadas siguientes (p. ej. refrescar el carrito) van por `fallback`,
+ * igual que si el batch falla.
+ */
+export async function desdeCargaInicial<T>(path: string, fallback: () => Promise<T>): Promise<T> {
+  if (!CARGA_INICIAL.includes(path) || consumidas.has(path)) {
+    return fallback();
+  }
+  consumidas.add(path);
+  let respuesta: BatchResponse | undefined;
+  try {
+    respuesta = (await getCargaInicial()).get(path);
+  } catch {
+    return fallback();
+  }
+  if (!respuesta) {
+    return fallback();
+  }
+  if (respuesta.status >= 400) {
+    throw Object.assign(new Error(`Error ${respuesta.status} en ${path}`), {
+      response: { status: respuesta.status, data: respuesta.body },
+    });
+  }
+  return respuesta.body as T;
+}
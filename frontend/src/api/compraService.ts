@@ -24,6 +24,24 @@ export async function subirComprobante(
   return res.data;
 }
 
+export async function checkout(
+  compraId: number,
+  idempotencyKey: string,
+  comprobante?: File
+): Promise<Compra> {
+  const formData = new FormData();
+  if (comprobante) {
+    formData.append("comprobante", comprobante);
+  }
+  const res = await api.post<Compra>(`/compras/${compraId}/checkout/`, formData, {
+    headers: {
+      "Content-Type": "multipart/form-data",
+      "Idempotency-Key": idempotencyKey,
+    },
+  });
+  return res.data;
+}
+
 export async function getComprasUsuario(): Promise<Compra[]> {
   const res = await api.get<Compra[]>("/compras/");
   return res.data;
@@ -1,16 +1,52 @@
 import api from "./axiosConfig";
-import type { Libro } from "../types/models";
+import type { Facetas, FiltroFacetas, Libro, PaginaCursor } from "../types/models";
 
 export async function getTopLibros(): Promise<Libro[]> {
   const res = await api.get("/libros/top/");
   return res.data;
 }
 
+export async function getTopLibrosPorGenero(generoId: number): Promise<Libro[]> {
+  const res = await api.get(`/generos/${generoId}/top/`);
+  return res.data;
+}
+
 export async function getLibros(): Promise<Libro[]> {
   const res = await api.get("/libros/");
   return res.data;
 }
 
+export async function getLibrosPagina(
+  cursor: string | null = null,
+  limit = 50,
+  orden?: "top"
+): Promise<PaginaCursor<Libro>> {
+  const res = await api.get<PaginaCursor<Libro>>("/libros/", {
+    params: { limit, cursor: cursor ?? undefined, orden },
+  });
+  return res.data;
+}
+
+export async function getLibrosPorGeneroPagina(
+  generoId: number,
+  cursor: string | null = null,
+  limit = 50
+): Promise<PaginaCursor<Libro>> {
+  const res = await api.get<PaginaCursor<Libro>>(`/generos/${generoId}/libros/`, {
+    params: { limit, cursor: cursor ?? undefined },
+  });
+  return res.data;
+}
+
+export async function buscarLibros(
+  q: string,
+  limit = 20,
+  offset = 0
+): Promise<{ next: string | null; results: Libro[] }> {
+  const res = await api.get("/libros/buscar/", { params: { q, limit, offset } });
+  return res.data;
+}
+
 export async function getLibrosPorGenero(generoId: number) {
   const res = await api.get(`/generos/${generoId}/libros/`);
   return res.data;
@@ -35,3 +71,33 @@ export async function editarLibro(id: number, data: FormData) {
     },
   });
 }
+
+export interface ResumenImportacion {
+  procesadas: number;
+  importadas: number;
+  errores: number;
+  detalle_errores: { fila: number; errores: Record<string, string[]> }[];
+}
+
+export async function importarLibros(archivo: File): Promise<ResumenImportacion> {
+  const data = new FormData();
+  data.append("archivo", archivo);
+  const res = await api.post<ResumenImportacion>("/libros/importar/", data, {
+    headers: {
+      "Content-Type": "multipart/form-data",
+    },
+  });
+  return res.data;
+}
+
+export async function getRelacionados(libroId: number): Promise<Libro[]> {
+  const res = await api.get<Libro[]>(`/libros/${libroId}/relacionados/`);
+  return res.data;
+}
+
+export async function getFacetas(filtro: FiltroFacetas = {}): Promise<Facetas> {
+  const res = await api.get<Facetas>("/libros/facetas/", {
+    params: { ...filtro, generos: filtro.generos?.length ? filtro.generos.join(",") : undefined },
+  });
+  return res.data;
+}
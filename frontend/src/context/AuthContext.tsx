@@ -14,6 +14,7 @@ import {
 import type { Usuario } from '../types/models';
 import { useNavigate } from 'react-router-dom';
 import api from '../api/axiosConfig';
+import { desdeCargaInicial } from '../api/batchService';
 import Cookies from 'js-cookie';
 
 interface AuthContextProps {
@@ -50,8 +51,9 @@ export function AuthProvider({ children }: { children: ReactNode }) {
         if (userLS) {
           setUser(JSON.parse(userLS));
         } else {
-          await api.get('/auth/csrf/');
-          const u = await getCurrentUser();
+          // csrf y usuario llegan en el batch de arranque (api/batchService.ts).
+          await desdeCargaInicial('/auth/csrf/', () => api.get('/auth/csrf/'));
+          const u = await desdeCargaInicial('/auth/user/', getCurrentUser);
           setUser(u);
           localStorage.setItem('user', JSON.stringify(u));
         }
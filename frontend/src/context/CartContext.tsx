@@ -1,16 +1,19 @@
 import React, { createContext, useContext, useState, useEffect, type ReactNode } from 'react';
 import api from '../api/axiosConfig';
-import type { Libro } from '../types/models';
+import { desdeCargaInicial } from '../api/batchService';
+import type { LibroResumen } from '../types/models';
 
 interface CartItem {
   id: number;
-  libro: Libro;
+  libro: LibroResumen;
   cantidad: number;
 }
 
+type NuevoItem = Omit<CartItem, 'libro'> & { libro: Pick<LibroResumen, 'id'> };
+
 interface CartContextProps {
   items: CartItem[];
-  addToCart: (item: CartItem) => Promise<void>;
+  addToCart: (item: NuevoItem) => Promise<void>;
   removeFromCart: (itemId: number) => Promise<void>;
   clearCart: () => void;
   fetchCart: () => Promise<void>;
@@ -24,7 +27,9 @@ export function CartProvider({ children }: { children: ReactNode }) {
 
   const fetchCart = async () => {
     try {
-      const { data } = await api.get<{ id: number; items: CartItem[] }>('/compras/mi-carrito/');
+      const data = await desdeCargaInicial('/compras/mi-carrito/', async () =>
+        (await api.get<{ id: number; items: CartItem[] }>('/compras/mi-carrito/')).data
+      );
       setItems(data.items);
     } catch {
       setItems([]);
@@ -32,7 +37,7 @@ export function CartProvider({ children }: { children: ReactNode }) {
   };
 
 
-  const addToCart = async (item: CartItem) => {
+  const addToCart = async (item: NuevoItem) => {
     await fetchCart();
     if (items.find((i) => i.libro.id === item.libro.id)) {
       alert('Este libro ya está en tu carrito.');
@@ -6,7 +6,7 @@ interface Libro {
   id: number;
   titulo: string;
   precio: number;
-  portada?: string | null;
+  miniatura: string | null;
 }
 
 interface ItemCompra {
@@ -108,9 +108,9 @@ export default function CartPage() {
                 return (
                   <tr key={i.id} className="hover:bg-indigo-50 transition">
                     <td className="py-3 px-2 flex items-center gap-3">
-                      {i.libro.portada && (
+                      {i.libro.miniatura && (
                         <img
-                          src={i.libro.portada}
+                          src={i.libro.miniatura}
                           alt={i.libro.titulo}
                           className="h-12 w-10 object-cover rounded shadow border border-gray-100"
                           onError={e => (e.currentTarget.src = "/noimage.jpg")}
@@ -1,5 +1,6 @@
 import { useEffect, useState } from 'react';
 import api from '../api/axiosConfig';
+import { checkout } from '../api/compraService';
 import { useNavigate } from 'react-router-dom';
 import { useCart } from '../context/CartContext';
 import qrImg from '../assets/qr.png';
@@ -34,6 +35,8 @@ export default function CheckoutPage() {
   const [preview, setPreview] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [subiendo, setSubiendo] = useState(false);
+  // Una clave por visita: si el usuario reintenta, el servidor repite la misma respuesta.
+  const [idempotencyKey] = useState(() => crypto.randomUUID());
   const navigate = useNavigate();
 
 
@@ -70,11 +73,7 @@ export default function CheckoutPage() {
     setSubiendo(true);
     setError(null);
     try {
-      const formData = new FormData();
-      formData.append('comprobante', file);
-      await api.post(`/compras/${carrito.id}/subir-comprobante/`, formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
-      });
+      await checkout(carrito.id, idempotencyKey, file);
 
       const { data: nuevoCarrito } = await api.get<CompraConItems>('/compras/mi-carrito/');
       if (!nuevoCarrito || !nuevoCarrito.items || nuevoCarrito.items.length === 0) {
@@ -32,12 +32,19 @@ export default function GeneroPage() {
             >
               <Link to={`/libro/${libro.id}`} className="flex-1 flex flex-col h-full">
                 <div className="relative">
-                  <img
-                    src={libro.portada || '/noimage.jpg'}
-                    alt={libro.titulo}
-                    className="w-full h-56 object-cover group-hover:scale-105 transition-transform duration-300 rounded-t-2xl"
-                    onError={e => (e.currentTarget.src = "/noimage.jpg")}
-                  />
+                  <picture>
+                    {libro.portadas && (
+                      <source type="image/webp" srcSet={libro.portadas.srcset.webp} sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw" />
+                    )}
+                    <img
+                      src={libro.portadas?.card.jpeg || libro.portada || '/noimage.jpg'}
+                      srcSet={libro.portadas?.srcset.jpeg}
+                      sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
+                      alt={libro.titulo}
+                      className="w-full h-56 object-cover group-hover:scale-105 transition-transform duration-300 rounded-t-2xl"
+                      onError={e => (e.currentTarget.src = "/noimage.jpg")}
+                    />
+                  </picture>
                   <div className="absolute top-2 right-2 bg-white/80 rounded-full px-3 py-1 text-xs font-bold text-green-700 shadow border border-green-200">
                     ${Number(libro.precio).toFixed(2)}
                   </div>
@@ -1,17 +1,22 @@
 import { useEffect, useState } from 'react';
 import type { Libro, Genero } from '../types/models';
 import { getGeneros } from '../api/generoService';
-import { getTopLibros } from '../api/libroService';
+import { getFacetas, getTopLibros } from '../api/libroService';
 import { Link } from 'react-router-dom';
+import { desdeCargaInicial } from '../api/batchService';
 
 export default function HomePage() {
   const [generos, setGeneros] = useState<Genero[]>([]);
   const [libros, setLibros] = useState<Libro[]>([]);
   const [errorLibros, setErrorLibros] = useState<string | null>(null);
+  const [cantidades, setCantidades] = useState<Record<number, number>>({});
 
   useEffect(() => {
-    getGeneros().then(setGeneros).catch(console.error);
-    getTopLibros()
+    desdeCargaInicial('/generos/', getGeneros).then(setGeneros).catch(console.error);
+    desdeCargaInicial('/libros/facetas/', () => getFacetas())
+      .then((facetas) => setCantidades(Object.fromEntries(facetas.generos.map((g) => [g.id, g.cantidad]))))
+      .catch(console.error);
+    desdeCargaInicial('/libros/top/', getTopLibros)
       .then((data) => {
         setLibros(data);
       })
@@ -36,6 +41,7 @@ export default function HomePage() {
                 className="px-5 py-2 rounded-full shadow text-indigo-700 font-semibold bg-indigo-100 border border-indigo-200 hover:bg-indigo-200 hover:text-indigo-900 transition-all"
               >
                 {g.nombre}
+                <span className="ml-2 text-xs text-indigo-500">{cantidades[g.id] ?? 0}</span>
               </Link>
             </li>
           ))}
@@ -61,12 +67,19 @@ export default function HomePage() {
                 </div>
                 <Link to={`/libro/${libro.id}`} className="flex-1 flex flex-col h-full">
                   <div className="relative">
-                    <img
-                      src={libro.portada || '/noimage.jpg'}
-                      alt={libro.titulo}
-                      className="w-full h-56 object-cover group-hover:scale-105 transition-transform duration-300 rounded-t-2xl"
-                      onError={e => (e.currentTarget.src = "/noimage.jpg")}
-                    />
+                    <picture>
+                      {libro.portadas && (
+                        <source type="image/webp" srcSet={libro.portadas.srcset.webp} sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw" />
+                      )}
+                      <img
+                        src={libro.portadas?.card.jpeg || libro.portada || '/noimage.jpg'}
+                        srcSet={libro.portadas?.srcset.jpeg}
+                        sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
+                        alt={libro.titulo}
+                        className="w-full h-56 object-cover group-hover:scale-105 transition-transform duration-300 rounded-t-2xl"
+                        onError={e => (e.currentTarget.src = "/noimage.jpg")}
+                      />
+                    </picture>
                     <div className="absolute top-2 right-2 bg-white/70 rounded-full px-3 py-1 text-xs font-bold text-green-700 shadow">
                       ${isNaN(precioNum) ? libro.precio : precioNum.toFixed(2)}
                     </div>
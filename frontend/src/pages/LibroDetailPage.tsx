@@ -1,13 +1,14 @@
 import { useEffect, useState } from 'react';
 import { useParams, useNavigate, Link } from 'react-router-dom';
 import type { Libro } from '../types/models';
-import { getLibroById } from '../api/libroService';
+import { getLibroById, getRelacionados } from '../api/libroService';
 import { useCart } from '../context/CartContext';
 import { useAuth } from '../context/AuthContext';
 
 export default function LibroDetailPage() {
   const { id } = useParams<{ id: string }>();
   const [libro, setLibro] = useState<Libro | null>(null);
+  const [relacionados, setRelacionados] = useState<Libro[]>([]);
   const [agregado, setAgregado] = useState(false);
   const [loadingAdd, setLoadingAdd] = useState(false);
   const { addToCart, items, fetchCart } = useCart();
@@ -17,6 +18,7 @@ export default function LibroDetailPage() {
   useEffect(() => {
     if (id) {
       getLibroById(Number(id)).then(setLibro).catch(console.error);
+      getRelacionados(Number(id)).then(setRelacionados).catch(() => setRelacionados([]));
       if (user) fetchCart();
     }
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -123,6 +125,29 @@ export default function LibroDetailPage() {
           </div>
         </div>
       </div>
+
+      {relacionados.length > 0 && (
+        <div className="mt-10">
+          <h2 className="text-xl font-bold text-gray-800 mb-4">Comprados juntos frecuentemente</h2>
+          <ul className="grid gap-4 grid-cols-2 sm:grid-cols-3">
+            {relacionados.map((r) => (
+              <li key={r.id} className="border rounded-xl bg-white shadow hover:shadow-lg transition-shadow">
+                <Link to={`/libro/${r.id}`} className="flex flex-col h-full p-3">
+                  <img
+                    src={r.portadas?.thumb.jpeg || r.portada || '/noimage.jpg'}
+                    alt={r.titulo}
+                    className="w-full h-32 object-cover rounded-lg mb-2"
+                    onError={e => (e.currentTarget.src = "/noimage.jpg")}
+                  />
+                  <span className="text-sm font-bold text-gray-900">{r.titulo}</span>
+                  <span className="text-xs text-gray-600">{r.autor}</span>
+                  <span className="mt-auto text-sm font-semibold text-green-700">${Number(r.precio).toFixed(2)}</span>
+                </Link>
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
     </div>
   );
 }
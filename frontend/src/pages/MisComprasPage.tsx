@@ -5,7 +5,7 @@ interface Libro {
   id: number;
   titulo: string;
   autor: string;
-  portada?: string;
+  miniatura: string | null;
 }
 
 interface ItemCompra {
@@ -97,9 +97,9 @@ export default function MisComprasPage() {
             <ul className="divide-y divide-gray-100 mb-4">
               {c.items.map((i) => (
                 <li key={i.id} className="flex items-center gap-3 py-3">
-                  {i.libro.portada && (
+                  {i.libro.miniatura && (
                     <img
-                      src={i.libro.portada}
+                      src={i.libro.miniatura}
                       alt={i.libro.titulo}
                       className="h-14 w-11 object-cover rounded shadow border border-gray-200"
                       onError={(e) => (e.currentTarget.src = "/noimage.jpg")}
@@ -3,6 +3,19 @@ export interface Genero {
   nombre: string;
 }
 
+export interface VariantePortada {
+  ancho: number;
+  webp: string;
+  jpeg: string;
+}
+
+export interface Portadas {
+  thumb: VariantePortada;
+  card: VariantePortada;
+  full: VariantePortada;
+  srcset: { webp: string; jpeg: string };
+}
+
 export interface Libro {
   id: number;
   titulo: string;
@@ -11,13 +24,43 @@ export interface Libro {
   isbn: string;
   descripcion: string;
   portada: string;
+  portadas: Portadas | null;
   generos: Genero[];
   ventas_totales: number;
 }
 
+// Representación resumida que devuelven carrito y compras (sin ?expand=libro).
+export interface LibroResumen {
+  id: number;
+  titulo: string;
+  autor: string;
+  precio: string;
+  miniatura: string | null;
+}
+
+export interface PaginaCursor<T> {
+  next: string | null;
+  next_cursor: string | null;
+  results: T[];
+}
+
+export interface Facetas {
+  total: number;
+  generos: { id: number; nombre: string; cantidad: number }[];
+  precios: { desde: string; hasta: string | null; cantidad: number }[];
+  autores: { autor: string; cantidad: number }[];
+}
+
+export interface FiltroFacetas {
+  generos?: number[];
+  precio_min?: number;
+  precio_max?: number;
+  q?: string;
+}
+
 export interface ItemCompra {
   id: number;
-  libro: Libro;
+  libro: LibroResumen;
   precio_unitario: number;
   cantidad: number;
 }